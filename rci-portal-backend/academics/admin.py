@@ -1,12 +1,20 @@
 # academics/admin.py
 
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
 import json
 from .models import (
     User, Program, Curriculum, Subject, Section,
-    Student, Enrollment, Grade, Application, Document, AuditLog
+    Student, Enrollment, Grade, Application, Document, AuditLog, WaitlistEntry
 )
+from .enrollment import move_seat
+from .archive import ArchivedLogs, archived_months
+from .audit import normalize_entity
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
@@ -15,10 +23,12 @@ class AuditLogAdmin(admin.ModelAdmin):
     """
     list_display = ['timestamp', 'action_colored', 'entity', 'user_display', 'details_preview']
     list_filter = ['action', 'entity', 'timestamp']
-    search_fields = ['entity', 'user__username', 'user__email']
+    # Entity is a choice: filter on it (indexed) rather than searching it
+    search_fields = ['user__username', 'user__email']
     readonly_fields = ['log_id', 'entity', 'action', 'user', 'details_formatted', 'timestamp']
     ordering = ['-timestamp']
     date_hierarchy = 'timestamp'
+    change_list_template = 'admin/academics/auditlog/change_list.html'
     
     def has_add_permission(self, request):
         return False
@@ -28,6 +38,44 @@ class AuditLogAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser
+
+    def get_urls(self):
+        urls = [
+            path('archive/', self.admin_site.admin_view(self.archive_view), name='academics_auditlog_archive'),
+        ]
+        return urls + super().get_urls()
+
+    def archive_view(self, request):
+        """Browse months moved out of the table by archive_audit_logs"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        months = archived_months()
+        month = request.GET.get('month') or (months[0] if months else None)
+        page = None
+        if month in months:
+            logs = ArchivedLogs(
+                month, entity=normalize_entity(request.GET.get('entity')), action=request.GET.get('action')
+            )
+            page = Paginator(logs, self.list_per_page).get_page(request.GET.get('page'))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Archived audit logs',
+            'months': months,
+            'month': month,
+            'entity': request.GET.get('entity', ''),
+            'action': request.GET.get('action', ''),
+            'actions': AuditLog.ACTION_CHOICES,
+            'entities': AuditLog.ENTITY_CHOICES,
+            'page': page,
+            'rows': [
+                (log, self.action_colored(log), self.user_display(log), self.details_preview(log))
+                for log in page
+            ] if page else [],
+        }
+        return TemplateResponse(request, 'admin/academics/auditlog/archive.html', context)
     
     def action_colored(self, obj):
         """Display action with color coding"""
@@ -345,7 +393,8 @@ class SubjectAdmin(admin.ModelAdmin):
 
 @admin.register(Section)
 class SectionAdmin(admin.ModelAdmin):
-    list_display = ['section_name', 'subject', 'term', 'schedule', 'room', 'professor']
+    list_display = ['section_name', 'subject', 'term', 'schedule', 'room', 'professor', 'capacity', 'seats_taken']
+    readonly_fields = ['seats_taken']
     list_filter = ['term', 'subject__curriculum__program']
     search_fields = ['subject__code', 'room']
 
@@ -355,6 +404,27 @@ class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ['student', 'section', 'term', 'status', 'timestamp']
     list_filter = ['status', 'term']
     search_fields = ['student__student_number', 'section__subject__code']
+    
+    def save_model(self, request, obj, form, change):
+        # Keep section seat counters in step; admins may exceed capacity. The
+        # row is locked and re-read, as in EnrollmentSerializer.update().
+        with transaction.atomic():
+            old = Enrollment.objects.select_for_update().filter(pk=obj.pk).values(
+                'section_id', 'status'
+            ).first() if change else None
+            move_seat(
+                old['section_id'] if old else None, old['status'] if old else None,
+                obj.section_id, obj.status, enforce_capacity=False
+            )
+            super().save_model(request, obj, form, change)
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'section', 'term', 'status', 'timestamp', 'processed_at']
+    list_filter = ['status', 'term']
+    search_fields = ['student__student_number', 'section__subject__code']
+    readonly_fields = ['entry_id', 'enrollment', 'timestamp', 'processed_at']
 
 
 @admin.register(Application)
@@ -0,0 +1,413 @@
+# academics/archive.py
+
+import datetime
+import functools
+import gzip
+import heapq
+import io
+import itertools
+import json
+import os
+import re
+import tempfile
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import AuditLog, User
+
+MONTH_RE = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+SEGMENT_RE = re.compile(r'^segment-(\d{4})-(\d+)\.jsonl\.gz$')
+
+# Rows per gzip member of a segment; a page read decompresses only the
+# blocks it needs
+BLOCK_ROWS = getattr(settings, 'AUDIT_ARCHIVE_BLOCK_ROWS', 1000)
+
+
+# ========================================
+# MONTHLY PARTITIONS
+# ========================================
+# The audit log is partitioned by calendar month (local time). Recent
+# months live in the audit_logs table; older ones are moved by
+# archive_month() to gzipped JSONL segments under
+# AUDIT_ARCHIVE_DIR/<YYYY-MM>/, newest entry first. Each segment is a
+# series of gzip members of BLOCK_ROWS rows, described by a sidecar
+# index (see segment_index()).
+
+def archive_root():
+    return os.fspath(getattr(settings, 'AUDIT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive', 'audit')))
+
+
+def is_month(value):
+    return bool(value) and bool(MONTH_RE.match(value))
+
+
+def month_of(moment):
+    return timezone.localtime(moment).strftime('%Y-%m')
+
+
+def month_bounds(month):
+    """[start, end) of `month` ('YYYY-MM') as aware datetimes"""
+    year, number = map(int, month.split('-'))
+    start = datetime.datetime(year, number, 1)
+    end = datetime.datetime(year + number // 12, number % 12 + 1, 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def add_months(month, count):
+    year, number = map(int, month.split('-'))
+    index = year * 12 + number - 1 + count
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def _month_dir(month):
+    return os.path.join(archive_root(), month)
+
+
+def segments(month):
+    """[(path, rows), ...] of the month's segment files in write order"""
+    try:
+        names = sorted(os.listdir(_month_dir(month)))
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        match = SEGMENT_RE.match(name)
+        if match:
+            found.append((os.path.join(_month_dir(month), name), int(match.group(2))))
+    return found
+
+
+def archived_months():
+    """Months with at least one segment, newest first"""
+    try:
+        names = os.listdir(archive_root())
+    except FileNotFoundError:
+        return []
+    return sorted((name for name in names if is_month(name) and segments(name)), reverse=True)
+
+
+# ========================================
+# ARCHIVING
+# ========================================
+
+# Columns read for each archived entry, in _entry()'s order
+ENTRY_COLUMNS = ('log_id', 'entity', 'action', 'user_id', 'user__username', 'details', 'timestamp')
+
+
+def _entry(row):
+    log_id, entity, action, user_id, username, details, timestamp = row
+    return {
+        'log_id': str(log_id),
+        'entity': entity,
+        'action': action,
+        'user_id': str(user_id) if user_id else None,
+        'username': username,
+        'details': details,
+        'timestamp': _timestamp(timestamp),
+    }
+
+
+def _timestamp(moment):
+    # Fixed width UTC, so segment order is plain string order
+    return moment.astimezone(datetime.timezone.utc).isoformat(timespec='microseconds')
+
+
+def _sort_key(entry):
+    return [entry['timestamp'], entry['log_id']]
+
+
+def _filter_key(entry):
+    """What the list filters compare, as one string (counted per block in the index)"""
+    return f"{entry['entity']}\t{entry['action']}\t{entry['user_id'] or ''}"
+
+
+def index_path(path):
+    return path[:-len('.jsonl.gz')] + '.index.json'
+
+
+def _write_blocks(raw, entries):
+    """
+    Write entries as one gzip member per BLOCK_ROWS rows; returns the index
+    blocks: byte offset, rows, newest and oldest sort key, and the number of
+    rows per filter key.
+    """
+    blocks = []
+    for block in iter(lambda: list(itertools.islice(entries, BLOCK_ROWS)), []):
+        offset = raw.tell()
+        with gzip.GzipFile(fileobj=raw, mode='wb') as output:
+            for entry in block:
+                output.write(json.dumps(entry, cls=JSONEncoder, separators=(',', ':')).encode() + b'\n')
+        blocks.append({
+            'offset': offset,
+            'rows': len(block),
+            'first': _sort_key(block[0]),
+            'last': _sort_key(block[-1]),
+            'keys': dict(Counter(map(_filter_key, block))),
+        })
+    return blocks
+
+
+def _write_atomic(path, directory, content):
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(content)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def archive_month(month, batch_size=1000):
+    """
+    Move every audit entry of `month` from the table to a new segment file
+    and return the number of entries moved.
+
+    Rows are streamed to a temporary file that is renamed into place once
+    complete (after its index). They are then deleted in batches of
+    `batch_size`, reading the ids back from the finished segment, so a row
+    is only deleted once it is on disk and entries written during the run
+    stay for the next one.
+    """
+    start, end = month_bounds(month)
+    rows = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by(
+        '-timestamp', '-log_id'
+    ).values_list(*ENTRY_COLUMNS)
+
+    directory = _month_dir(month)
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as raw:
+            blocks = _write_blocks(raw, map(_entry, rows.iterator(chunk_size=batch_size)))
+            raw.flush()
+            os.fsync(raw.fileno())
+        count = sum(block['rows'] for block in blocks)
+        if not count:
+            os.remove(temporary)
+            return 0
+        sequence = max((int(SEGMENT_RE.match(os.path.basename(path)).group(1)) for path, _ in segments(month)), default=0) + 1
+        path = os.path.join(directory, f'segment-{sequence:04d}-{count}.jsonl.gz')
+        # The index first: a segment is never visible without it
+        _write_atomic(index_path(path), directory, json.dumps({'blocks': blocks}).encode())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+    log_ids = (uuid.UUID(entry['log_id']) for entry in read_segment(path))
+    while batch := list(itertools.islice(log_ids, batch_size)):
+        with transaction.atomic():
+            AuditLog.objects.filter(pk__in=batch).delete()
+    return count
+
+
+# ========================================
+# READING
+# ========================================
+
+def read_segment(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as segment:
+        for line in segment:
+            yield json.loads(line)
+
+
+def read_block(path, block):
+    """The entries of one index block, decompressing only its gzip member(s)"""
+    with open(path, 'rb') as raw:
+        raw.seek(block['offset'])
+        with io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding='utf-8') as lines:
+            for line in itertools.islice(lines, block['rows']):
+                yield json.loads(line)
+
+
+def segment_index(path):
+    """
+    Index blocks of a segment (see _write_blocks()). Segments archived
+    before indexes existed are scanned once and treated as one block.
+    """
+    # Segments are written once, so the file's identity is a complete cache key
+    stat = os.stat(path)
+    return _segment_index(path, stat.st_ino, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _segment_index(path, inode, mtime):
+    try:
+        with open(index_path(path), encoding='utf-8') as index:
+            return json.load(index)['blocks']
+    except FileNotFoundError:
+        pass
+    keys, first, last, rows = Counter(), None, None, 0
+    for entry in read_segment(path):
+        keys[_filter_key(entry)] += 1
+        first = first or _sort_key(entry)
+        last = _sort_key(entry)
+        rows += 1
+    return [{'offset': 0, 'rows': rows, 'first': first, 'last': last, 'keys': dict(keys)}] if rows else []
+
+
+def read_month(month):
+    """Entries of an archived month as dicts, newest first"""
+    return ArchivedLogs(month).entries()
+
+
+class ArchivedLogs:
+    """
+    Read-only, sliceable view of an archived month with the filters
+    AuditLogViewSet supports, so Django's Paginator (and DRF's
+    PageNumberPagination) can page through it. Slices are read from the
+    segments on demand and returned as unsaved AuditLog instances with
+    their users attached.
+
+    Counts come from the segment indexes. Blocks are grouped into runs
+    whose key ranges overlap (one block per run, unless a month was
+    archived in several passes). A slice skips whole runs by their
+    matching row counts and decompresses only the blocks of the runs it
+    reads.
+
+    With table=True the month's rows still in audit_logs (written while or
+    after it was archived) are merged in as one more block.
+    """
+
+    def __init__(self, month, entity=None, action=None, user_id=None, table=False):
+        self.month = month
+        self.entity = entity
+        self.action = action
+        self.user_id = str(user_id) if user_id else None
+        self.table = table
+        self._runs = None
+
+    def _matches(self, entry):
+        return (
+            (not self.entity or entry['entity'] == self.entity)
+            and (not self.action or entry['action'] == self.action)
+            and (not self.user_id or entry['user_id'] == self.user_id)
+        )
+
+    def _matching_rows(self, block):
+        total = 0
+        for key, rows in block['keys'].items():
+            entity, action, user_id = key.split('\t')
+            if self._matches({'entity': entity, 'action': action, 'user_id': user_id or None}):
+                total += rows
+        return total
+
+    def runs(self):
+        """[(matching rows, [(path, block), ...]), ...] newest first, with disjoint key ranges"""
+        if self._runs is None:
+            blocks = [(path, block) for path, _ in segments(self.month) for block in segment_index(path)]
+            if self.table:
+                blocks += [(None, block) for block in self._table_blocks()]
+            blocks.sort(key=lambda item: item[1]['first'], reverse=True)
+            runs = []
+            for path, block in blocks:
+                matching = self._matching_rows(block)
+                # Overlaps the current run when it starts after that run's oldest entry
+                if runs and block['first'] >= runs[-1]['last']:
+                    run = runs[-1]
+                    run['last'] = min(run['last'], block['last'])
+                else:
+                    run = {'last': block['last'], 'rows': 0, 'blocks': []}
+                    runs.append(run)
+                run['rows'] += matching
+                if matching:
+                    run['blocks'].append((path, block))
+            self._runs = [(run['rows'], run['blocks']) for run in runs if run['rows']]
+        return self._runs
+
+    def count(self):
+        return sum(rows for rows, _ in self.runs())
+
+    __len__ = count
+
+    def entries(self, start=0, stop=None):
+        """Matching entries as dicts, newest first, from position `start` up to `stop`"""
+        position = 0
+        for rows, blocks in self.runs():
+            if stop is not None and position >= stop:
+                return
+            if position + rows <= start:
+                position += rows
+                continue
+            merged = heapq.merge(
+                *(read_block(path, block) if path else self._table_entries() for path, block in blocks),
+                key=_sort_key, reverse=True,
+            )
+            matching = (entry for entry in merged if self._matches(entry))
+            skip = max(start - position, 0)
+            take = None if stop is None else stop - position
+            yield from itertools.islice(matching, skip, take)
+            position += rows
+
+    def iterator(self, chunk_size=1000):
+        """Every matching entry as an AuditLog, reading users per chunk"""
+        entries = self.entries()
+        while chunk := list(itertools.islice(entries, chunk_size)):
+            yield from self._logs(chunk)
+
+    def _table_rows(self):
+        start, end = month_bounds(self.month)
+        filters = {'entity': self.entity, 'action': self.action, 'user_id': self.user_id}
+        return AuditLog.objects.filter(
+            timestamp__gte=start, timestamp__lt=end, **{name: value for name, value in filters.items() if value}
+        )
+
+    def _table_blocks(self):
+        """
+        The table's rows as an index block, from one grouped query. Its key
+        range runs from the newest to the oldest timestamp, whatever the ids.
+        """
+        groups = list(self._table_rows().values('entity', 'action', 'user_id').annotate(
+            rows=Count('pk'), newest=Max('timestamp'), oldest=Min('timestamp'),
+        ).order_by())
+        if not groups:
+            return []
+        return [{
+            'rows': sum(group['rows'] for group in groups),
+            # log_id strings sort between '' and '~'
+            'first': [_timestamp(max(group['newest'] for group in groups)), '~'],
+            'last': [_timestamp(min(group['oldest'] for group in groups)), ''],
+            'keys': {
+                _filter_key({
+                    'entity': group['entity'], 'action': group['action'],
+                    'user_id': str(group['user_id']) if group['user_id'] else None,
+                }): group['rows']
+                for group in groups
+            },
+        }]
+
+    def _table_entries(self):
+        rows = self._table_rows().order_by('-timestamp', '-log_id').values_list(*ENTRY_COLUMNS)
+        return map(_entry, rows.iterator())
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        return self._logs(list(self.entries(index.start or 0, index.stop)))
+
+    @staticmethod
+    def _logs(entries):
+        users = User.objects.in_bulk({entry['user_id'] for entry in entries if entry['user_id']})
+        return [
+            AuditLog(
+                log_id=uuid.UUID(entry['log_id']),
+                entity=entry['entity'],
+                action=entry['action'],
+                # Users deleted since archiving show as System
+                user=users.get(uuid.UUID(entry['user_id'])) if entry['user_id'] else None,
+                details=entry['details'],
+                timestamp=datetime.datetime.fromisoformat(entry['timestamp']),
+            )
+            for entry in entries
+        ]
@@ -0,0 +1,395 @@
+# academics/audit.py
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models.signals import post_init
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import AuditLog, User
+
+logger = logging.getLogger(__name__)
+
+# Attempts per batch when the database is busy (SQLite write lock)
+WRITE_ATTEMPTS = 3
+
+MAX_PAYLOAD_BYTES = getattr(settings, 'AUDIT_MAX_PAYLOAD_BYTES', 64 * 1024)
+EXCLUDED_FIELDS = frozenset(getattr(settings, 'AUDIT_EXCLUDED_FIELDS', ()))
+
+
+# ========================================
+# ENTITIES
+# ========================================
+
+_ENTITIES = {value.lower(): value for value, _ in AuditLog.ENTITY_CHOICES}
+
+
+def normalize_entity(name):
+    """
+    The AuditLog.ENTITY_CHOICES value for an entity name or API path
+    segment ('students', 'Student', 'student'), or None if there is none.
+    """
+    key = (name or '').strip().lower()
+    if key not in _ENTITIES and key.endswith('s'):
+        key = key[:-1]
+    return _ENTITIES.get(key)
+
+
+# ========================================
+# PAYLOADS
+# ========================================
+
+def omitted(size):
+    """Placeholder stored instead of a payload larger than MAX_PAYLOAD_BYTES"""
+    return {'omitted': 'payload too large', 'size': size}
+
+
+def clean_payload(value):
+    """
+    JSON-safe copy of a request or response payload without the fields in
+    AUDIT_EXCLUDED_FIELDS; uploaded files are reduced to name and size.
+    """
+    if hasattr(value, 'lists') and callable(value.lists):
+        # QueryDict (form and multipart bodies): keep single values flat
+        value = {key: values[0] if len(values) == 1 else values for key, values in value.lists()}
+    if isinstance(value, dict):
+        return {
+            str(key): clean_payload(item) for key, item in value.items()
+            if key not in EXCLUDED_FIELDS
+        }
+    if isinstance(value, (list, tuple)):
+        return [clean_payload(item) for item in value]
+    if isinstance(value, File):
+        return {'file': value.name, 'size': value.size}
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return json.loads(json.dumps(value, cls=JSONEncoder))
+
+
+def bounded(value):
+    """clean_payload(value), or omitted() when it encodes to more than MAX_PAYLOAD_BYTES"""
+    value = clean_payload(value)
+    size = len(json.dumps(value, separators=(',', ':')))
+    return omitted(size) if size > MAX_PAYLOAD_BYTES else value
+
+
+# ========================================
+# BATCHED WRITER
+# ========================================
+
+class AuditWriter:
+    """
+    Buffer audit entries in a bounded in-process queue and insert them with
+    bulk_create from a background thread, once `batch_size` entries are
+    waiting or `flush_interval` seconds after the first one arrived.
+
+    When the queue is full, submit() blocks for up to `enqueue_timeout`
+    seconds (backpressure) and then writes the entry inline, so entries are
+    never dropped. A batch rejected by an integrity error (typically a
+    user deleted before the flush) is retried row by row, without the
+    deleted user. The queue is flushed at interpreter exit. With
+    `asynchronous` off (tests) every entry is written immediately.
+    """
+
+    def __init__(self, batch_size=200, flush_interval=1.0, max_queue=10000,
+                 enqueue_timeout=0.05, asynchronous=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.asynchronous = asynchronous
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, entry):
+        if not self.asynchronous:
+            self.write([entry])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            logger.warning("Audit queue is full; writing entry inline")
+            self.write([entry])
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far has been written"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _ensure_started(self):
+        # Threads do not survive fork(); each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self.write(batch)
+            finally:
+                # The thread keeps its connection only while it has work
+                connection.close()
+                for waiter in waiters:
+                    waiter.set()
+
+    def write(self, entries):
+        entries = [entry for entry in entries if _finalize(entry)]
+        if not entries:
+            return
+        for entry in entries:
+            # Only user_id is written; a user instance deleted since (pk set
+            # to None) would make bulk_create refuse the whole batch
+            if _USER_FIELD.is_cached(entry):
+                _USER_FIELD.delete_cached_value(entry)
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                AuditLog.objects.bulk_create(entries)
+                return
+            except OperationalError:
+                if attempt == WRITE_ATTEMPTS:
+                    logger.exception("Could not write %d audit entries", len(entries))
+                    return
+                time.sleep(0.1 * 2 ** attempt)
+            except IntegrityError:
+                # One bad row must not cost the whole batch
+                self._write_each(entries)
+                return
+            except Exception:
+                logger.exception("Could not write %d audit entries", len(entries))
+                return
+
+    def _write_each(self, entries):
+        """Insert entries one at a time, without users deleted since they were recorded"""
+        user_ids = {entry.user_id for entry in entries if entry.user_id is not None}
+        existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        for entry in entries:
+            if entry.user_id is not None and entry.user_id not in existing:
+                entry.details = dict(entry.details, deleted_user_id=str(entry.user_id))
+                entry.user = None
+            try:
+                with transaction.atomic():
+                    entry.save(force_insert=True)
+            except Exception:
+                logger.exception("Could not write audit entry %s %s", entry.action, entry.entity)
+
+
+_USER_FIELD = AuditLog._meta.get_field('user')
+
+
+def _finalize(entry):
+    """Build details deferred by record_audit(); False when that fails"""
+    build = getattr(entry, '_build_details', None)
+    if build is None:
+        return True
+    try:
+        entry.details = build()
+    except Exception:
+        logger.exception("Could not build audit details for %s %s", entry.action, entry.entity)
+        return False
+    finally:
+        del entry._build_details
+    return True
+
+
+writer = AuditWriter(
+    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 1.0),
+    max_queue=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+    enqueue_timeout=getattr(settings, 'AUDIT_ENQUEUE_TIMEOUT', 0.05),
+    asynchronous=getattr(settings, 'AUDIT_ASYNC', True),
+)
+atexit.register(writer.flush, timeout=10)
+
+
+def record_audit(entity, action, user=None, details=None):
+    """
+    Queue an audit entry. The timestamp is taken now; the entry is handed
+    to the writer when the current transaction commits, so rolled back
+    changes are not audited.
+
+    `details` may be a callable, which the writer calls just before the
+    insert to keep its cost off the request.
+    """
+    entry = AuditLog(
+        entity=entity,
+        action=action,
+        user=user,
+        details={} if details is None or callable(details) else details,
+        timestamp=timezone.now(),
+    )
+    if callable(details):
+        entry._build_details = details
+    transaction.on_commit(lambda: writer.submit(entry))
+
+
+# ========================================
+# PER-OBJECT CHANGES
+# ========================================
+# Saves and deletes of tracked models are recorded once per object and
+# logical change. Within a transaction, repeated saves of an object are
+# merged into one pending entry, which is delivered when the transaction
+# commits. During an API request, delivered entries are held until the
+# response so AuditLogMiddleware can attach the request to them instead of
+# writing a second row; otherwise they go straight to the writer.
+
+_local = threading.local()
+_tracked = {}
+
+
+def track_changes(model):
+    """Snapshot `model` instances when loaded so record_change() can skip no-op saves"""
+    _tracked[model] = {field.attname: field.name for field in model._meta.concrete_fields}
+    post_init.connect(_take_snapshot, sender=model, dispatch_uid=f'audit-snapshot-{model._meta.label}')
+
+
+def tracked_entities():
+    return {normalize_entity(model._meta.object_name) for model in _tracked}
+
+
+def _take_snapshot(sender=None, instance=None, **kwargs):
+    values = instance.__dict__
+    # Deferred fields are not compared
+    instance._audit_snapshot = {name: values[name] for name in _tracked[type(instance)] if name in values}
+
+
+def changed_fields(instance):
+    """{field: {'before', 'after'}} since the last snapshot, or None without one"""
+    before = getattr(instance, '_audit_snapshot', None)
+    if before is None:
+        return None
+    values, names = instance.__dict__, _tracked[type(instance)]
+    return {
+        names[name]: {'before': value, 'after': values.get(name)}
+        for name, value in before.items() if values.get(name) != value
+    }
+
+
+def record_change(instance, action, user=None, details=None):
+    """
+    Audit a save ('create', 'update') or delete of a tracked instance.
+    Updates that changed no field are not recorded. `details` (a dict, or
+    a callable only called when the change is recorded) describes the
+    object's current state; updates also get the changed fields.
+    """
+    changes = changed_fields(instance) if action == 'update' else None
+    if changes == {}:
+        return
+    _take_snapshot(instance=instance)
+
+    entity = normalize_entity(instance._meta.object_name) or 'Unknown'
+    entry = AuditLog(entity=entity, action=action, user=user, details={}, timestamp=timezone.now())
+    entry._audit_key = (entity, instance.pk)
+    entry._audit_state = dict((details() if callable(details) else details) or {})
+    entry._audit_changes = changes or {}
+    entry._audit_request = None
+    entry._build_details = lambda: _change_details(entry)
+    _add_pending(entry)
+
+
+def _change_details(entry):
+    details = dict(entry._audit_request()) if entry._audit_request else {}
+    details.update(entry._audit_state)
+    if entry.action == 'update':
+        details['changes'] = entry._audit_changes
+    return bounded(details)
+
+
+def _merge(current, new):
+    """Fold `new` into `current`, an earlier entry for the same object"""
+    if not (current.action == 'create' and new.action == 'update'):
+        current.action = new.action
+    for name, change in new._audit_changes.items():
+        if name in current._audit_changes:
+            current._audit_changes[name]['after'] = change['after']
+        else:
+            current._audit_changes[name] = change
+    current._audit_changes = {
+        name: change for name, change in current._audit_changes.items() if change['before'] != change['after']
+    }
+    current._audit_state = new._audit_state
+    current.user = new.user or current.user
+
+
+def _add_pending(entry):
+    db = transaction.get_connection()
+    if not db.in_atomic_block:
+        _local.pending = {}
+        _deliver(entry)
+        return
+
+    pending = _local.__dict__.setdefault('pending', {})
+    current = pending.get(entry._audit_key)
+    # Entries whose transaction (or savepoint) rolled back lost their callback
+    if current is not None and any(func is current._audit_on_commit for _, func, _ in db.run_on_commit):
+        _merge(current, entry)
+        return
+
+    def on_commit():
+        if pending.get(entry._audit_key) is entry:
+            del pending[entry._audit_key]
+        _deliver(entry)
+
+    entry._audit_on_commit = on_commit
+    pending[entry._audit_key] = entry
+    transaction.on_commit(on_commit)
+
+
+def _deliver(entry):
+    scope = getattr(_local, 'scope', None)
+    if scope is None:
+        writer.submit(entry)
+    elif entry._audit_key in scope:
+        _merge(scope[entry._audit_key], entry)
+    else:
+        scope[entry._audit_key] = entry
+
+
+def begin_scope():
+    """Hold committed changes until end_scope() (one API request)"""
+    _local.scope = {}
+    _local.pending = {}
+
+
+def end_scope():
+    """Committed changes since begin_scope(), to be submitted by the caller"""
+    scope = getattr(_local, 'scope', None)
+    _local.scope = None
+    return list(scope.values()) if scope else []
+
+
+def submit(entries):
+    for entry in entries:
+        writer.submit(entry)
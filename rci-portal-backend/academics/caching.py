@@ -0,0 +1,247 @@
+# academics/caching.py
+
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+
+def _cache():
+    return caches[getattr(settings, 'TABLE_VERSION_CACHE', 'default')]
+
+
+# ========================================
+# TABLE VERSIONS
+# ========================================
+
+def _version_key(model):
+    return f'table-version:{model._meta.db_table}'
+
+
+def get_versions(keys):
+    """
+    Current value of each shared version counter, in the order given.
+
+    Counters start at a random value, so a counter lost to eviction or a
+    restart never comes back with a number that was already handed out.
+    """
+    store = _cache()
+    versions = store.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            store.add(key, random.getrandbits(48), None)
+            versions[key] = store.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_version(key, then=None):
+    """
+    Move a shared version counter on once the current transaction commits.
+    `then` is called with the new version, or None when the counter had
+    to be restarted.
+    """
+    def bump():
+        store = _cache()
+        try:
+            version = store.incr(key)
+        except ValueError:
+            store.add(key, random.getrandbits(48), None)
+            version = None
+        if then is not None:
+            then(version)
+
+    transaction.on_commit(bump)
+
+
+def get_table_versions(models):
+    """Current version of each model's table, in the order given"""
+    return get_versions([_version_key(model) for model in models])
+
+
+def bump_table_version(model):
+    """Move `model`'s table to a new version once the current transaction commits"""
+    bump_version(_version_key(model))
+
+
+# ========================================
+# CONDITIONAL GET
+# ========================================
+
+def _has_valid_token(request):
+    """Whether the request carries a valid access token (checked without a user lookup)"""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return False
+    try:
+        authentication.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return False
+    return True
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETags for responses that depend only on table contents.
+
+    The ETag hashes the versions of `version_models` with the action, object
+    key, query string and Accept header. A matching If-None-Match is
+    answered with 304 before authentication, queries or serialization;
+    the access token is still verified, just not looked up. Versions are
+    read before the response is built, so a concurrent write can only make
+    an ETag stale early, never label new data with an old tag.
+
+    Only use this on endpoints whose output is the same for every user.
+    """
+    version_models = ()
+    etag_actions = ('list', 'retrieve')
+
+    def compute_etag(self, request, action, kwargs):
+        versions = get_table_versions(self.version_models)
+        payload = '|'.join([
+            type(self).__name__,
+            action,
+            str(kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')),
+            '&'.join(f'{key}={value}' for key, value in sorted(request.GET.lists())),
+            request.META.get('HTTP_ACCEPT', ''),
+            ','.join(map(str, versions)),
+        ])
+        return '"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def dispatch(self, request, *args, **kwargs):
+        self.etag = None
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        if request.method in ('GET', 'HEAD') and action in self.etag_actions:
+            self.etag = self.compute_etag(request, action, kwargs)
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+            if if_none_match and _has_valid_token(request):
+                etags = parse_etags(if_none_match)
+                # If-None-Match uses weak comparison
+                if self.etag in [etag.removeprefix('W/') for etag in etags]:
+                    response = HttpResponseNotModified()
+                    self._add_validators(response)
+                    return response
+        return super().dispatch(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code == 200:
+            self._add_validators(response)
+        return response
+
+    def _add_validators(self, response):
+        response['ETag'] = self.etag
+        # Browsers must revalidate, and must not share responses between users
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+
+
+# ========================================
+# RESPONSE CACHE
+# ========================================
+
+class ResponseCache:
+    """Thread-safe in-process LRU of response data with a per-entry TTL"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache(
+    getattr(settings, 'RESPONSE_CACHE_MAX_ENTRIES', 1000),
+    getattr(settings, 'RESPONSE_CACHE_TTL', 300),
+)
+
+
+class ResponseCacheMixin:
+    """
+    Serve list/retrieve from `response_cache` when another request with the
+    same role and query string already built the response.
+
+    Keys hold the versions of `version_models`, so a committed write to any
+    of those tables makes older entries unreachable (LRU/TTL evicts them).
+    Roles in `per_user_roles` see user-scoped querysets and are cached per
+    user. Only response data is cached; rendering still happens per request.
+    """
+    version_models = ()
+    cache_actions = ('list', 'retrieve')
+    per_user_roles = ()
+
+    def response_cache_key(self, request, kwargs):
+        role = getattr(request.user, 'role', None)
+        return (
+            type(self).__name__,
+            self.action,
+            str(kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')),
+            role,
+            request.user.pk if role in self.per_user_roles else None,
+            # Pagination links are absolute URLs
+            request.get_host(),
+            tuple(sorted(
+                (name, tuple(values)) for name, values in request.query_params.lists()
+                if name != 'format'
+            )),
+            get_table_versions(self.version_models),
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.cache_actions:
+            return handler(request, *args, **kwargs)
+
+        # Versions are read before the data, like ETags
+        key = self.response_cache_key(request, kwargs)
+        data = response_cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response_cache.set(key, response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,215 @@
+# academics/compiled.py
+
+import threading
+from collections import OrderedDict
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from .models import User
+
+# Model methods used as field sources, mapped to the columns they read and
+# a function computing the same value from those columns
+COMPUTED_SOURCES = {
+    (User, 'get_full_name'): (
+        ('first_name', 'last_name'),
+        lambda first_name, last_name: f"{first_name} {last_name}".strip(),
+    ),
+}
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _computed(compute, reads):
+    return lambda row: compute(*[row[index] for index in reads])
+
+
+# ========================================
+# COMPILED SERIALIZER
+# ========================================
+
+class CompiledSerializer:
+    """
+    Read-only fast path for a DRF serializer.
+
+    The serializer's (already bound) fields are translated once into a
+    values_list() column list and a per-field plan of getters and
+    converters, so rows are serialized straight from database tuples
+    without creating model instances or walking serializer fields. The output matches the serializer,
+    including the key order and the keys DRF omits when a nullable relation
+    on a field's source is empty. Leaf values are converted with the
+    serializer's own field.to_representation.
+
+    Only plain model fields, primary-key relations and COMPUTED_SOURCES
+    are supported; anything else raises NotCompilable.
+    """
+
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.columns = []
+        self._index = {}
+        plan = []
+
+        for field in serializer._readable_fields:
+            reads, guards, compute = self._plan(field)
+            if compute is None:
+                get = itemgetter(reads[0])
+            else:
+                get = _computed(compute, reads)
+
+            # What to do when a nullable relation on the source is empty
+            if not guards:
+                missing = None
+            elif field.default is not empty:
+                raise NotCompilable(f'{field.field_name}: default on a nullable source')
+            elif field.allow_null:
+                missing = 'null'
+            elif not field.required:
+                # DRF raises SkipField and leaves the key out
+                missing = 'skip'
+            else:
+                raise NotCompilable(f'{field.field_name}: required field on a nullable source')
+
+            plan.append((field.field_name, get, self._converter(field), tuple(guards), missing))
+
+        def convert(row):
+            data = {}
+            for name, get, to_representation, guards, missing in plan:
+                if guards and any(row[index] is None for index in guards):
+                    if missing == 'null':
+                        data[name] = None
+                    continue
+                value = get(row)
+                data[name] = None if value is None else to_representation(value)
+            return data
+
+        self.convert = convert
+
+    def _column(self, lookup):
+        if lookup not in self._index:
+            self._index[lookup] = len(self.columns)
+            self.columns.append(lookup)
+        return self._index[lookup]
+
+    def _plan(self, field):
+        """Return (column indexes read, null-guard indexes, compute function or None)"""
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) or field.source == '*':
+            raise NotCompilable(f'{field.field_name}: {type(field).__name__}')
+
+        model, path, guards = self.model, [], []
+        attrs = field.source_attrs
+        for position, attr in enumerate(attrs):
+            last = position == len(attrs) - 1
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                computed = COMPUTED_SOURCES.get((model, attr))
+                if computed is None or not last:
+                    raise NotCompilable(f'{field.field_name}: unsupported source {field.source}')
+                columns, compute = computed
+                reads = [self._column('__'.join(path + [column])) for column in columns]
+                return reads, guards, compute
+
+            path.append(attr)
+            if model_field.is_relation:
+                if model_field.auto_created or not (model_field.many_to_one or model_field.one_to_one):
+                    raise NotCompilable(f'{field.field_name}: reverse or many relation {field.source}')
+                if last:
+                    if not isinstance(field, PrimaryKeyRelatedField):
+                        raise NotCompilable(f'{field.field_name}: {type(field).__name__}')
+                    return [self._column('__'.join(path))], guards, None
+                if model_field.null:
+                    guards.append(self._column('__'.join(path)))
+                model = model_field.related_model
+            elif not last:
+                raise NotCompilable(f'{field.field_name}: unsupported source {field.source}')
+
+        if isinstance(field, serializers.FileField):
+            raise NotCompilable(f'{field.field_name}: file fields need model instances')
+        return [self._column('__'.join(path))], guards, None
+
+    @staticmethod
+    def _converter(field):
+        if isinstance(field, PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                return field.pk_field.to_representation
+            return lambda value: value
+        return field.to_representation
+
+    def values(self, queryset):
+        """Turn a queryset into the tuples `convert` expects"""
+        return queryset.values_list(*self.columns)
+
+    def serialize(self, rows):
+        convert = self.convert
+        return [convert(row) for row in rows]
+
+
+# LRU of CompiledSerializers (or None) by serializer shape
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+COMPILED_MAX_ENTRIES = getattr(settings, 'COMPILED_SERIALIZER_MAX_ENTRIES', 256)
+
+
+def serializer_shape(serializer):
+    """
+    Key identifying what a serializer outputs: its class and the name,
+    type and source of each readable field. Serializers built from
+    equivalent ?fields= / ?expand= values (other order, spacing or
+    duplicates) share a shape; invalid values never get this far.
+    """
+    return (type(serializer),) + tuple(
+        (field.field_name, type(field), field.source) for field in serializer._readable_fields
+    )
+
+
+def compile_serializer(serializer, key):
+    """
+    Return a cached CompiledSerializer for `serializer`, or None when it
+    uses fields the fast path cannot reproduce. `key` must identify the
+    serializer's shape (see serializer_shape()).
+    """
+    with _compiled_lock:
+        if key in _compiled:
+            _compiled.move_to_end(key)
+            return _compiled[key]
+    try:
+        compiled = CompiledSerializer(serializer)
+    except NotCompilable:
+        compiled = None
+    with _compiled_lock:
+        _compiled[key] = compiled
+        while len(_compiled) > COMPILED_MAX_ENTRIES:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+# ========================================
+# VIEWSET MIXIN
+# ========================================
+
+class CompiledListMixin:
+    """
+    Serve `list` from values() tuples through a CompiledSerializer when the
+    requested serializer shape allows it, and fall back to the regular
+    serializer otherwise.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        compiled = compile_serializer(serializer, serializer_shape(serializer))
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+        return Response(compiled.serialize(queryset))
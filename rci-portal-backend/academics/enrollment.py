@@ -0,0 +1,464 @@
+# academics/enrollment.py
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Curriculum, Student, Section, Enrollment, WaitlistEntry
+from .prerequisites import PrerequisiteChecker, describe_prerequisites
+from .caching import bump_table_version
+from .reports import invalidate_reports
+from .scheduling import section_meetings, student_timetables
+
+# Upper bound for a single bulk request; keeps IN (...) lists within
+# database parameter limits and the transaction reasonably short.
+BULK_ENROLLMENT_MAX_ROWS = 5000
+
+SECTION_FULL = "Section is full"
+ALREADY_ENROLLED = "Student is already enrolled in this section for this term"
+
+
+# ========================================
+# SEAT ACCOUNTING
+# ========================================
+
+def holds_seat(status):
+    return status in Enrollment.SEAT_STATUSES
+
+
+def with_enrolled_count(sections):
+    """Annotate a Section queryset with `enrolled_count`: enrolled (not pending) enrollments"""
+    # Meta.ordering is not applied to aggregating queries
+    return sections.annotate(
+        enrolled_count=Count('enrollments', filter=Q(enrollments__status='enrolled'))
+    ).order_by(*Section._meta.ordering)
+
+
+def reserve_seats(section_id, count=1):
+    """
+    Atomically take `count` seats in a section.
+
+    The capacity check and the increment happen in one UPDATE statement,
+    so concurrent requests cannot oversubscribe a section. Returns False
+    when the section does not have enough free seats.
+    """
+    updated = Section.objects.filter(
+        pk=section_id, seats_taken__lte=F('capacity') - count
+    ).update(seats_taken=F('seats_taken') + count)
+    if updated:
+        bump_table_version(Section)
+    return updated == 1
+
+
+def release_seats(section_id, count=1):
+    """
+    Atomically give back `count` seats in a section. Waitlisted students
+    are moved up by the enrollment worker (see sweep_waitlists), not by
+    the request that freed the seat.
+    """
+    Section.objects.filter(
+        pk=section_id, seats_taken__gte=count
+    ).update(seats_taken=F('seats_taken') - count)
+    bump_table_version(Section)
+
+
+def move_seat(old_section_id, old_status, new_section_id, new_status, enforce_capacity=True):
+    """
+    Update seat counters for an enrollment whose section and/or status
+    changed (pass None/None for a new enrollment). Must run inside the
+    transaction that saves the enrollment.
+    """
+    same_section = old_section_id == new_section_id
+    old_holds, new_holds = holds_seat(old_status), holds_seat(new_status)
+
+    if new_holds and not (old_holds and same_section):
+        if enforce_capacity:
+            if not reserve_seats(new_section_id):
+                raise serializers.ValidationError({'section': [SECTION_FULL]})
+        else:
+            Section.objects.filter(pk=new_section_id).update(seats_taken=F('seats_taken') + 1)
+            bump_table_version(Section)
+
+    if old_holds and not (new_holds and same_section):
+        release_seats(old_section_id)
+
+
+# ========================================
+# ELIGIBILITY
+# ========================================
+
+def eligible_sections(student, term):
+    """
+    Sections in `term` the student can enroll in right now.
+
+    Applies the same rules as enrollment validation (prerequisites passed,
+    no duplicate enrollment, no timetable conflict) and also skips subjects
+    the student already passed or already holds a seat for, and full
+    sections. Costs five queries however large the catalog is (plus a
+    prerequisite graph build when the graph is cold).
+    """
+    checker = PrerequisiteChecker([student])
+    passed = checker.passed(student)
+
+    enrolled_sections, held_subjects = set(), set()
+    rows = Enrollment.objects.filter(student=student, term=term).values_list(
+        'section_id', 'section__subject_id', 'status'
+    )
+    for section_id, subject_id, status in rows:
+        enrolled_sections.add(section_id)
+        if holds_seat(status):
+            held_subjects.add(subject_id)
+
+    sections = list(with_enrolled_count(Section.objects.filter(term=term).select_related('subject', 'professor')))
+    meetings = section_meetings([section.pk for section in sections])
+    timetable = student_timetables([student.pk], [term])[(student.pk, term)]
+
+    eligible = []
+    for section in sections:
+        subject = section.subject
+        if section.pk in enrolled_sections or subject.pk in held_subjects:
+            continue
+        if str(subject.pk) in passed:
+            continue
+        if checker.unmet(student, subject):
+            continue
+        if section.seats_taken >= section.capacity:
+            continue
+        if timetable.conflicts(meetings[section.pk]):
+            continue
+        eligible.append(section)
+
+    return eligible
+
+
+# ========================================
+# BULK ENROLLMENT
+# ========================================
+
+class BulkEnrollmentRowSerializer(serializers.Serializer):
+    """Shape of one bulk enrollment row (no database access)"""
+    student = serializers.UUIDField()
+    section = serializers.UUIDField()
+    term = serializers.CharField(max_length=20)
+    status = serializers.ChoiceField(choices=Enrollment.STATUS_CHOICES, default='pending')
+
+
+def bulk_enroll(entries):
+    """
+    Validate and create many enrollments with set-based queries.
+
+    Every row is checked against the same rules as EnrollmentCreateSerializer
+    (prerequisites, duplicates, timetable conflicts) using a fixed number of
+    queries for the whole batch. Seats are then allocated per section under row locks and valid
+    rows are inserted with one bulk_create inside a single transaction.
+    Returns (results, created) where results has one entry per input row,
+    in input order.
+    """
+    results = [None] * len(entries)
+    rows = []
+
+    # 1. Shape validation
+    for index, entry in enumerate(entries):
+        row = BulkEnrollmentRowSerializer(data=entry)
+        if row.is_valid():
+            rows.append((index, row.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': row.errors}
+
+    created = _enroll_rows(rows, results)
+    return results, created
+
+
+def _enroll_rows(rows, results):
+    """
+    Steps 2-6 of bulk_enroll for shape-validated (index, data) rows. Fills
+    `results` in place and returns the created enrollments.
+    """
+    # 2. Load referenced students and sections (one query each)
+    students = Student.objects.in_bulk({data['student'] for _, data in rows})
+    sections = Section.objects.select_related('subject').in_bulk({data['section'] for _, data in rows})
+
+    # 3. Existing enrollments for the students/sections involved
+    existing = set(
+        Enrollment.objects.filter(
+            student_id__in=students.keys(), section_id__in=sections.keys()
+        ).values_list('student_id', 'section_id', 'term')
+    )
+
+    # 4. Passed grades for every prerequisite referenced in the batch
+    references = {ref for section in sections.values() for ref in (section.subject.prerequisites or [])}
+    checker = PrerequisiteChecker(students.keys(), references)
+
+    # 5. Meetings of the requested sections and the students' current timetables
+    meetings = section_meetings(sections.keys())
+    timetables = student_timetables(students.keys(), {data['term'] for _, data in rows})
+
+    seen = set()
+    pending = []
+    for index, data in rows:
+        student = students.get(data['student'])
+        section = sections.get(data['section'])
+        errors = []
+
+        if student is None:
+            errors.append("Student not found")
+        if section is None:
+            errors.append("Section not found")
+
+        if not errors:
+            unmet = checker.unmet(student, section.subject)
+            if unmet:
+                labels = describe_prerequisites(unmet, checker.graph)
+                errors.extend(f"Prerequisite not met: {labels[ref]}" for ref in unmet)
+
+            key = (student.pk, section.pk, data['term'])
+            if key in existing:
+                errors.append(ALREADY_ENROLLED)
+            elif key in seen:
+                errors.append("Duplicate row in request")
+            seen.add(key)
+
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+            continue
+
+        pending.append((index, Enrollment(
+            student=student, section=section, term=data['term'], status=data['status']
+        )))
+
+    # 6. Allocate seats and insert all valid rows in one transaction
+    with transaction.atomic():
+        wanted = Counter(e.section_id for _, e in pending if holds_seat(e.status))
+        remaining = {
+            section_id: capacity - seats_taken
+            for section_id, capacity, seats_taken in Section.objects.select_for_update().filter(
+                pk__in=wanted.keys()
+            ).values_list('section_id', 'capacity', 'seats_taken')
+        }
+
+        accepted = []
+        taken = Counter()
+        for index, enrollment in pending:
+            if holds_seat(enrollment.status):
+                # Rows earlier in the batch count towards the student's timetable
+                timetable = timetables[(enrollment.student_id, enrollment.term)]
+                conflicts = timetable.conflicts(meetings[enrollment.section_id])
+                if conflicts:
+                    results[index] = {'index': index, 'status': 'error', 'errors': [
+                        f"Schedule conflict with {label}" for label in conflicts
+                    ]}
+                    continue
+                if remaining.get(enrollment.section_id, 0) <= 0:
+                    results[index] = {'index': index, 'status': 'error', 'errors': [SECTION_FULL]}
+                    continue
+                remaining[enrollment.section_id] -= 1
+                taken[enrollment.section_id] += 1
+                section = sections[enrollment.section_id]
+                timetable.add(meetings[enrollment.section_id], f"{section.subject.code} ({section.schedule})")
+            accepted.append((index, enrollment))
+
+        for section_id, count in taken.items():
+            Section.objects.filter(pk=section_id).update(seats_taken=F('seats_taken') + count)
+        if taken:
+            bump_table_version(Section)
+
+        created = Enrollment.objects.bulk_create([enrollment for _, enrollment in accepted])
+
+    # bulk_create sends no post_save, so drop cached CORs here
+    for student_id in {enrollment.student_id for enrollment in created}:
+        invalidate_reports(student_id)
+
+    for index, enrollment in accepted:
+        results[index] = {
+            'index': index,
+            'status': 'created',
+            'enrollment_id': str(enrollment.enrollment_id),
+        }
+
+    return created
+
+
+# ========================================
+# COHORT (BLOCK) ENROLLMENT
+# ========================================
+
+class CohortEnrollmentSerializer(serializers.Serializer):
+    """Parameters of a block enrollment"""
+    program = serializers.UUIDField()
+    year_level = serializers.IntegerField(min_value=1, max_value=4)
+    semester = serializers.ChoiceField(choices=Curriculum.SEMESTER_CHOICES)
+    term = serializers.CharField(max_length=20)
+    section_name = serializers.CharField(max_length=50)
+    status = serializers.ChoiceField(choices=Enrollment.STATUS_CHOICES, default='enrolled')
+
+
+def cohort_enroll(program, year_level, semester, term, section_name, status='enrolled'):
+    """
+    Enroll every active year-N student of a program in the curriculum
+    subjects of that year/semester, using the `section_name` block section
+    of each subject in `term`.
+
+    Runs through the same set-based validation and single transaction as
+    bulk_enroll. Students already enrolled in a block section are skipped,
+    so the operation can safely be re-run. Returns a summary dict, or
+    raises ValidationError if the curriculum or block does not exist or
+    the cohort needs more than BULK_ENROLLMENT_MAX_ROWS enrollments.
+    """
+    curriculum = Curriculum.objects.filter(
+        program_id=program, year_level=year_level, semester=semester
+    ).first()
+    if curriculum is None:
+        raise serializers.ValidationError({'curriculum': ['No curriculum for this program, year level and semester']})
+
+    # Block section of each curriculum subject
+    sections = {}
+    for section_id, subject_id in Section.objects.filter(
+        subject__curriculum=curriculum, term=term, section_name=section_name
+    ).order_by('section_id').values_list('section_id', 'subject_id'):
+        sections.setdefault(subject_id, section_id)
+    if not sections:
+        raise serializers.ValidationError({'section_name': [f'No {section_name} sections in {term} for this curriculum']})
+
+    subjects = dict(curriculum.subjects.values_list('subject_id', 'code'))
+    students = dict(
+        Student.objects.filter(program_id=program, year_level=year_level, status='enrolled')
+        .values_list('student_id', 'student_number')
+    )
+    # Same limit as a bulk request, which this is with rows built here
+    if len(students) * len(sections) > BULK_ENROLLMENT_MAX_ROWS:
+        raise serializers.ValidationError({'non_field_errors': [
+            f'The cohort needs {len(students) * len(sections)} enrollments; '
+            f'at most {BULK_ENROLLMENT_MAX_ROWS} per request'
+        ]})
+
+    rows = []
+    for student_id in students:
+        for section_id in sections.values():
+            data = {'student': student_id, 'section': section_id, 'term': term, 'status': status}
+            rows.append((len(rows), data))
+
+    results = [None] * len(rows)
+    created = _enroll_rows(rows, results)
+
+    errors, skipped = [], 0
+    for (_, data), result in zip(rows, results):
+        if result['status'] == 'created':
+            continue
+        if result['errors'] == [ALREADY_ENROLLED]:
+            skipped += 1
+            continue
+        errors.append({
+            'student': str(data['student']),
+            'student_number': students[data['student']],
+            'section': str(data['section']),
+            'errors': result['errors'],
+        })
+
+    return {
+        'students': len(students),
+        'sections': len(sections),
+        'created': len(created),
+        'skipped': skipped,
+        'failed': len(errors),
+        'missing_sections': sorted(code for subject_id, code in subjects.items() if subject_id not in sections),
+        'errors': errors,
+    }
+
+
+# ========================================
+# WAITLIST / QUEUED ADMISSION
+# ========================================
+
+def _error_message(errors):
+    if isinstance(errors, dict):
+        errors = [f"{field}: {', '.join(map(str, messages))}" for field, messages in errors.items()]
+    return '; '.join(map(str, errors))[:255]
+
+
+def _admit(entries):
+    """
+    Run waitlist entries through bulk_enroll in order and record the
+    outcome of each: admitted, waitlisted (section full) or rejected.
+    """
+    # Entries never jump ahead of students already waitlisted for the section
+    waiting = set(
+        WaitlistEntry.objects.filter(
+            section_id__in={entry.section_id for entry in entries if entry.status == 'queued'},
+            status='waitlisted',
+        ).values_list('section_id', flat=True)
+    )
+    now = timezone.now()
+
+    admissible = []
+    for entry in entries:
+        if entry.status == 'queued' and entry.section_id in waiting:
+            entry.status, entry.message, entry.processed_at = 'waitlisted', SECTION_FULL, now
+        else:
+            admissible.append(entry)
+
+    rows = [{'student': e.student_id, 'section': e.section_id, 'term': e.term} for e in admissible]
+    results, _ = bulk_enroll(rows) if rows else ([], [])
+
+    for entry, result in zip(admissible, results):
+        entry.processed_at = now
+        if result['status'] == 'created':
+            entry.status, entry.message = 'admitted', ''
+            entry.enrollment_id = result['enrollment_id']
+        elif result['errors'] == [SECTION_FULL]:
+            entry.status, entry.message = 'waitlisted', SECTION_FULL
+        else:
+            entry.status, entry.message = 'rejected', _error_message(result['errors'])
+
+    WaitlistEntry.objects.bulk_update(entries, ['status', 'enrollment', 'message', 'processed_at'])
+
+
+def process_queue(batch_size=200):
+    """
+    Admit the oldest queued entries. Returns the number of entries processed.
+    Rows are claimed with SKIP LOCKED so several workers can share the queue.
+    """
+    with transaction.atomic():
+        entries = list(
+            WaitlistEntry.objects.select_for_update(skip_locked=True)
+            .filter(status='queued').order_by('timestamp')[:batch_size]
+        )
+        if entries:
+            _admit(entries)
+    return len(entries)
+
+
+def promote_waitlist(section_id):
+    """Admit waitlisted entries for a section, oldest first, while seats remain"""
+    with transaction.atomic():
+        section = Section.objects.select_for_update().filter(pk=section_id).values(
+            'capacity', 'seats_taken'
+        ).first()
+        free = section['capacity'] - section['seats_taken'] if section else 0
+        if free <= 0:
+            return 0
+
+        entries = list(
+            WaitlistEntry.objects.select_for_update(skip_locked=True)
+            .filter(section_id=section_id, status='waitlisted').order_by('timestamp')[:free]
+        )
+        if entries:
+            _admit(entries)
+    return len(entries)
+
+
+def sweep_waitlists():
+    """
+    Promote waitlists of every section that has free seats again.
+
+    This is the worker's promotion queue: a section is due as soon as a
+    committed drop, deletion or capacity increase leaves it with a free
+    seat and a waitlist, so nothing is lost if a worker is down when the
+    seat frees.
+    """
+    section_ids = Section.objects.filter(
+        waitlist_entries__status='waitlisted', seats_taken__lt=F('capacity')
+    ).values_list('section_id', flat=True).distinct()
+    return sum(promote_waitlist(section_id) for section_id in section_ids)
@@ -0,0 +1,133 @@
+# academics/exports.py
+
+import csv
+import io
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .compiled import compile_serializer, serializer_shape
+
+# Rows fetched per database round trip, and rows per chunk written to the client
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _rows(data):
+    """Rows of a regular (non-streamed) response body"""
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return data['results']
+    if isinstance(data, list):
+        return data
+    return [data] if data is not None else []
+
+
+# ========================================
+# RENDERERS
+# ========================================
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV with a header row. Nested values (JSON fields, expansions) are
+    written as JSON; missing and null values as empty cells.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = _rows(data)
+        columns = list(dict.fromkeys(name for row in rows for name in row)) if rows and isinstance(rows[0], dict) else []
+        return ''.join(self.stream(rows, columns)).encode(self.charset)
+
+    def stream(self, rows, columns):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, 1):
+            writer.writerow([self.cell(row.get(name)) for name in columns])
+            if count % EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def cell(value):
+        if value is None:
+            return ''
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, cls=JSONEncoder)
+        return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON: one object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ''.join(self.stream(_rows(data))).encode(self.charset)
+
+    def stream(self, rows, columns=None):
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        lines = []
+        for row in rows:
+            lines.append(encoder.encode(row))
+            if len(lines) == EXPORT_CHUNK_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+# ========================================
+# VIEWSET MIXIN
+# ========================================
+
+class ExportMixin:
+    """
+    Stream the whole filtered list with ?format=csv or ?format=ndjson.
+
+    The queryset is the one `list` would use (same filters, scoping and
+    ?fields=), read with a chunked server-side iterator and written out as
+    it is serialized, so memory stays flat however many rows are exported.
+    Serializers the compiled path supports are fed values() rows.
+    """
+    export_formats = (CSVRenderer.format, NDJSONRenderer.format)
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, NDJSONRenderer]
+
+    def is_export(self, request):
+        renderer = getattr(request, 'accepted_renderer', None)
+        return renderer is not None and renderer.format in self.export_formats
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_export(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+
+        compiled = compile_serializer(serializer, serializer_shape(serializer))
+        if compiled is not None:
+            convert = compiled.convert
+            rows = (convert(row) for row in compiled.values(queryset).iterator(chunk_size=EXPORT_CHUNK_SIZE))
+        else:
+            rows = (serializer.to_representation(obj) for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+        return self.export_response(serializer, rows)
+
+    def export_response(self, serializer, rows):
+        """Stream `rows` (dicts shaped by `serializer`) in the requested export format"""
+        renderer = self.request.accepted_renderer
+        columns = [name for name, field in serializer.fields.items() if not field.write_only]
+        response = StreamingHttpResponse(
+            (chunk.encode(renderer.charset) for chunk in renderer.stream(rows, columns)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        filename = f"{self.basename}-{timezone.localdate():%Y%m%d}.{renderer.format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
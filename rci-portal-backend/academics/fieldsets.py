@@ -0,0 +1,175 @@
+# academics/fieldsets.py
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def requested_fields(request):
+    """Parse ?fields=a,b,c into a list of names, or None when absent"""
+    value = request.query_params.get(FIELDS_PARAM) if request is not None else None
+    if not value:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_expansions(request):
+    """Parse ?expand=section.subject,student.user into {'section': {'subject': {}}, 'student': {'user': {}}}"""
+    value = request.query_params.get(EXPAND_PARAM) if request is not None else None
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+# ========================================
+# SERIALIZER MIXIN
+# ========================================
+
+class DynamicFieldsMixin:
+    """
+    Accept `fields` (top-level fields to keep) and `expand` (a tree of
+    relations to nest) arguments.
+
+    `Meta.expandable_fields` maps an expansion name to (field class, kwargs);
+    nested DynamicFieldsMixin serializers receive the rest of the tree, so
+    'section.subject' nests the section and, inside it, the subject.
+    Naming an expansion-only field (e.g. professor_name) in `fields` expands
+    it as well.
+
+    `Meta.sparse_dependencies` maps computed fields (SerializerMethodField,
+    source='*') to the columns/relations they read, so the viewset can work
+    out which columns to defer and which joins to make.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        expand = dict(expand or {})
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in fields or ():
+            if name in expandable and name not in expand and name not in self.fields:
+                expand[name] = {}
+
+        unknown = [name for name in expand if name not in expandable]
+        if unknown:
+            raise serializers.ValidationError({EXPAND_PARAM: [f"Unknown expansion(s): {', '.join(unknown)}"]})
+
+        for name, children in expand.items():
+            field_class, options = expandable[name]
+            if issubclass(field_class, DynamicFieldsMixin):
+                self.fields[name] = field_class(expand=children, **options)
+            elif children:
+                raise serializers.ValidationError({EXPAND_PARAM: [f"{name} cannot be expanded further"]})
+            else:
+                self.fields[name] = field_class(**options)
+
+        if fields is None:
+            return
+
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise serializers.ValidationError({FIELDS_PARAM: [f"Unknown field(s): {', '.join(unknown)}"]})
+
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+
+    def _lookups(self):
+        """ORM-style paths ('student__user__get_full_name') the kept fields read"""
+        dependencies = getattr(self.Meta, 'sparse_dependencies', {})
+        for name, field in self.fields.items():
+            yield from dependencies.get(name, ())
+            if field.source == '*':
+                continue
+            source = field.source.replace('.', '__')
+            yield source
+            if isinstance(field, DynamicFieldsMixin):
+                for lookup in field._lookups():
+                    yield f'{source}__{lookup}'
+
+    def deferred_columns(self):
+        """Local, non-relational model columns none of the kept fields read"""
+        used = {lookup.split('__')[0] for lookup in self._lookups()}
+        return [
+            field.name for field in self.Meta.model._meta.concrete_fields
+            if not field.is_relation and not field.primary_key and field.name not in used
+        ]
+
+    def related_paths(self):
+        """Forward relation paths ('student__user') the kept fields traverse"""
+        paths = set()
+        for lookup in self._lookups():
+            model, parts = self.Meta.model, []
+            for part in lookup.split('__'):
+                try:
+                    field = model._meta.get_field(part)
+                except FieldDoesNotExist:
+                    break
+                if not (field.is_relation and (field.many_to_one or field.one_to_one)):
+                    break
+                parts.append(part)
+                paths.add('__'.join(parts))
+                model = field.related_model
+        return paths
+
+
+# ========================================
+# VIEWSET MIXIN
+# ========================================
+
+class DynamicFieldsViewSetMixin:
+    """
+    Honour ?fields= and ?expand= on list/retrieve requests.
+
+    The queryset is planned from the resulting serializer: list requests
+    join exactly the relations the serializer reads (select_related), and
+    with ?fields= the columns no kept field needs are deferred, so they are
+    neither read from the database nor decoded.
+    """
+    dynamic_actions = ('list', 'retrieve')
+
+    def dynamic_field_options(self):
+        if self.request.method != 'GET' or self.action not in self.dynamic_actions:
+            return {}
+        options = {}
+        fields = requested_fields(self.request)
+        if fields is not None:
+            options['fields'] = fields
+        expand = requested_expansions(self.request)
+        if expand:
+            options['expand'] = expand
+        return options
+
+    def get_serializer(self, *args, **kwargs):
+        for name, value in self.dynamic_field_options().items():
+            kwargs.setdefault(name, value)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method != 'GET' or self.action not in self.dynamic_actions:
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, DynamicFieldsMixin):
+            return queryset
+        options = self.dynamic_field_options()
+        serializer = serializer_class(context=self.get_serializer_context(), **options)
+
+        # Join what the serializer reads. Retrieve keeps the viewset's own
+        # joins too, since object permissions may follow them.
+        needed = serializer.related_paths()
+        if self.action == 'list':
+            queryset = queryset.select_related(None)
+        if needed:
+            queryset = queryset.select_related(*sorted(needed))
+
+        if 'fields' in options:
+            deferred = serializer.deferred_columns()
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        return queryset
@@ -0,0 +1,129 @@
+# academics/idempotency.py
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Response headers worth replaying alongside the stored body
+REPLAYED_RESPONSE_HEADERS = ('Location',)
+
+
+def _store():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def _lock_ttl():
+    return getattr(settings, 'IDEMPOTENCY_LOCK_TTL', 60)
+
+
+class IdempotentReplay(APIException):
+    """Raised from `initial` to short-circuit a request with a stored response"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+# ========================================
+# IDEMPOTENCY MIXIN
+# ========================================
+
+class IdempotencyMixin:
+    """
+    Honour an `Idempotency-Key` header on write actions.
+
+    The first request with a key runs normally and its response (2xx/4xx)
+    is kept for IDEMPOTENCY_KEY_TTL seconds. Retries with the same key and
+    body get that response back with an `Idempotent-Replayed: true` header,
+    without running validation or touching the business tables. Keys are
+    scoped to the user, method and path; entries are a SHA-256 fingerprint
+    of the body plus the response data.
+
+    Also turns IntegrityErrors from racing writes into 409 responses.
+    """
+    idempotent_actions = ('create',)
+
+    def _idempotency_key(self, request):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or self.action not in self.idempotent_actions:
+            return None
+        scope = f"{request.user.pk}:{request.method}:{request.path}:{key}"
+        return 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._idempotency = None
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key and len(key) > MAX_KEY_LENGTH:
+            raise IdempotentReplay(Response({
+                'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'
+            }, status=status.HTTP_400_BAD_REQUEST))
+
+        cache_key = self._idempotency_key(request)
+        if cache_key is None:
+            return
+
+        store = _store()
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+        record = store.get(cache_key)
+
+        if record is not None:
+            if record['fingerprint'] != fingerprint:
+                raise IdempotentReplay(Response({
+                    'error': f'{IDEMPOTENCY_HEADER} was already used with a different request body'
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY))
+            headers = dict(record['headers'], **{REPLAYED_HEADER: 'true'})
+            raise IdempotentReplay(Response(record['data'], status=record['status'], headers=headers))
+
+        # Only one request per key may run at a time
+        if not store.add(cache_key + ':lock', 1, _lock_ttl()):
+            raise IdempotentReplay(Response({
+                'error': 'A request with this idempotency key is already in progress'
+            }, status=status.HTTP_409_CONFLICT))
+
+        self._idempotency = (cache_key, fingerprint)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, IdempotentReplay):
+            return exc.response
+        if isinstance(exc, IntegrityError):
+            return Response({
+                'error': 'This record conflicts with an existing one'
+            }, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        pending = getattr(self, '_idempotency', None)
+        if pending is not None:
+            self._idempotency = None
+            cache_key, fingerprint = pending
+            store = _store()
+            # Server errors are not stored so the client can retry them
+            if response.status_code < 500 and response.status_code != status.HTTP_409_CONFLICT:
+                store.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                    'headers': {
+                        name: response[name] for name in REPLAYED_RESPONSE_HEADERS if response.has_header(name)
+                    },
+                }, _ttl())
+            store.delete(cache_key + ':lock')
+
+        return response
@@ -0,0 +1,63 @@
+# academics/management/commands/archive_audit_logs.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from academics.archive import add_months, archive_month, is_month, month_bounds, month_of
+from academics.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Move audit log months older than the retention period from the "
+        "audit_logs table to compressed JSONL segments under AUDIT_ARCHIVE_DIR"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int,
+                            default=getattr(settings, 'AUDIT_RETENTION_MONTHS', 6),
+                            help='Months kept in the table, counting the current one')
+        parser.add_argument('--month', action='append',
+                            help='Archive this month (YYYY-MM) only; may be repeated')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows fetched and deleted per round trip')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the months that would be archived')
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 1:
+            raise CommandError('--keep-months must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        current = month_of(timezone.now())
+        cutoff = add_months(current, 1 - options['keep_months'])
+
+        if options['month']:
+            for month in options['month']:
+                if not is_month(month):
+                    raise CommandError(f'Invalid month "{month}", expected YYYY-MM')
+                if month >= current:
+                    raise CommandError(f'{month} is not over yet and cannot be archived')
+            months = sorted(set(options['month']))
+        else:
+            months = sorted({
+                month_of(moment) for moment in AuditLog.objects.filter(
+                    timestamp__lt=month_bounds(cutoff)[0]
+                ).annotate(month=TruncMonth('timestamp')).values_list('month', flat=True).distinct()
+            })
+
+        if not months:
+            self.stdout.write("Nothing to archive")
+            return
+
+        for month in months:
+            if options['dry_run']:
+                start, end = month_bounds(month)
+                count = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end).count()
+                self.stdout.write(f"{month}: {count} entries would be archived")
+                continue
+            moved = archive_month(month, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"{month}: archived {moved} entries"))
@@ -0,0 +1,156 @@
+# academics/management/commands/benchmark_audit_queries.py
+
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from academics.models import AuditLog, User
+from academics.views import AuditLogViewSet
+
+PREFIX = 'benchmark'
+SEED_BATCH = 5000
+
+
+class Rollback(Exception):
+    pass
+
+
+def _plan_flags(plan, vendor):
+    """(walks a whole table or index, sort step, index-only) for a SQLite, PostgreSQL or MySQL plan"""
+    text = plan.upper()
+    if vendor == 'sqlite':
+        # SEARCH is a range lookup; SCAN reads from one end (LIMIT may stop it early)
+        return ' SCAN ' in f' {text} ', 'TEMP B-TREE' in text, 'COVERING INDEX' in text
+    if vendor == 'postgresql':
+        return 'SEQ SCAN' in text, 'SORT' in text, 'INDEX ONLY SCAN' in text
+    return 'ALL' in text.split(), 'FILESORT' in text, 'USING INDEX' in text
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the query plans and timings of the audit log list endpoint's "
+        "queries (first page and count) for each filter"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Create this many temporary audit entries for the run; '
+                                 'they are rolled back afterwards')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per query; the best run is reported')
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                self.benchmark(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        self.stdout.write(f"Seeding {count} temporary audit entries on {connection.vendor}")
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(username=f'{PREFIX}_audit_{n}', email=f'{PREFIX}_audit_{n}@benchmark.invalid',
+                 password=password, role='registrar')
+            for n in range(50)
+        ])
+        entities = [value for value, _ in AuditLog.ENTITY_CHOICES]
+        actions = [value for value, _ in AuditLog.ACTION_CHOICES]
+        rng = random.Random(0)
+        now = timezone.now()
+        for offset in range(0, count, SEED_BATCH):
+            AuditLog.objects.bulk_create([
+                AuditLog(
+                    entity=rng.choice(entities), action=rng.choice(actions), user=rng.choice(users),
+                    details={'seed': n}, timestamp=now - datetime.timedelta(seconds=n * 7),
+                )
+                for n in range(offset, min(offset + SEED_BATCH, count))
+            ])
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def benchmark(self, options):
+        some = AuditLog.objects.order_by('-timestamp').first()
+        if some is None:
+            self.stdout.write(self.style.WARNING("No audit entries (use --seed)"))
+            return
+        month = timezone.localtime(some.timestamp).strftime('%Y-%m')
+
+        cases = [
+            ('no filter', {}),
+            ('entity', {'entity': some.entity}),
+            ('action', {'action': some.action}),
+            ('user', {'user': str(some.user_id)} if some.user_id else None),
+            ('entity + month', {'entity': some.entity, 'month': month}),
+        ]
+        factory = APIRequestFactory()
+        self.stdout.write(f"{AuditLog.objects.count()} audit entries on {connection.vendor}\n")
+
+        for label, params in cases:
+            if params is None:
+                continue
+            view = AuditLogViewSet(
+                request=Request(factory.get('/api/audit-logs/', params)), format_kwarg=None, action='list',
+            )
+            queryset = view.get_queryset()
+            # What KeysetPagination runs: the first page in list order, and the count
+            page = queryset.order_by('-timestamp', '-log_id')
+            self.report(f"{label}: first page", lambda: list(page[:options['page_size']]), options)
+            self.report(f"{label}: count", queryset.order_by().count, options)
+
+        # For comparison: the substring filter the endpoint used before
+        legacy = AuditLog.objects.filter(entity__icontains=some.entity.lower())
+        self.report("entity, icontains (before): first page",
+                    lambda: list(legacy.order_by('-timestamp', '-log_id')[:options['page_size']]), options)
+        self.report("entity, icontains (before): count", legacy.order_by().count, options)
+
+    def report(self, label, run, options):
+        best = min(self.timed(run) for _ in range(options['repeat']))
+        plan = self.explain(run)
+        scan, sort, covering = _plan_flags(plan, connection.vendor)
+
+        notes = [self.style.WARNING('scan') if scan else self.style.SUCCESS('index search')]
+        if covering:
+            notes.append(self.style.SUCCESS('index only'))
+        if sort:
+            notes.append(self.style.WARNING('sort'))
+        self.stdout.write(f"{label}: {best * 1000:.2f} ms [{', '.join(notes)}]")
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
+
+    @staticmethod
+    def explain(run):
+        """Plan of the last statement `run` executes, exactly as sent"""
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            run()
+        sql, params = statements[-1]
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall())
+
+    @staticmethod
+    def timed(run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
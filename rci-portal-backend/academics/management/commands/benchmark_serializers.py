@@ -0,0 +1,158 @@
+# academics/management/commands/benchmark_serializers.py
+
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+
+from academics.compiled import CompiledSerializer, NotCompilable
+from academics.models import (
+    User, Program, Curriculum, Subject, Section, Student, Enrollment, Grade,
+)
+from academics.serializers import EnrollmentSerializer, GradeSerializer
+
+PREFIX = 'benchmark'
+TERM = 'BENCHMARK'
+
+TARGETS = {
+    'enrollments': (Enrollment, EnrollmentSerializer),
+    'grades': (Grade, GradeSerializer),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list serialization throughput (rows/sec) of the regular DRF "
+        "serializers with the compiled values() path, and check both render "
+        "identical JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=None,
+                            help='Rows to serialize per run (default: all)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per path; the best run is reported')
+        parser.add_argument('--fields',
+                            help='Comma-separated field list, as with ?fields=')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Create this many temporary students (one enrollment and '
+                                 'grade each) for the run; they are rolled back afterwards')
+        parser.add_argument('--target', choices=sorted(TARGETS), action='append',
+                            help='Serializer to benchmark (default: all)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        fields = [name.strip() for name in options['fields'].split(',')] if options['fields'] else None
+        targets = options['target'] or sorted(TARGETS)
+
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                for name in targets:
+                    self.benchmark(name, fields, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        self.stdout.write(f"Seeding {count} temporary students on {connection.vendor}")
+        password = make_password(None)
+
+        professor = User.objects.create(
+            username=f'{PREFIX}_prof', email=f'{PREFIX}_prof@benchmark.invalid',
+            password=password, role='professor', first_name='Bench', last_name='Professor',
+        )
+        program = Program.objects.create(
+            program_code='BENCHMARK', program_name='Benchmark', department='Benchmark', sector='Benchmark'
+        )
+        curriculum = Curriculum.objects.create(program=program, year_level=1, semester='1st')
+        subject = Subject.objects.create(code='BENCH-1', title='Benchmark Subject', units=3, curriculum=curriculum)
+        section = Section.objects.create(
+            section_name='BENCH', subject=subject, term=TERM, professor=professor,
+            schedule='SAT 7:00-8:00', room='BENCH', capacity=count,
+        )
+
+        users = User.objects.bulk_create([
+            User(
+                username=f'{PREFIX}_{n:06d}', email=f'{PREFIX}_{n:06d}@benchmark.invalid',
+                password=password, role='student', first_name='Bench', last_name=f'Student {n}',
+            )
+            for n in range(count)
+        ])
+        students = Student.objects.bulk_create([
+            Student(user=user, student_number=f'BM-{n:06d}', program=program, year_level=1)
+            for n, user in enumerate(users)
+        ])
+        Enrollment.objects.bulk_create([
+            Enrollment(student=student, section=section, term=TERM, status='enrolled')
+            for student in students
+        ])
+        Grade.objects.bulk_create([
+            Grade(
+                student=student, subject=subject, section=section, grade='1.75', status='passed',
+                # Leave some unencoded so the nullable-relation path is exercised
+                encoded_by=professor if n % 2 else None,
+            )
+            for n, student in enumerate(students)
+        ])
+
+    def benchmark(self, name, fields, options):
+        model, serializer_class = TARGETS[name]
+        serializer = serializer_class(fields=fields)
+        try:
+            compiled = CompiledSerializer(serializer)
+        except NotCompilable as exc:
+            raise CommandError(f"{name}: {exc}")
+
+        # Same queryset plan the list endpoint uses
+        queryset = model.objects.select_related(*sorted(serializer.related_paths())).order_by('pk')
+        if fields is not None:
+            deferred = serializer.deferred_columns()
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        if options['rows']:
+            queryset = queryset[:options['rows']]
+
+        def regular():
+            return serializer_class(queryset, many=True, fields=fields).data
+
+        def fast():
+            return compiled.serialize(compiled.values(queryset))
+
+        rows = len(fast())
+        if not rows:
+            self.stdout.write(self.style.WARNING(f"{name}: no rows (use --seed)"))
+            return
+
+        renderer = JSONRenderer()
+        identical = renderer.render(regular()) == renderer.render(fast())
+
+        regular_time = self.best(regular, options['repeat'])
+        compiled_time = self.best(fast, options['repeat'])
+
+        self.stdout.write(f"{name} ({rows} rows, best of {options['repeat']})")
+        self.stdout.write(f"  regular   {rows / regular_time:12,.0f} rows/sec  {regular_time * 1000:9.1f} ms")
+        self.stdout.write(f"  compiled  {rows / compiled_time:12,.0f} rows/sec  {compiled_time * 1000:9.1f} ms")
+        self.stdout.write(f"  speedup   {regular_time / compiled_time:12.1f}x")
+        if identical:
+            self.stdout.write(self.style.SUCCESS("  JSON output identical"))
+        else:
+            self.stdout.write(self.style.ERROR("  JSON output differs"))
+
+    @staticmethod
+    def best(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
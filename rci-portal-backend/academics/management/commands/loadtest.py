@@ -0,0 +1,393 @@
+# academics/management/commands/loadtest.py
+
+import html
+import logging
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import connection, connections, transaction
+from django.db.models import Count, F, Q
+from django.test import Client
+from django.test.utils import override_settings
+
+from academics.models import (
+    User, Program, Curriculum, Subject, Section, Student, Enrollment, WaitlistEntry,
+)
+
+PREFIX = 'loadtest'
+PROGRAM_CODE = 'LOADTEST'
+
+# Error text that means the database made a request wait on (or give up on) a lock
+LOCK_ERRORS = ('locked', 'deadlock', 'lock timeout', 'could not serialize', 'could not obtain lock')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(samples)) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
+
+
+def is_test_database(settings_dict):
+    """Whether a DATABASES entry is an in-memory or test_ database, which seeding cannot harm"""
+    name = str(settings_dict['NAME'])
+    test_name = (settings_dict.get('TEST') or {}).get('NAME')
+    return (
+        name == ':memory:' or 'mode=memory' in name
+        or (test_name is not None and name == str(test_name))
+        or Path(name).name.startswith('test_')
+    )
+
+
+def error_summary(text):
+    """One line describing a 5xx body: the exception of a DEBUG error page, else the start of the text"""
+    match = (re.search(r'<pre class="exception_value">(.*?)</pre>', text, re.S)
+             or re.search(r'<title>(.*?)</title>', text, re.S))
+    if match:
+        text = match.group(1)
+    return ' '.join(html.unescape(re.sub(r'<[^>]+>', ' ', text)).split())
+
+
+# ========================================
+# HTTP TRANSPORTS
+# ========================================
+
+class InProcessTransport:
+    """Drive the API through Django's test client (no server needed)"""
+
+    def __init__(self):
+        self.exceptions = Counter()
+        self._lock = threading.Lock()
+        got_request_exception.connect(self._record_exception)
+
+    def close(self):
+        got_request_exception.disconnect(self._record_exception)
+
+    def _record_exception(self, sender, **kwargs):
+        exc = sys.exc_info()[1]
+        if exc is not None:
+            with self._lock:
+                self.exceptions[f"{type(exc).__name__}: {exc}"[:120]] += 1
+
+    def request(self, method, path, token=None, data=None, headers=None):
+        client = Client(raise_request_exception=False)
+        extra = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in (headers or {}).items()}
+        if token:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        if method == 'GET':
+            response = client.get(path, data, **extra)
+        else:
+            response = client.post(path, data, content_type='application/json', **extra)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def finish_worker(self):
+        # Mirror per-request connection handling (CONN_MAX_AGE=0)
+        connections.close_all()
+
+
+class HTTPTransport:
+    """Drive a running server over HTTP with `requests`"""
+
+    def __init__(self, base_url):
+        try:
+            import requests
+        except ImportError:
+            raise CommandError("--base-url needs the 'requests' package")
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.exceptions = Counter()
+        self._local = threading.local()
+
+    def close(self):
+        pass
+
+    def request(self, method, path, token=None, data=None, headers=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        url = self.base_url + path.removeprefix('/api')
+        try:
+            if method == 'GET':
+                response = session.get(url, params=data, headers=headers, timeout=60)
+            else:
+                response = session.post(url, json=data, headers=headers, timeout=60)
+        except self.requests.RequestException as exc:
+            self.exceptions[f"{type(exc).__name__}: {exc}"[:120]] += 1
+            return 0, None
+        if response.status_code >= 500:
+            # The server's exceptions are only visible through its error pages
+            self.exceptions[f"HTTP {response.status_code}: {error_summary(response.text)}"[:120]] += 1
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def finish_worker(self):
+        pass
+
+
+# ========================================
+# COMMAND
+# ========================================
+
+class Command(BaseCommand):
+    help = (
+        "Simulate enrollment-day traffic: seed students and sections, run concurrent "
+        "login -> eligible-sections -> enroll flows and report throughput, latency "
+        "percentiles, lock errors and oversubscription"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200,
+                            help='Students to seed (one flow each)')
+        parser.add_argument('--subjects', type=int, default=8,
+                            help='Subjects to seed')
+        parser.add_argument('--sections-per-subject', type=int, default=2,
+                            help='Sections seeded per subject')
+        parser.add_argument('--capacity', type=int, default=30,
+                            help='Capacity of every seeded section')
+        parser.add_argument('--enrolls', type=int, default=3,
+                            help='Enrollment attempts per student')
+        parser.add_argument('--workers', type=int, default=16,
+                            help='Concurrent worker threads')
+        parser.add_argument('--term', default='LOADTEST',
+                            help='Term used for seeded sections')
+        parser.add_argument('--password', default='Loadtest#2024',
+                            help='Password of the seeded student accounts')
+        parser.add_argument('--base-url',
+                            help='Target a running server (e.g. http://127.0.0.1:8000/api) '
+                                 'instead of the in-process test client. The server must use '
+                                 'the same database as this command.')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Random seed for section choices')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded data after the run')
+        parser.add_argument('--allow-non-test-db', action='store_true',
+                            help='Seed and clean up even though the database is not an in-memory '
+                                 'or test_ database')
+
+    def handle(self, *args, **options):
+        if not options['allow_non_test_db'] and not is_test_database(connection.settings_dict):
+            raise CommandError(
+                f"{connection.settings_dict['NAME']} is not a test database; the load test writes "
+                f"and deletes rows there. Pass --allow-non-test-db to run it anyway."
+            )
+        self.random = random.Random(options['seed'])
+
+        if Program.objects.filter(program_code=PROGRAM_CODE).exists():
+            self.stdout.write("Removing data left by a previous run")
+            self.cleanup()
+
+        self.stdout.write(
+            f"Seeding {options['students']} students and "
+            f"{options['subjects'] * options['sections_per_subject']} sections "
+            f"(capacity {options['capacity']}) on {connection.vendor}"
+        )
+        students = self.seed(options)
+
+        if options['base_url']:
+            transport = HTTPTransport(options['base_url'])
+            context = override_settings()
+        else:
+            transport = InProcessTransport()
+            context = override_settings(ALLOWED_HOSTS=['*'])
+
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+        # Expected 4xx responses (full sections) would flood the console
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+
+        try:
+            with context:
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                    list(pool.map(
+                        lambda student: self.flow(transport, student, options),
+                        students,
+                    ))
+                elapsed = time.perf_counter() - started
+        finally:
+            transport.close()
+            request_logger.setLevel(level)
+
+        self.report(elapsed, len(students), transport, options)
+
+        if not options['keep']:
+            self.cleanup()
+
+    # ----------------------------------------
+    # Seeding
+    # ----------------------------------------
+
+    def seed(self, options):
+        """Create the program, sections and student accounts; returns (student_id, username) pairs"""
+        password = make_password(options['password'])  # hash once, reuse for every account
+
+        with transaction.atomic():
+            program = Program.objects.create(
+                program_code=PROGRAM_CODE, program_name='Load Test', department='Load Test', sector='Load Test'
+            )
+            curriculum = Curriculum.objects.create(program=program, year_level=1, semester='1st')
+
+            for i in range(options['subjects']):
+                subject = Subject.objects.create(
+                    code=f'LT{i:03d}', title=f'Load Test Subject {i}', units=3, curriculum=curriculum
+                )
+                # One time slot per subject so a student can take one section of each
+                days = ('MWF', 'TTH')[i % 2]
+                hour = 7 + (i // 2) % 11
+                for j in range(options['sections_per_subject']):
+                    Section.objects.create(
+                        section_name=f'LT-{j + 1}', subject=subject, term=options['term'],
+                        schedule=f'{days} {hour}:00-{hour + 1}:00',
+                        room=f'LT-{i:03d}-{j + 1}', capacity=options['capacity'],
+                    )
+
+            users = User.objects.bulk_create([
+                User(
+                    username=f'{PREFIX}_{n:05d}', email=f'{PREFIX}_{n:05d}@loadtest.invalid',
+                    password=password, role='student', first_name='Load', last_name=f'Student {n}',
+                )
+                for n in range(options['students'])
+            ])
+            students = Student.objects.bulk_create([
+                Student(user=user, student_number=f'LT-{n:05d}', program=program, year_level=1)
+                for n, user in enumerate(users)
+            ])
+
+        return [(student.student_id, user.username) for student, user in zip(students, users)]
+
+    def cleanup(self):
+        with transaction.atomic():
+            program = Program.objects.filter(program_code=PROGRAM_CODE)
+            sections = Section.objects.filter(subject__curriculum__program__in=program)
+            WaitlistEntry.objects.filter(section__in=sections).delete()
+            Enrollment.objects.filter(section__in=sections).delete()
+            sections.delete()
+            Subject.objects.filter(curriculum__program__in=program).delete()
+            Student.objects.filter(program__in=program).delete()
+            User.objects.filter(username__startswith=f'{PREFIX}_').delete()
+            Curriculum.objects.filter(program__in=program).delete()
+            program.delete()
+
+    # ----------------------------------------
+    # Flows
+    # ----------------------------------------
+
+    def timed(self, step, transport, *args, **kwargs):
+        started = time.perf_counter()
+        status_code, body = transport.request(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[step].append(elapsed)
+            self.statuses[step][status_code] += 1
+        return status_code, body
+
+    def flow(self, transport, student, options):
+        """One student: log in, list eligible sections, enroll in a few of them"""
+        student_id, username = student
+        try:
+            status_code, body = self.timed('login', transport, 'POST', '/api/auth/login/', data={
+                'username': username, 'password': options['password'],
+            })
+            if status_code != 200:
+                return
+            token = body['access']
+
+            status_code, body = self.timed(
+                'eligible-sections', transport, 'GET',
+                f'/api/students/{student_id}/eligible-sections/', token=token, data={'term': options['term']},
+            )
+            if status_code != 200:
+                return
+
+            # Pick sections of different subjects, like a student filling a load
+            by_subject = defaultdict(list)
+            for section in body:
+                by_subject[section['subject']].append(section['section_id'])
+            subjects = list(by_subject)
+            self.random.shuffle(subjects)
+
+            for subject in subjects[:options['enrolls']]:
+                self.timed('enroll', transport, 'POST', '/api/enrollments/', token=token, data={
+                    'student': str(student_id),
+                    'section': self.random.choice(by_subject[subject]),
+                    'term': options['term'],
+                    'status': 'enrolled',
+                }, headers={'Idempotency-Key': str(uuid.uuid4())})
+        finally:
+            transport.finish_worker()
+
+    # ----------------------------------------
+    # Report
+    # ----------------------------------------
+
+    def report(self, elapsed, flows, transport, options):
+        total = sum(len(samples) for samples in self.samples.values())
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{flows} flows, {total} requests in {elapsed:.2f}s with {options['workers']} workers "
+            f"({flows / elapsed:.1f} flows/s, {total / elapsed:.1f} req/s)"
+        ))
+        self.stdout.write(
+            f"{'step':<18}{'count':>7}{'2xx':>7}{'4xx':>7}{'5xx':>7}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for step in ('login', 'eligible-sections', 'enroll'):
+            samples = sorted(self.samples.get(step, []))
+            statuses = self.statuses.get(step, Counter())
+            by_class = Counter()
+            for code, count in statuses.items():
+                by_class[code // 100] += count
+            self.stdout.write(
+                f"{step:<18}{len(samples):>7}{by_class[2]:>7}{by_class[4]:>7}{by_class[5] + by_class[0]:>7}"
+                + ''.join(f"{percentile(samples, pct) * 1000:>9.1f}" for pct in (50, 95, 99))
+                + f"{(samples[-1] if samples else 0) * 1000:>9.1f}"
+            )
+
+        lock_errors = sum(
+            count for message, count in transport.exceptions.items()
+            if any(marker in message.lower() for marker in LOCK_ERRORS)
+        )
+        self.stdout.write('')
+        # Over HTTP these are 5xx responses, whose bodies only name the cause when the server runs with DEBUG
+        self.stdout.write(f"Lock-wait errors: {lock_errors}")
+        for message, count in transport.exceptions.most_common(5):
+            self.stdout.write(f"  {count} x {message}")
+
+        # Seat accounting: the counter must never exceed capacity, and must match the enrollments
+        sections = Section.objects.filter(term=options['term'], subject__curriculum__program__program_code=PROGRAM_CODE)
+        sections = sections.annotate(
+            holders=Count('enrollments', filter=Q(enrollments__status__in=Enrollment.SEAT_STATUSES))
+        )
+        enrolled = sum(section.holders for section in sections)
+        oversubscribed = sections.filter(Q(seats_taken__gt=F('capacity')) | Q(holders__gt=F('capacity'))).count()
+        drift = sections.exclude(seats_taken=F('holders')).count()
+
+        self.stdout.write(f"Seats taken: {enrolled} of {options['capacity'] * len(sections)}")
+        style = self.style.ERROR if oversubscribed or drift else self.style.SUCCESS
+        self.stdout.write(style(f"Oversubscribed sections: {oversubscribed}, seat counter mismatches: {drift}"))
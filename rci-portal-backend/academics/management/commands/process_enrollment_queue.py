@@ -0,0 +1,38 @@
+# academics/management/commands/process_enrollment_queue.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from academics.enrollment import process_queue, sweep_waitlists
+
+
+class Command(BaseCommand):
+    help = "Admit queued enrollment requests in arrival order and promote waitlists"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Queued requests admitted per transaction')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when there is nothing to do')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and waitlists once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        while True:
+            processed = process_queue(batch_size)
+            if processed:
+                self.stdout.write(f"Processed {processed} queued request(s)")
+
+            # Seats freed by drops and capacity increases since the last round
+            promoted = sweep_waitlists()
+            if promoted:
+                self.stdout.write(f"Promoted {promoted} waitlisted request(s)")
+
+            if processed or promoted:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
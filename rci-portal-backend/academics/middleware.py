@@ -1,6 +1,11 @@
 import json
+from django.http.request import RawPostDataException
 from django.utils.deprecation import MiddlewareMixin
-from .models import AuditLog
+from rest_framework.request import Empty
+from .audit import (
+    MAX_PAYLOAD_BYTES, begin_scope, bounded, end_scope, normalize_entity, omitted, record_audit, submit,
+    tracked_entities,
+)
 
 class AuditLogMiddleware(MiddlewareMixin):
     TRACKED_METHODS = ['POST', 'PUT', 'PATCH', 'DELETE']
@@ -15,42 +20,61 @@ class AuditLogMiddleware(MiddlewareMixin):
     ]
 
     def process_request(self, request):
-        """Capture request body for auditing"""
+        """Hold per-object audit entries (see academics.audit) until the response"""
         if request.method in self.TRACKED_METHODS:
-            try:
-                request._audit_request_body = json.loads(request.body) if request.body else {}
-            except Exception:
-                request._audit_request_body = {}
+            begin_scope()
         return None
 
     def process_response(self, request, response):
         if request.method not in self.TRACKED_METHODS:
             return response
 
+        changes = end_scope()
+        try:
+            if self._should_audit(request, response):
+                self._record_request(request, response, changes)
+        except Exception as e:
+            print(f"[AUDIT ERROR] Could not log action: {e}")
+
+        # Queued; the audit writer inserts entries in batches off the request path
+        submit(changes)
+        return response
+
+    def _should_audit(self, request, response):
         if any(request.path.startswith(path) for path in self.EXCLUDED_PATHS):
-            return response
+            return False
 
         if not getattr(request, "user", None) or not request.user.is_authenticated:
-            return response
+            return False
 
         if not (200 <= response.status_code < 300):
-            return response
+            return False
+
+        # Replayed idempotent responses were audited the first time
+        if response.has_header('Idempotent-Replayed'):
+            return False
+
+        return True
 
+    def _record_request(self, request, response, changes):
         action = self._get_action(request.method)
         entity = self._extract_entity(request.path)
         details = self._build_details(request, response)
 
-        try:
-            AuditLog.objects.create(
+        matching = [entry for entry in changes if entry.entity == entity]
+        if matching:
+            # One row per changed object, carrying the request's details
+            for entry in matching:
+                entry._audit_request = details
+                entry.user = entry.user or request.user
+        elif entity not in tracked_entities():
+            record_audit(
                 entity=entity,
                 action=action,
                 user=request.user,
                 details=details
             )
-        except Exception as e:
-            print(f"[AUDIT ERROR] Could not log action: {e}")
-
-        return response
+        # else: a tracked entity that did not change (no-op save), nothing to log
 
     def _get_action(self, method):
         return {
@@ -63,47 +87,98 @@ class AuditLogMiddleware(MiddlewareMixin):
     def _extract_entity(self, path):
         parts = [p for p in path.split('/') if p and p != 'api']
         if parts:
-            entity = parts[0].rstrip('s')  # singularize
-            return entity.capitalize()
+            return normalize_entity(parts[0]) or "Unknown"
         return "Unknown"
 
     def _build_details(self, request, response):
-        details = {
-            "method": request.method,
-            "path": request.path,
-            "user_role": getattr(request.user, "role", None),
-            "request_data": getattr(request, "_audit_request_body", {}),
-        }
-
-        try:
-            response_data = json.loads(response.content.decode("utf-8"))
-        except Exception:
-            response_data = str(response.content[:200])  # fallback for non-JSON
-
-        if request.method == "POST":
-            # Add full_name if the object has a user field
-            obj = getattr(request, "_obj", None)
-            if isinstance(response_data, dict) and obj and hasattr(obj, "user"):
-                response_data["full_name"] = obj.user.get_full_name()
-            details["created"] = response_data
-
-        elif request.method in ["PUT", "PATCH"]:
-            before = getattr(request, "_audit_request_body", {})
-            after = response_data if isinstance(response_data, dict) else {}
-            obj = getattr(request, "_obj", None)
-            if obj and hasattr(obj, "user"):
-                after["full_name"] = obj.user.get_full_name()
-            changes = {
-                k: {"before": before.get(k), "after": after.get(k)}
-                for k in set(before.keys()).union(after.keys())
-                if before.get(k) != after.get(k)
+        """
+        Collect what the details need while the request is alive and return
+        a function that builds them; the audit writer calls it in the
+        background, so payload cleaning and the update diff cost the request
+        nothing. Payloads are the already parsed DRF request.data and
+        response.data, not re-parsed bytes.
+        """
+        method = request.method
+        path = request.path
+        user_role = getattr(request.user, "role", None)
+        request_data = self._request_data(request, response)
+        response_data = self._response_data(response)
+        obj = getattr(request, "_obj", None)
+        full_name = obj.user.get_full_name() if obj is not None and hasattr(obj, "user") else None
+
+        def build():
+            before = self._payload(request_data)
+            details = {
+                "method": method,
+                "path": path,
+                "user_role": user_role,
+                "request_data": before,
             }
-            details["changes"] = changes
-
-        elif request.method == "DELETE":
-            parts = request.path.split("/")
-            deleted_id = next((p for p in parts if p.isdigit() or len(p) > 10), None)
-            if deleted_id:
-                details["deleted_id"] = deleted_id
-
-        return details
+            after = self._payload(response_data)
+
+            if method == "POST":
+                # Add full_name if the object has a user field
+                if isinstance(after, dict) and full_name is not None:
+                    after["full_name"] = full_name
+                details["created"] = after
+
+            elif method in ["PUT", "PATCH"]:
+                before = before if isinstance(before, dict) and "omitted" not in before else {}
+                after = after if isinstance(after, dict) and "omitted" not in after else {}
+                if full_name is not None:
+                    after["full_name"] = full_name
+                changes = {
+                    k: {"before": before.get(k), "after": after.get(k)}
+                    for k in set(before.keys()).union(after.keys())
+                    if before.get(k) != after.get(k)
+                }
+                details["changes"] = changes
+
+            elif method == "DELETE":
+                parts = path.split("/")
+                deleted_id = next((p for p in parts if p.isdigit() or len(p) > 10), None)
+                if deleted_id:
+                    details["deleted_id"] = deleted_id
+
+            return details
+
+        return build
+
+    @staticmethod
+    def _payload(value):
+        """Raw JSON bodies are parsed here, in the writer"""
+        if isinstance(value, bytes):
+            try:
+                value = json.loads(value) if value else {}
+            except ValueError:
+                return {}
+        return bounded(value)
+
+    def _request_data(self, request, response):
+        size = int(request.META.get("CONTENT_LENGTH") or 0)
+        if size > MAX_PAYLOAD_BYTES:
+            return omitted(size)
+
+        # DRF views parsed the body already
+        drf_request = (getattr(response, "renderer_context", None) or {}).get("request")
+        if drf_request is not None and getattr(drf_request, "_full_data", Empty) is not Empty:
+            return drf_request.data
+
+        if request.content_type != "application/json":
+            return {}
+        try:
+            return request.body
+        except RawPostDataException:
+            return {}
+
+    def _response_data(self, response):
+        if response.streaming:
+            return {}
+        if len(response.content) > MAX_PAYLOAD_BYTES:
+            return omitted(len(response.content))
+        data = getattr(response, "data", None)
+        if data is not None:
+            return data
+        if response.get("Content-Type", "").startswith("application/json"):
+            return bytes(response.content)
+        return {}
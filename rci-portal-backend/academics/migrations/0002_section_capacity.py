@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:07
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_seats_taken(apps, schema_editor):
+    Section = apps.get_model('academics', 'Section')
+    counts = Section.objects.annotate(
+        taken=Count('enrollments', filter=Q(enrollments__status__in=['pending', 'enrolled']))
+    ).values_list('section_id', 'taken')
+    for section_id, taken in counts:
+        Section.objects.filter(section_id=section_id).update(seats_taken=taken)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='capacity',
+            field=models.PositiveIntegerField(default=40),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_seats_taken, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:09
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_section_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('entry_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('term', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('waitlisted', 'Waitlisted'), ('admitted', 'Admitted'), ('rejected', 'Rejected'), ('cancelled', 'Cancelled')], default='queued', max_length=20)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('enrollment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='academics.enrollment')),
+                ('requested_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_requests', to=settings.AUTH_USER_MODEL)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='academics.section')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='academics.student')),
+            ],
+            options={
+                'db_table': 'waitlist_entries',
+                'ordering': ['timestamp'],
+                'indexes': [models.Index(fields=['status', 'timestamp'], name='waitlist_en_status_153a3d_idx'), models.Index(fields=['section', 'status', 'timestamp'], name='waitlist_en_section_9db59a_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'waitlisted'])), fields=('student', 'section', 'term'), name='unique_active_waitlist_entry')],
+            },
+        ),
+    ]
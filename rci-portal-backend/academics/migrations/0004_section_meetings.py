@@ -0,0 +1,111 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:11
+
+import django.db.models.deletion
+import re
+import uuid
+from django.db import migrations, models
+
+
+# Frozen copy of academics.scheduling.parse_schedule as of this migration,
+# so later changes to the parser do not change what the migration does
+
+_BLOCK_RE = re.compile(
+    r'^(?P<days>[A-Z]+)\s+'
+    r'(?P<start>\d{1,2}(?::\d{2})?)\s*(?P<start_suffix>AM|PM|NN)?\s*-\s*'
+    r'(?P<end>\d{1,2}(?::\d{2})?)\s*(?P<end_suffix>AM|PM|NN)?$'
+)
+
+_DAY_TOKENS = (('SUN', 6), ('SAT', 5), ('TH', 3), ('SU', 6), ('SA', 5),
+               ('M', 0), ('T', 1), ('W', 2), ('F', 4), ('S', 5))
+
+
+def _parse_days(text):
+    days, i = [], 0
+    while i < len(text):
+        for token, day in _DAY_TOKENS:
+            if text.startswith(token, i):
+                days.append(day)
+                i += len(token)
+                break
+        else:
+            raise ValueError(text)
+    return sorted(set(days))
+
+
+def _minutes(text, suffix):
+    hours, _, minutes = text.partition(':')
+    hours, minutes = int(hours), int(minutes or 0)
+    if hours > 23 or minutes > 59:
+        raise ValueError(text)
+    if suffix == 'PM' and hours < 12:
+        hours += 12
+    elif suffix == 'AM' and hours == 12:
+        hours = 0
+    return hours * 60 + minutes
+
+
+def parse_schedule(schedule):
+    meetings = []
+    text = (schedule or '').strip().upper()
+    if text in ('', 'TBA', 'TBD'):
+        return meetings
+
+    for block in text.split(';'):
+        match = _BLOCK_RE.match(block.strip())
+        if not match:
+            raise ValueError(block)
+
+        end_suffix = match['end_suffix']
+        end = _minutes(match['end'], end_suffix)
+        start = _minutes(match['start'], match['start_suffix'] or end_suffix)
+        if not match['start_suffix'] and start >= end and start >= 12 * 60:
+            start -= 12 * 60
+        if start >= end:
+            raise ValueError(block)
+
+        for day in _parse_days(match['days']):
+            meetings.append((day, start, end))
+
+    return sorted(set(meetings))
+
+
+def parse_existing_schedules(apps, schema_editor):
+    Section = apps.get_model('academics', 'Section')
+    SectionMeeting = apps.get_model('academics', 'SectionMeeting')
+    meetings = []
+    for section_id, schedule in Section.objects.values_list('section_id', 'schedule'):
+        try:
+            parsed = parse_schedule(schedule)
+        except ValueError:
+            continue
+        meetings.extend(
+            SectionMeeting(section_id=section_id, day=day, start_minute=start, end_minute=end)
+            for day, start, end in parsed
+        )
+    SectionMeeting.objects.bulk_create(meetings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0003_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionMeeting',
+            fields=[
+                ('meeting_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('day', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meetings', to='academics.section')),
+            ],
+            options={
+                'db_table': 'section_meetings',
+                'ordering': ['day', 'start_minute'],
+                'indexes': [models.Index(fields=['day', 'start_minute', 'end_minute'], name='section_mee_day_dc4462_idx')],
+            },
+        ),
+        migrations.RunPython(parse_existing_schedules, migrations.RunPython.noop),
+    ]
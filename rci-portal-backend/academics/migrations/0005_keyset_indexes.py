@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_section_meetings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'log_id'], name='audit_logs_timesta_71920a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['timestamp', 'enrollment_id'], name='enrollments_timesta_0f5d83_idx'),
+        ),
+    ]
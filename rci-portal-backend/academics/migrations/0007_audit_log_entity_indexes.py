@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+# Frozen copy of the entity names of academics.audit.normalize_entity() as
+# of this migration, lowercased
+ENTITIES = {
+    value.lower(): value for value in (
+        'Application', 'Auth', 'Curriculum', 'Document', 'Enrollment', 'Grade',
+        'Program', 'Section', 'Student', 'Subject', 'User', 'Waitlist', 'Unknown',
+    )
+}
+
+
+def normalize_entity(name):
+    key = (name or '').strip().lower()
+    if key not in ENTITIES and key.endswith('s'):
+        key = key[:-1]
+    return ENTITIES.get(key)
+
+
+def normalize_entities(apps, schema_editor):
+    """Rewrite variants ('students', 'student') to the choice value; other names are kept as they are"""
+    AuditLog = apps.get_model('academics', 'AuditLog')
+    for entity in AuditLog.objects.order_by().values_list('entity', flat=True).distinct():
+        normalized = normalize_entity(entity)
+        if normalized is not None and normalized != entity:
+            AuditLog.objects.filter(entity=entity).update(entity=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0006_audit_log_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='entity',
+            field=models.CharField(choices=[('Application', 'Application'), ('Auth', 'Authentication'), ('Curriculum', 'Curriculum'), ('Document', 'Document'), ('Enrollment', 'Enrollment'), ('Grade', 'Grade'), ('Program', 'Program'), ('Section', 'Section'), ('Student', 'Student'), ('Subject', 'Subject'), ('User', 'User'), ('Waitlist', 'Waitlist'), ('Unknown', 'Unknown')], max_length=50),
+        ),
+        migrations.RunPython(normalize_entities, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['entity', 'timestamp', 'log_id'], name='audit_logs_entity_0d4ea7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp', 'log_id'], name='audit_logs_user_id_d2fd28_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action', 'timestamp', 'log_id'], name='audit_logs_action_ef779c_idx'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 #==========================================
 # 1. USERS TABLE
@@ -103,6 +105,15 @@ class Subject(models.Model):
     
     def __str__(self):
         return f"{self.code} - {self.title}"
+
+    def clean(self):
+        # Reject prerequisite lists that would make the graph cyclic
+        from .prerequisites import get_prerequisite_graph
+        cycle = get_prerequisite_graph().find_cycle(self.pk, self.code, self.prerequisites)
+        if cycle:
+            raise ValidationError({
+                'prerequisites': f"Circular prerequisite: {', '.join(map(str, cycle))}"
+            })
     
 
 #==========================================
@@ -117,6 +128,10 @@ class Section(models.Model):
     schedule = models.CharField(max_length=100)
     room = models.CharField(max_length=50)
     professor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, limit_choices_to={'role': 'professor'}, related_name='teaching_sections')
+    capacity = models.PositiveIntegerField(default=40)
+    # Denormalized count of seat-holding enrollments (see Enrollment.SEAT_STATUSES),
+    # maintained atomically by academics/enrollment.py
+    seats_taken = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         db_table = 'sections'
@@ -125,6 +140,65 @@ class Section(models.Model):
     def __str__(self):
         return f"{self.subject.code} - {self.term} - {self.room}"
 
+    def save(self, *args, **kwargs):
+        # seats_taken only changes through the F() updates in enrollment.py;
+        # writing back the value loaded with this instance would undo
+        # concurrent reservations, so updates leave it out
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'seats_taken'
+            ]
+            super().save(*args, **kwargs)
+            self.refresh_from_db(fields=['seats_taken'])
+            return
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        # Schedules must be machine-readable for conflict detection
+        from .scheduling import ScheduleParseError, parse_schedule
+        try:
+            parse_schedule(self.schedule)
+        except ScheduleParseError as exc:
+            raise ValidationError({'schedule': str(exc)})
+
+#==========================================
+# 5b. SECTION MEETINGS TABLE
+#==========================================
+
+class SectionMeeting(models.Model):
+    """
+    One weekly meeting of a section, parsed from `Section.schedule`
+    (see academics/scheduling.py). Kept in sync by a Section post_save signal.
+    """
+
+    DAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    meeting_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='meetings')
+    day = models.PositiveSmallIntegerField(choices=DAY_CHOICES)
+    start_minute = models.PositiveSmallIntegerField()  # minutes after midnight
+    end_minute = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'section_meetings'
+        ordering = ['day', 'start_minute']
+        indexes = [
+            models.Index(fields=['day', 'start_minute', 'end_minute']),
+        ]
+
+    def __str__(self):
+        return f"{self.section} - {self.get_day_display()} {self.start_minute}-{self.end_minute}"
+
+
 #==========================================
 # 6. STUDENTS TABLE
 #==========================================
@@ -163,6 +237,9 @@ class Enrollment(models.Model):
         ('enrolled', 'Enrolled'),
         ('dropped', 'Dropped'),
     ]
+    # Statuses that occupy a seat in the section
+    SEAT_STATUSES = ('pending', 'enrolled')
+
     enrollment_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='enrollments')
     section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='enrollments')
@@ -174,6 +251,10 @@ class Enrollment(models.Model):
         db_table = 'enrollments'
         unique_together = ('student', 'section', 'term')
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination: ordering plus the pk tiebreaker
+            models.Index(fields=['timestamp', 'enrollment_id']),
+        ]
     
     def __str__(self):
         return f"{self.student.student_number} enrolled in {self.section.subject.code} - {self.status}"
@@ -279,17 +360,96 @@ class AuditLog(models.Model):
         ('delete', 'Delete'),
     ]
 
+    # One value per API resource (see academics.audit.normalize_entity)
+    ENTITY_CHOICES = [
+        ('Application', 'Application'),
+        ('Auth', 'Authentication'),
+        ('Curriculum', 'Curriculum'),
+        ('Document', 'Document'),
+        ('Enrollment', 'Enrollment'),
+        ('Grade', 'Grade'),
+        ('Program', 'Program'),
+        ('Section', 'Section'),
+        ('Student', 'Student'),
+        ('Subject', 'Subject'),
+        ('User', 'User'),
+        ('Waitlist', 'Waitlist'),
+        ('Unknown', 'Unknown'),
+    ]
+
     log_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    entity = models.CharField(max_length=50)
+    entity = models.CharField(max_length=50, choices=ENTITY_CHOICES)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='audit_logs')
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name='audit_logs',
+        # (user, timestamp, log_id) in Meta.indexes covers lookups by user
+        db_index=False,
+    )
     details = models.JSONField(default=dict)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the batched writer inserts it
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         db_table = 'audit_logs'
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination: ordering plus the pk tiebreaker
+            models.Index(fields=['timestamp', 'log_id']),
+            # Each filter of AuditLogViewSet, in list order
+            models.Index(fields=['entity', 'timestamp', 'log_id']),
+            models.Index(fields=['user', 'timestamp', 'log_id']),
+            models.Index(fields=['action', 'timestamp', 'log_id']),
+        ]
 
     def __str__(self):
         return f"{self.action} on {self.entity} by {self.user.username if self.user else 'System'}"
-    
\ No newline at end of file
+    
+
+#==========================================
+# 12. WAITLIST ENTRIES TABLE
+#==========================================
+
+class WaitlistEntry(models.Model):
+    """
+    A queued enrollment intent. Entries are accepted cheaply by the API and
+    admitted in order by the enrollment worker (see academics/enrollment.py).
+    """
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('waitlisted', 'Waitlisted'),
+        ('admitted', 'Admitted'),
+        ('rejected', 'Rejected'),
+        ('cancelled', 'Cancelled'),
+    ]
+    # Statuses still waiting for a seat
+    ACTIVE_STATUSES = ('queued', 'waitlisted')
+
+    entry_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='waitlist_entries')
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='waitlist_entries')
+    term = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    enrollment = models.OneToOneField(Enrollment, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry')
+    message = models.CharField(max_length=255, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='waitlist_requests')
+    timestamp = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'waitlist_entries'
+        ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['status', 'timestamp']),
+            models.Index(fields=['section', 'status', 'timestamp']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'section', 'term'],
+                condition=models.Q(status__in=['queued', 'waitlisted']),
+                name='unique_active_waitlist_entry',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student.student_number} waiting for {self.section.subject.code} - {self.status}"
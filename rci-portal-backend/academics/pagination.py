@@ -0,0 +1,289 @@
+# academics/pagination.py
+
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+
+
+def _encode_value(value):
+    """JSON-safe cursor value that round-trips through a filter() lookup"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()  # full precision, unlike DjangoJSONEncoder
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+def estimate_count(queryset, cap):
+    """
+    Cheap row count for `queryset`.
+
+    PostgreSQL answers from the planner's row estimate (no scan). Other
+    databases count at most `cap` + 1 rows, which is exact for small
+    results and bounded for large ones.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return queryset[:cap + 1].count()
+
+
+# ========================================
+# KEYSET PAGINATION
+# ========================================
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on the queryset's own ordering.
+
+    Pages are fetched with a WHERE on the last row's ordering values
+    instead of OFFSET, so deep pages cost the same as the first one. The
+    primary key is appended as a tiebreaker (in the direction of the last
+    ordering field, so a (field, pk) index serves both), which keeps pages
+    stable when ordering values repeat.
+
+    ?count=exact (default) runs COUNT(*), ?count=estimate uses
+    estimate_count() and ?count=none skips counting (count is null).
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    default_count = COUNT_EXACT
+    estimate_cap = 10000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count_mode = self.get_count_mode(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position, self.reverse = self.decode_cursor(request)
+        self.count = self.get_count(queryset)
+
+        queryset = queryset.order_by(*[
+            f"{'-' if descending != self.reverse else ''}{path}" for path, descending in self.ordering
+        ])
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        # The ordering values of each row are read back from annotations,
+        # which works for instances as well as values()/values_list() rows
+        self.names = [f'_keyset_{index}' for index in range(len(self.ordering))]
+        queryset = queryset.annotate(**{
+            name: F(path) for name, (path, _) in zip(self.names, self.ordering)
+        })
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        # Coming back from a previous page means there is a next one, and vice versa
+        self.has_next = has_more if not self.reverse else position is not None
+        self.has_previous = has_more if self.reverse else position is not None
+        self.first = self.position(rows[0]) if rows else None
+        self.last = self.position(rows[-1]) if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count_mode == COUNT_ESTIMATE:
+            payload['count_estimated'] = True
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['count', 'results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True, 'example': 123},
+                'count_estimated': {'type': 'boolean'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # ----------------------------------------
+    # Ordering
+    # ----------------------------------------
+
+    def get_ordering(self, queryset):
+        """
+        [(path, descending), ...] of the queryset's ordering plus the pk
+        tiebreaker. The model field behind each path is kept in self.fields.
+        """
+        query = queryset.query
+        meta = queryset.model._meta
+        ordering = query.order_by or (meta.ordering if query.default_ordering else ())
+
+        resolved = []
+        self.fields = []
+        for item in ordering:
+            if not isinstance(item, str) or item == '?':
+                raise serializers.ValidationError({'ordering': ['This ordering cannot be paginated']})
+            descending = item.startswith('-')
+            path = item.lstrip('-')
+            if path == 'pk':
+                path = meta.pk.name
+            self.fields.append(self.check_path(meta, path))
+            resolved.append((path, descending))
+
+        if not any(path == meta.pk.name for path, _ in resolved):
+            resolved.append((meta.pk.name, resolved[-1][1] if resolved else False))
+            self.fields.append(meta.pk)
+        return resolved
+
+    def check_path(self, meta, path):
+        """
+        Keyset comparisons need non-null columns reached through forward
+        relations. A relation as the last part is refused too, since Django
+        orders it by the related model's ordering rather than its key.
+        Returns the field the path ends on.
+        """
+        parts = path.split('__')
+        for index, part in enumerate(parts):
+            try:
+                field = meta.get_field(part)
+            except FieldDoesNotExist:
+                field = None
+            last = index == len(parts) - 1
+            usable = (
+                field is not None and field.concrete and not field.null
+                and field.is_relation != last
+                and not field.many_to_many
+            )
+            if not usable:
+                raise serializers.ValidationError({'ordering': [f'Cannot paginate by {path}']})
+            if not last:
+                meta = field.related_model._meta
+        return field
+
+    def after(self, position):
+        """Rows strictly after `position` in the (possibly reversed) ordering"""
+        condition = Q()
+        equal = Q()
+        for (path, descending), value in zip(self.ordering, position):
+            lookup = 'lt' if descending != self.reverse else 'gt'
+            condition |= equal & Q(**{f'{path}__{lookup}': value})
+            equal &= Q(**{path: value})
+        return condition
+
+    def position(self, row):
+        if isinstance(row, tuple):
+            return list(row[-len(self.names):])
+        if isinstance(row, dict):
+            return [row[name] for name in self.names]
+        return [getattr(row, name) for name in self.names]
+
+    # ----------------------------------------
+    # Request parameters
+    # ----------------------------------------
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param, self.default_count)
+        if mode not in (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE):
+            raise serializers.ValidationError({
+                self.count_query_param: [f'Expected one of {COUNT_EXACT}, {COUNT_ESTIMATE}, {COUNT_NONE}']
+            })
+        return mode
+
+    def get_count(self, queryset):
+        if self.count_mode == COUNT_NONE:
+            return None
+        if self.count_mode == COUNT_ESTIMATE:
+            return estimate_count(queryset, self.estimate_cap)
+        return queryset.order_by().count()
+
+    # ----------------------------------------
+    # Cursors
+    # ----------------------------------------
+
+    def decode_cursor(self, request):
+        """(position, reverse) from ?cursor=, or (None, False) on the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # A tampered value would otherwise fail inside the query
+        try:
+            position = [field.to_python(value) for field, value in zip(self.fields, position)]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = {'p': [_encode_value(value) for value in position]}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            # Walked off the end; the first page is still reachable
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
+
+
+# ========================================
+# ARCHIVED AUDIT MONTHS
+# ========================================
+
+class ArchivePagination(PageNumberPagination):
+    """Page numbers for archive.ArchivedLogs, which cannot be keyset-filtered"""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -94,16 +94,17 @@ class IsOwnerOrStaff(permissions.BasePermission):
         # Students can only access their own data
         if request.user.role == 'student':
             # Check if object has a student field
+            # (compare ids so the related rows are not fetched)
             if hasattr(obj, 'student'):
-                return obj.student.user == request.user
+                return obj.student.user_id == request.user.pk
             # Check if object has a user field
             if hasattr(obj, 'user'):
-                return obj.user == request.user
+                return obj.user_id == request.user.pk
         
         # Professors can access data for their sections
         if request.user.role == 'professor':
             if hasattr(obj, 'section'):
-                return obj.section.professor == request.user
+                return obj.section.professor_id == request.user.pk
         
         return False
 
@@ -124,7 +125,7 @@ class CanManageGrades(permissions.BasePermission):
         
         # Professors can only modify grades for their sections
         if request.user.role == 'professor':
-            return obj.section.professor == request.user
+            return obj.section.professor_id == request.user.pk
         
         return False
 
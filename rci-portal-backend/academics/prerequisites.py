@@ -0,0 +1,245 @@
+# academics/prerequisites.py
+
+import threading
+import uuid
+from collections import defaultdict
+
+from .caching import get_table_versions
+from .models import Grade, Subject
+
+
+# ========================================
+# REFERENCE HELPERS
+# ========================================
+
+def normalize_reference(ref):
+    """
+    Normalize a prerequisite reference.
+
+    `Subject.prerequisites` holds subject UUID strings, but older seed data
+    stores subject codes, so both forms are accepted.
+    """
+    try:
+        return str(uuid.UUID(str(ref)))
+    except ValueError:
+        return str(ref).strip()
+
+
+# ========================================
+# PREREQUISITE GRAPH
+# ========================================
+
+class PrerequisiteGraph:
+    """
+    Prerequisite DAG built from the Subject table.
+
+    Direct edges, transitive closures ("what does X ultimately require")
+    and reverse closures ("what does failing X block") are precomputed,
+    so every lookup is a dict/frozenset access.
+    """
+
+    def __init__(self, rows):
+        # rows: iterable of (subject_id, code, title, prerequisites)
+        self.labels = {}
+        self.codes = {}
+        self.direct = {}
+        self.dangling = defaultdict(set)  # code reference -> subjects waiting on it
+
+        rows = [(str(subject_id), code, title, prereqs) for subject_id, code, title, prereqs in rows]
+        for subject_id, code, title, _ in rows:
+            self.labels[subject_id] = f"{code} - {title}"
+            self.codes[code] = subject_id
+
+        for subject_id, _, _, prereqs in rows:
+            edges = set()
+            for ref in prereqs or []:
+                target = self.resolve(ref)
+                if target is None:
+                    self.dangling[normalize_reference(ref)].add(subject_id)
+                else:
+                    edges.add(target)
+            self.direct[subject_id] = frozenset(edges)
+
+        self._requires = {}
+        self.cycles = []
+        for subject_id in self.direct:
+            self._close(subject_id)
+
+        blocks = defaultdict(set)
+        for subject_id, ancestors in self._requires.items():
+            for ancestor in ancestors:
+                blocks[ancestor].add(subject_id)
+        self._blocks = {key: frozenset(value) for key, value in blocks.items()}
+
+    @classmethod
+    def build(cls):
+        """Build the graph from the database with a single query"""
+        return cls(Subject.objects.values_list('subject_id', 'code', 'title', 'prerequisites'))
+
+    def _close(self, root):
+        """Compute transitive prerequisites iteratively, skipping cycle edges"""
+        if root in self._requires:
+            return
+        on_stack = {root}
+        stack = [(root, iter(self.direct[root]))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_stack.discard(node)
+                closure = set(self.direct[node])
+                for prereq in self.direct[node]:
+                    closure |= self._requires.get(prereq, frozenset())
+                closure.discard(node)
+                self._requires[node] = frozenset(closure)
+            elif child in on_stack:
+                # Legacy data may contain cycles; record and skip the edge
+                self.cycles.append((node, child))
+            elif child not in self._requires:
+                on_stack.add(child)
+                stack.append((child, iter(self.direct[child])))
+
+    def resolve(self, ref):
+        """Return the subject_id for a UUID or code reference, or None"""
+        ref = normalize_reference(ref)
+        if ref in self.labels:
+            return ref
+        return self.codes.get(ref)
+
+    def label(self, ref):
+        subject_id = self.resolve(ref)
+        return self.labels.get(subject_id, str(ref))
+
+    def prerequisites(self, subject_id):
+        """Direct prerequisites of a subject"""
+        return self.direct.get(str(subject_id), frozenset())
+
+    def requires(self, subject_id):
+        """Every subject that must be passed before `subject_id`"""
+        return self._requires.get(str(subject_id), frozenset())
+
+    def blocks(self, subject_id):
+        """Every subject that cannot be taken until `subject_id` is passed"""
+        return self._blocks.get(str(subject_id), frozenset())
+
+    def find_cycle(self, subject_id, code, references):
+        """
+        Return the prerequisite references that would close a cycle if
+        `subject_id` were saved with `references`, or an empty list.
+        """
+        subject_id = str(subject_id) if subject_id else None
+        dependents = set(self.blocks(subject_id)) if subject_id else set()
+        for waiting in self.dangling.get(code, ()):
+            dependents.add(waiting)
+            dependents |= self.blocks(waiting)
+
+        cycle = []
+        for ref in references or []:
+            target = self.resolve(ref)
+            if normalize_reference(ref) == code or (target and target == subject_id):
+                cycle.append(ref)
+            elif target in dependents:
+                cycle.append(ref)
+        return cycle
+
+
+_graph = None  # (subjects table version, graph)
+_graph_lock = threading.Lock()
+
+
+def get_prerequisite_graph():
+    """
+    Return the process-local prerequisite graph, building it on first use.
+
+    The graph is keyed on the shared Subject table version, so a subject
+    change committed by any process makes every process rebuild it on its
+    next use. The version is read before the build, so a write committed
+    during a build only causes one more rebuild.
+    """
+    global _graph
+    version = get_table_versions([Subject])[0]
+    current = _graph
+    if current is None or current[0] != version:
+        with _graph_lock:
+            current = _graph
+            if current is None or current[0] != version:
+                current = _graph = (version, PrerequisiteGraph.build())
+    return current[1]
+
+
+def invalidate_prerequisite_graph():
+    global _graph
+    _graph = None
+
+
+# ========================================
+# PREREQUISITE CHECKER
+# ========================================
+
+class PrerequisiteChecker:
+    """
+    Resolve prerequisite requirements for many students in bulk.
+
+    References (codes or UUIDs) are resolved to subject ids through the
+    prerequisite graph, and passed subjects are loaded with one query on
+    (student_id, subject_id) up front, so the cost of a check does not
+    depend on how long a prerequisite list is. References the graph cannot
+    resolve are never met.
+
+    Usage:
+        checker = PrerequisiteChecker([student], subject.prerequisites)
+        unmet = checker.unmet(student, subject)
+    """
+
+    def __init__(self, students, references=None, graph=None):
+        self.graph = graph or get_prerequisite_graph()
+        student_ids = {getattr(student, 'pk', student) for student in students}
+        grades = Grade.objects.filter(student_id__in=student_ids, status='passed')
+
+        # Only fetch the grades that can satisfy the given references
+        if references is not None:
+            subject_ids = {self.graph.resolve(ref) for ref in references}
+            grades = grades.filter(subject_id__in=subject_ids - {None})
+
+        self._passed = defaultdict(set)
+        # order_by(): Grade's default ordering would join sections
+        for student_id, subject_id in grades.order_by().values_list('student_id', 'subject_id'):
+            self._passed[student_id].add(str(subject_id))
+
+    def passed(self, student):
+        """Return the ids (as strings) of the subjects a student has passed"""
+        return self._passed.get(getattr(student, 'pk', student), set())
+
+    def unmet(self, student, subject):
+        """Return the prerequisite references of `subject` the student has not passed"""
+        passed = self.passed(student)
+        return [
+            ref for ref in (subject.prerequisites or [])
+            if self.graph.resolve(ref) not in passed
+        ]
+
+
+def describe_prerequisites(references, graph=None):
+    """Map prerequisite references to "CODE - Title" labels from the graph"""
+    graph = graph or get_prerequisite_graph()
+    return {ref: graph.label(ref) for ref in references}
+
+
+def check_prerequisites(student, subject):
+    """
+    Return error messages for every unmet prerequisite of `subject`.
+    References and labels come from the prerequisite graph, so this costs
+    one indexed query on the student's grades however long the list is
+    (plus a graph build when the graph is cold or stale).
+    """
+    if not subject.prerequisites:
+        return []
+
+    checker = PrerequisiteChecker([student], subject.prerequisites)
+    unmet = checker.unmet(student, subject)
+    if not unmet:
+        return []
+
+    labels = describe_prerequisites(unmet, checker.graph)
+    return [f"Prerequisite not met: {labels[ref]}" for ref in unmet]
@@ -0,0 +1,80 @@
+# academics/query_budget.py
+
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+QUERY_BUDGET_HEADER = 'X-Query-Budget'
+
+
+def query_budget(limit):
+    """
+    Declare the maximum number of queries for an extra @action, e.g.
+
+        @query_budget(4)
+        @action(detail=True, methods=['get'])
+        def prerequisites(self, request, pk=None): ...
+    """
+    def decorator(func):
+        func.query_budget = limit
+        return func
+    return decorator
+
+
+class QueryCounter:
+    """Database execute wrapper that counts the statements it sees"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+# ========================================
+# QUERY BUDGET MIXIN
+# ========================================
+
+class QueryBudgetMixin:
+    """
+    Count the queries each request runs (authentication included) and
+    compare them with the budget declared for the action.
+
+    `query_budgets` maps action names ('list', 'retrieve', ...) to a maximum;
+    extra actions can use the @query_budget decorator instead. Requests over
+    budget are logged as warnings. With DEBUG (or QUERY_COUNT_HEADER) on,
+    responses carry X-Query-Count and X-Query-Budget headers.
+    """
+    query_budgets = {}
+
+    def get_query_budget(self):
+        action = getattr(self, 'action', None)
+        if action in self.query_budgets:
+            return self.query_budgets[action]
+        handler = getattr(self, action, None) if action else None
+        return getattr(handler, 'query_budget', None)
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+
+        budget = self.get_query_budget()
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                "%s %s (%s.%s) ran %d queries, budget is %d",
+                request.method, request.path, type(self).__name__,
+                getattr(self, 'action', None), counter.count, budget,
+            )
+
+        if getattr(settings, 'QUERY_COUNT_HEADER', settings.DEBUG):
+            response[QUERY_COUNT_HEADER] = str(counter.count)
+            if budget is not None:
+                response[QUERY_BUDGET_HEADER] = str(budget)
+
+        return response
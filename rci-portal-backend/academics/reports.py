@@ -0,0 +1,374 @@
+# academics/reports.py
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import bump_version, get_table_versions, get_versions
+from .models import Enrollment, Grade, Program, Section, Subject, User
+
+COR = 'cor'
+TOR = 'tor'
+
+# Bump when the layout changes so previously rendered files are not reused
+REPORT_LAYOUT_VERSION = 1
+
+# Rendered files live under MEDIA_ROOT/<REPORTS_DIR>/<doc_type>/<student_id>/
+REPORTS_DIR = 'generated'
+
+# Tables whose rows appear on many students' documents (schedules, rooms,
+# professors, subject titles, program names); any change to them expires
+# every cached path. Per-student changes go through invalidate_reports().
+REPORT_TABLES = (Section, Subject, Program, User)
+
+HASH_LENGTH = 32
+
+
+# ========================================
+# MINIMAL PDF WRITER
+# ========================================
+
+def _pdf_string(text):
+    """PDF literal string in WinAnsi (cp1252) encoding"""
+    data = str(text).encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class PDFCanvas:
+    """
+    Just enough PDF for text documents: US Letter pages, the standard
+    Helvetica fonts (not embedded), text and lines. Output is deterministic
+    for the same drawing calls.
+    """
+    WIDTH, HEIGHT = 612, 792
+    FONTS = {False: b'F1', True: b'F2'}
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+
+    def text(self, x, y, value, size=10, bold=False):
+        self.ops.append(
+            b'BT /%s %d Tf %.2f %.2f Td %s Tj ET' % (self.FONTS[bold], size, x, y, _pdf_string(value))
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.ops.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (width, x1, y1, x2, y2))
+
+    def render(self):
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            None,  # page tree, filled in once the page objects are numbered
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        ]
+        kids = []
+        for ops in self.pages:
+            stream = b'\n'.join(ops)
+            objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+            objects.append(
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                % (self.WIDTH, self.HEIGHT, len(objects))
+            )
+            kids.append(b'%d 0 R' % len(objects))
+        objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+        output = bytearray(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+        output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(output)
+
+
+class ReportLayout:
+    """Top-to-bottom flow of headings and table rows over PDFCanvas pages"""
+    MARGIN = 48
+    LINE = 14
+
+    def __init__(self, title, header_lines):
+        self.canvas = PDFCanvas()
+        self.title = title
+        self.header_lines = header_lines
+        self.columns = None
+        self.start_page()
+
+    def start_page(self):
+        self.y = PDFCanvas.HEIGHT - self.MARGIN
+        self.canvas.text(self.MARGIN, self.y, 'RCI PORTAL', size=9)
+        self.y -= 20
+        self.canvas.text(self.MARGIN, self.y, self.title, size=14, bold=True)
+        self.y -= 22
+        for label, value in self.header_lines:
+            self.canvas.text(self.MARGIN, self.y, f'{label}:', size=10, bold=True)
+            self.canvas.text(self.MARGIN + 110, self.y, value, size=10)
+            self.y -= self.LINE
+        self.y -= 8
+
+    def ensure_space(self, lines=1):
+        if self.y - lines * self.LINE < self.MARGIN:
+            self.canvas.new_page()
+            self.start_page()
+            if self.columns:
+                self.table_header(self.columns)
+
+    def heading(self, text):
+        self.ensure_space(3)
+        self.y -= 6
+        self.canvas.text(self.MARGIN, self.y, text, size=11, bold=True)
+        self.y -= self.LINE
+
+    def table_header(self, columns):
+        """columns: [(label, width in points), ...]"""
+        self.columns = columns
+        self.ensure_space(2)
+        self.row([label for label, _ in columns], bold=True)
+        self.canvas.line(self.MARGIN, self.y + self.LINE - 3, PDFCanvas.WIDTH - self.MARGIN, self.y + self.LINE - 3)
+
+    def row(self, values, bold=False):
+        self.ensure_space()
+        x = self.MARGIN
+        for value, (_, width) in zip(values, self.columns):
+            # Helvetica averages about half the font size per character
+            limit = max(int(width / 4.6), 1)
+            text = str(value if value is not None else '')
+            self.canvas.text(x, self.y, text if len(text) <= limit else text[:limit - 1] + '.', size=9, bold=bold)
+            x += width
+        self.y -= self.LINE
+
+    def note(self, text, bold=False):
+        self.ensure_space()
+        self.canvas.text(self.MARGIN, self.y, text, size=10, bold=bold)
+        self.y -= self.LINE
+
+    def render(self):
+        return self.canvas.render()
+
+
+# ========================================
+# DOCUMENT DATA
+# ========================================
+
+def _student_header(student):
+    return {
+        'student_number': student.student_number,
+        'name': student.user.get_full_name(),
+        'program': f"{student.program.program_code} - {student.program.program_name}",
+        'year_level': student.year_level,
+    }
+
+
+def cor_data(student, term):
+    """Certificate of Registration: the student's enrolled sections for `term`"""
+    rows = Enrollment.objects.filter(
+        student=student, term=term, status='enrolled'
+    ).order_by('section__subject__code').values_list(
+        'section__subject__code', 'section__subject__title', 'section__subject__units',
+        'section__section_name', 'section__schedule', 'section__room',
+        'section__professor__first_name', 'section__professor__last_name',
+    )
+    subjects = [
+        [code, title, units, section, schedule, room, f"{first or ''} {last or ''}".strip()]
+        for code, title, units, section, schedule, room, first, last in rows
+    ]
+    return {
+        'student': _student_header(student),
+        'term': term,
+        'subjects': subjects,
+        'total_units': sum(row[2] for row in subjects),
+    }
+
+
+def tor_data(student):
+    """Transcript of Records: every grade, grouped by term"""
+    rows = Grade.objects.filter(student=student).order_by('section__term', 'subject__code').values_list(
+        'section__term', 'subject__code', 'subject__title', 'subject__units', 'grade', 'status',
+    )
+    terms = {}
+    weighted, graded_units = Decimal('0'), 0
+    for term, code, title, units, grade, status in rows:
+        terms.setdefault(term, []).append([code, title, units, str(grade) if grade is not None else '', status])
+        if grade is not None:
+            weighted += grade * units
+            graded_units += units
+    gwa = (weighted / graded_units).quantize(Decimal('0.01')) if graded_units else None
+    return {
+        'student': _student_header(student),
+        'terms': [[term, subjects] for term, subjects in terms.items()],
+        'gwa': str(gwa) if gwa is not None else None,
+    }
+
+
+def render_cor(data):
+    student = data['student']
+    layout = ReportLayout('CERTIFICATE OF REGISTRATION', [
+        ('Student Number', student['student_number']),
+        ('Name', student['name']),
+        ('Program', student['program']),
+        ('Year Level', str(student['year_level'])),
+        ('Term', data['term']),
+    ])
+    layout.table_header([
+        ('Code', 60), ('Title', 150), ('Units', 36), ('Section', 50), ('Schedule', 88), ('Room', 44), ('Professor', 88),
+    ])
+    for row in data['subjects']:
+        layout.row(row)
+    if not data['subjects']:
+        layout.note('No enrolled subjects for this term.')
+    layout.y -= 6
+    layout.note(f"Total Units: {data['total_units']}", bold=True)
+    return layout.render()
+
+
+def render_tor(data):
+    student = data['student']
+    layout = ReportLayout('TRANSCRIPT OF RECORDS', [
+        ('Student Number', student['student_number']),
+        ('Name', student['name']),
+        ('Program', student['program']),
+    ])
+    columns = [('Code', 70), ('Title', 250), ('Units', 50), ('Grade', 60), ('Remarks', 86)]
+    for term, subjects in data['terms']:
+        layout.columns = None
+        layout.heading(term)
+        layout.table_header(columns)
+        for row in subjects:
+            layout.row(row)
+    layout.columns = None
+    if not data['terms']:
+        layout.note('No grades on record.')
+    layout.y -= 6
+    layout.note(f"General Weighted Average: {data['gwa'] or 'N/A'}", bold=True)
+    return layout.render()
+
+
+# ========================================
+# CACHED FILES
+# ========================================
+
+def content_hash(doc_type, data):
+    payload = json.dumps(
+        {'version': REPORT_LAYOUT_VERSION, 'doc_type': doc_type, 'data': data},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _directory(doc_type, student_id):
+    return os.path.join(settings.MEDIA_ROOT, REPORTS_DIR, doc_type, str(student_id))
+
+
+def _term_key(term):
+    """Hash of the exact term; slugs collide on case and punctuation"""
+    return hashlib.sha256(term.encode()).hexdigest()[:16]
+
+
+def _prefix(doc_type, term):
+    return f'{_term_key(term)}-' if doc_type == COR else 'tor-'
+
+
+def _generation_key(student_id):
+    return f'report-generation:{student_id}'
+
+
+def _cache_key(doc_type, student_id, term=None):
+    versions = get_versions([_generation_key(student_id)]) + get_table_versions(REPORT_TABLES)
+    return f"report:{doc_type}:{student_id}:{'.'.join(map(str, versions))}:{_term_key(term or '')}"
+
+
+def get_report(student, doc_type, term=None):
+    """
+    Open the rendered `doc_type` PDF for `student` (and `term` for a COR)
+    for reading; the caller closes it.
+
+    The file name carries a hash of the document's data, so a render is
+    reused for as long as the data is unchanged. The path of the current
+    file is cached until invalidate_reports(), a change to REPORT_TABLES
+    or REPORT_CACHE_TTL expires it, so repeat requests are served from
+    disk without querying enrollments or grades. The file is returned open
+    because a concurrent render with newer data may delete it.
+    """
+    key = _cache_key(doc_type, student.pk, term)
+    path = cache.get(key)
+    if path:
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            pass
+
+    if doc_type == COR:
+        data, render = cor_data(student, term), render_cor
+    else:
+        data, render = tor_data(student), render_tor
+
+    directory = _directory(doc_type, student.pk)
+    prefix = _prefix(doc_type, term)
+    path = os.path.join(directory, f'{prefix}{content_hash(doc_type, data)[:HASH_LENGTH]}.pdf')
+    try:
+        report = open(path, 'rb')
+    except FileNotFoundError:
+        report = _write(directory, path, render(data))
+        _remove_stale(directory, prefix, keep=path)
+
+    cache.set(key, path, getattr(settings, 'REPORT_CACHE_TTL', 60 * 60 * 24))
+    return report
+
+
+def _write(directory, path, content):
+    """Write `content` to `path` and return it open for reading from the start"""
+    os.makedirs(directory, exist_ok=True)
+    # Write then rename so concurrent requests never see a partial file
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    report = os.fdopen(handle, 'w+b')
+    try:
+        report.write(content)
+        report.flush()
+        os.replace(temporary, path)
+    except BaseException:
+        report.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    report.seek(0)
+    return report
+
+
+def _remove_stale(directory, prefix, keep=None):
+    """Delete the other renders of one document: `<prefix><hash>.pdf`, not a longer prefix's files"""
+    pattern = re.compile(re.escape(prefix) + f'[0-9a-f]{{{HASH_LENGTH}}}\\.pdf')
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        if pattern.fullmatch(name) and path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def invalidate_reports(student_id):
+    """
+    Forget the cached COR/TOR paths of a student once the current
+    transaction commits, by moving the student to a new generation (a
+    counter shared by every process, like the table versions). Rendered
+    files stay until a re-render with new data replaces them.
+    """
+    bump_version(_generation_key(student_id))
@@ -0,0 +1,456 @@
+# academics/scheduling.py
+
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from .caching import bump_version, get_versions
+from .models import Enrollment, Section, SectionMeeting
+
+# ========================================
+# SCHEDULE PARSING
+# ========================================
+
+# Schedules that intentionally have no meeting times
+UNSCHEDULED = {'', 'TBA', 'TBD'}
+
+_BLOCK_RE = re.compile(
+    r'^(?P<days>[A-Z]+)\s+'
+    r'(?P<start>\d{1,2}(?::\d{2})?)\s*(?P<start_suffix>AM|PM|NN)?\s*-\s*'
+    r'(?P<end>\d{1,2}(?::\d{2})?)\s*(?P<end_suffix>AM|PM|NN)?$'
+)
+
+
+class ScheduleParseError(ValueError):
+    pass
+
+
+def parse_days(text):
+    """Parse day codes such as 'MWF', 'TTH' or 'SAT' into weekday numbers (Mon=0)"""
+    days, i = [], 0
+    while i < len(text):
+        for token, day in (('SUN', 6), ('SAT', 5), ('TH', 3), ('SU', 6), ('SA', 5),
+                           ('M', 0), ('T', 1), ('W', 2), ('F', 4), ('S', 5)):
+            if text.startswith(token, i):
+                days.append(day)
+                i += len(token)
+                break
+        else:
+            raise ScheduleParseError(f"Unknown day code in '{text}'")
+    return sorted(set(days))
+
+
+def _minutes(text, suffix):
+    hours, _, minutes = text.partition(':')
+    hours, minutes = int(hours), int(minutes or 0)
+    if hours > 23 or minutes > 59:
+        raise ScheduleParseError(f"Invalid time '{text}'")
+    if suffix == 'PM' and hours < 12:
+        hours += 12
+    elif suffix == 'AM' and hours == 12:
+        hours = 0
+    return hours * 60 + minutes
+
+
+def parse_schedule(schedule):
+    """
+    Parse a free-text schedule into (day, start_minute, end_minute) tuples.
+
+    Accepts the formats used across the portal, e.g. 'MWF 8:00-9:00 AM',
+    'TTH 11:30-1:00 PM' (start shares the end's meridiem unless that puts it
+    after the end), 'MWF 11:00-12:00 NN' and 24-hour times. Several blocks
+    may be separated with ';'. 'TBA' and blank schedules have no meetings.
+    """
+    meetings = []
+    text = (schedule or '').strip().upper()
+    if text in UNSCHEDULED:
+        return meetings
+
+    for block in text.split(';'):
+        match = _BLOCK_RE.match(block.strip())
+        if not match:
+            raise ScheduleParseError(f"Cannot parse schedule '{block.strip()}'")
+
+        end_suffix = match['end_suffix']
+        end = _minutes(match['end'], end_suffix)
+        start_suffix = match['start_suffix'] or end_suffix
+        start = _minutes(match['start'], start_suffix)
+
+        # '11:30-1:00 PM' means 11:30 AM to 1:00 PM
+        if not match['start_suffix'] and start >= end and start >= 12 * 60:
+            start -= 12 * 60
+        if start >= end:
+            raise ScheduleParseError(f"Schedule '{block.strip()}' ends before it starts")
+
+        for day in parse_days(match['days']):
+            meetings.append((day, start, end))
+
+    return sorted(set(meetings))
+
+
+# ========================================
+# TIMETABLE (SORTED INTERVALS)
+# ========================================
+
+class Timetable:
+    """
+    A student's weekly meetings kept as per-day lists sorted by start time.
+
+    Stored meetings may overlap each other (they come from enrollment rows,
+    which admin edits and schedule changes can leave clashing), so each day
+    also keeps the running maximum end time. A conflict check bisects to
+    the last meeting starting before the candidate ends and walks back only
+    while that running maximum still reaches past the candidate's start:
+    O(log n) when nothing clashes.
+    """
+
+    def __init__(self, meetings=()):
+        self._days = defaultdict(list)
+        self._reach = {}
+        for day, start, end, label in meetings:
+            self._days[day].append((start, end, label))
+        for day, slots in self._days.items():
+            slots.sort()
+            self._update_reach(day)
+
+    def _update_reach(self, day, first=0):
+        """Recompute the running maximum end of `day` from index `first` on"""
+        slots = self._days[day]
+        reach = self._reach.setdefault(day, [])
+        del reach[first:]
+        latest = reach[-1] if reach else 0
+        for start, end, label in slots[first:]:
+            latest = max(latest, end)
+            reach.append(latest)
+
+    def overlapping(self, day, start, end):
+        """Labels of the meetings overlapping [start, end), latest start first"""
+        slots = self._days.get(day)
+        if not slots:
+            return []
+        reach = self._reach[day]
+        labels = []
+        index = bisect_left(slots, (end,)) - 1
+        while index >= 0 and reach[index] > start:
+            if slots[index][1] > start:
+                labels.append(slots[index][2])
+            index -= 1
+        return labels
+
+    def conflict(self, day, start, end):
+        """Return the label of a meeting overlapping [start, end), or None"""
+        labels = self.overlapping(day, start, end)
+        return labels[0] if labels else None
+
+    def conflicts(self, meetings):
+        """Return labels of every existing meeting that clashes with `meetings`"""
+        found = []
+        for day, start, end in meetings:
+            for label in self.overlapping(day, start, end):
+                if label not in found:
+                    found.append(label)
+        return found
+
+    def add(self, meetings, label):
+        for day, start, end in meetings:
+            slots = self._days[day]
+            index = bisect_left(slots, (start, end, label))
+            slots.insert(index, (start, end, label))
+            self._update_reach(day, index)
+
+
+# ========================================
+# ROOM / PROFESSOR OCCUPANCY
+# ========================================
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def meetings_mask(meetings):
+    """
+    Encode meetings as a weekly bitmap with one bit per 5-minute slot
+    (Monday 00:00 is bit 0). Two schedules overlap iff their masks AND
+    to non-zero.
+    """
+    mask = 0
+    for day, start, end in meetings:
+        first = start // SLOT_MINUTES
+        last = -(-end // SLOT_MINUTES)  # ceiling
+        mask |= ((1 << (last - first)) - 1) << (day * SLOTS_PER_DAY + first)
+    return mask
+
+
+def normalize_room(room):
+    room = (room or '').strip().upper()
+    return '' if room in UNSCHEDULED else room
+
+
+def room_booked(room, holders):
+    return f"Room {room} is already booked at this time ({', '.join(holders)})"
+
+
+def professor_booked(holders):
+    return f"Professor is already teaching at this time ({', '.join(holders)})"
+
+
+class OccupancyIndex:
+    """
+    Weekly slot bitmaps of every room and professor in one term.
+
+    Each room/professor bitmap is the OR of its sections' masks, so a
+    double-booking check is a couple of integer ANDs regardless of how many
+    sections the term has.
+    """
+
+    def __init__(self, rows=(), rooms=()):
+        # rows: (section_id, room, professor_id, subject_code, section_name, day, start, end)
+        self.sections = {}
+        self.rooms = {}
+        self.professors = {}
+        self.room_names = {normalize_room(room): room for room in rooms if normalize_room(room)}
+
+        grouped = defaultdict(list)
+        details = {}
+        for section_id, room, professor_id, code, name, day, start, end in rows:
+            details[section_id] = (room, professor_id, f"{code} {name}")
+            if day is not None:
+                grouped[section_id].append((day, start, end))
+        for section_id, (room, professor_id, label) in details.items():
+            self.place(section_id, room, professor_id, label, grouped[section_id])
+
+    @classmethod
+    def build(cls, term):
+        """Build the index for a term with two queries"""
+        rows = Section.objects.filter(term=term).values_list(
+            'section_id', 'room', 'professor_id', 'subject__code', 'section_name',
+            'meetings__day', 'meetings__start_minute', 'meetings__end_minute',
+        )
+        rooms = Section.objects.values_list('room', flat=True).distinct()
+        return cls(rows, rooms)
+
+    def _rebuild(self, table, key, field):
+        table[key] = 0
+        for entry in self.sections.values():
+            if entry[field] == key:
+                table[key] |= entry['mask']
+
+    def place(self, section_id, room, professor_id, label, meetings):
+        """Add or replace a section in the index"""
+        self.remove(section_id)
+        room_key = normalize_room(room)
+        entry = {'room': room_key, 'professor': professor_id, 'label': label, 'mask': meetings_mask(meetings)}
+        self.sections[section_id] = entry
+        if room_key:
+            self.room_names.setdefault(room_key, room)
+            self.rooms[room_key] = self.rooms.get(room_key, 0) | entry['mask']
+        if professor_id:
+            self.professors[professor_id] = self.professors.get(professor_id, 0) | entry['mask']
+
+    def remove(self, section_id):
+        entry = self.sections.pop(section_id, None)
+        if entry is None:
+            return
+        if entry['room']:
+            self._rebuild(self.rooms, entry['room'], 'room')
+        if entry['professor']:
+            self._rebuild(self.professors, entry['professor'], 'professor')
+
+    def _holders(self, field, key, mask, exclude):
+        return [
+            entry['label'] for section_id, entry in self.sections.items()
+            if section_id != exclude and entry[field] == key and entry['mask'] & mask
+        ]
+
+    def collisions(self, section_id, room, professor_id, meetings):
+        """
+        Return {'room': [...], 'professor': [...]} describing double bookings
+        if `section_id` were saved with this room/professor/schedule.
+        """
+        mask = meetings_mask(meetings)
+        own = self.sections.get(section_id)
+        errors = {}
+
+        room_key = normalize_room(room)
+        if room_key:
+            busy = self.rooms.get(room_key, 0)
+            if own and own['room'] == room_key:
+                busy &= ~own['mask']
+            if busy & mask:
+                errors['room'] = [room_booked(room, self._holders('room', room_key, mask, section_id))]
+
+        if professor_id:
+            busy = self.professors.get(professor_id, 0)
+            if own and own['professor'] == professor_id:
+                busy &= ~own['mask']
+            if busy & mask:
+                errors['professor'] = [professor_booked(self._holders('professor', professor_id, mask, section_id))]
+
+        return errors
+
+    def free_rooms(self, meetings):
+        """Known rooms with no booking overlapping `meetings`"""
+        mask = meetings_mask(meetings)
+        return sorted(
+            name for key, name in self.room_names.items()
+            if not self.rooms.get(key, 0) & mask
+        )
+
+
+# term -> (schedule version, OccupancyIndex). The schedule version is a
+# shared counter bumped by every committed section save or delete (not by
+# seat changes), so an index another process changed is rebuilt here.
+_occupancy = {}
+_occupancy_lock = threading.Lock()
+SCHEDULE_VERSION_KEY = 'schedule-version'
+
+
+def get_occupancy_index(term):
+    """Return the occupancy index for a term, (re)building it when another process changed sections"""
+    version = get_versions([SCHEDULE_VERSION_KEY])[0]
+    loaded = _occupancy.get(term)
+    if loaded is None or loaded[0] != version:
+        with _occupancy_lock:
+            loaded = _occupancy.get(term)
+            if loaded is None or loaded[0] != version:
+                loaded = _occupancy[term] = (version, OccupancyIndex.build(term))
+    return loaded[1]
+
+
+def invalidate_occupancy():
+    """Drop every loaded occupancy index (rebuilt on next use)"""
+    with _occupancy_lock:
+        _occupancy.clear()
+
+
+def update_occupancy(section, deleted=False):
+    """
+    Move the schedule version on and apply a saved or deleted section to
+    this process's loaded indexes once the transaction commits
+    """
+    bump_version(SCHEDULE_VERSION_KEY, then=lambda version: _apply_occupancy(section, deleted, version))
+
+
+def _apply_occupancy(section, deleted, version):
+    room_key = normalize_room(section.room)
+    with _occupancy_lock:
+        for term, (loaded_version, index) in list(_occupancy.items()):
+            # Only an index that was current just before this bump can be
+            # patched; one that missed another change is rebuilt on next use
+            if version is None or loaded_version != version - 1:
+                del _occupancy[term]
+                continue
+            index.remove(section.pk)
+            if room_key and not deleted:
+                index.room_names.setdefault(room_key, section.room)
+            if term == section.term and not deleted:
+                try:
+                    meetings = parse_schedule(section.schedule)
+                except ScheduleParseError:
+                    meetings = []
+                label = f"{section.subject.code} {section.section_name}"
+                index.place(section.pk, section.room, section.professor_id, label, meetings)
+            _occupancy[term] = (version, index)
+
+
+# ========================================
+# DATABASE HELPERS
+# ========================================
+
+def sync_section_meetings(section):
+    """Replace a section's meeting rows with its parsed schedule"""
+    try:
+        parsed = parse_schedule(section.schedule)
+    except ScheduleParseError:
+        parsed = []
+
+    SectionMeeting.objects.filter(section=section).delete()
+    SectionMeeting.objects.bulk_create([
+        SectionMeeting(section=section, day=day, start_minute=start, end_minute=end)
+        for day, start, end in parsed
+    ])
+
+
+def lock_terms(terms):
+    """
+    Lock the sections of `terms` until the transaction ends, so room and
+    professor bookings in a term are checked and saved one at a time
+    (SQLite serializes all writers anyway).
+    """
+    list(Section.objects.select_for_update().filter(term__in=terms).values_list('pk', flat=True))
+
+
+def section_collisions(section):
+    """
+    Room and professor double bookings of a saved section, read from the
+    SectionMeeting rows of its term (like OccupancyIndex.collisions(), but
+    seeing the current transaction's own writes).
+    """
+    overlaps = [
+        Q(day=day, start_minute__lt=end, end_minute__gt=start)
+        for day, start, end in section_meetings([section.pk])[section.pk]
+    ]
+    if not overlaps:
+        return {}
+    rows = SectionMeeting.objects.filter(
+        reduce(or_, overlaps), section__term=section.term
+    ).exclude(section_id=section.pk).values_list(
+        'section__room', 'section__professor_id', 'section__subject__code', 'section__section_name',
+    ).distinct()
+
+    room_key = normalize_room(section.room)
+    rooms, professors = [], []
+    for room, professor_id, code, name in rows:
+        label = f"{code} {name}"
+        if room_key and normalize_room(room) == room_key and label not in rooms:
+            rooms.append(label)
+        if section.professor_id and professor_id == section.professor_id and label not in professors:
+            professors.append(label)
+
+    errors = {}
+    if rooms:
+        errors['room'] = [room_booked(section.room, rooms)]
+    if professors:
+        errors['professor'] = [professor_booked(professors)]
+    return errors
+
+
+def section_meetings(section_ids):
+    """Map section_id -> [(day, start, end)] with one query"""
+    meetings = defaultdict(list)
+    rows = SectionMeeting.objects.filter(section_id__in=section_ids).values_list(
+        'section_id', 'day', 'start_minute', 'end_minute'
+    )
+    for section_id, day, start, end in rows:
+        meetings[section_id].append((day, start, end))
+    return meetings
+
+
+def student_timetables(student_ids, terms):
+    """
+    Map (student_id, term) -> Timetable of the seat-holding enrollments of
+    the given students, with one query.
+    """
+    meetings = defaultdict(list)
+    rows = Enrollment.objects.filter(
+        student_id__in=student_ids, term__in=terms, status__in=Enrollment.SEAT_STATUSES,
+        section__meetings__isnull=False,
+    ).values_list(
+        'student_id', 'term', 'section__meetings__day', 'section__meetings__start_minute',
+        'section__meetings__end_minute', 'section__subject__code', 'section__schedule',
+    )
+    for student_id, term, day, start, end, code, schedule in rows:
+        meetings[(student_id, term)].append((day, start, end, f"{code} ({schedule})"))
+    return defaultdict(Timetable, {key: Timetable(value) for key, value in meetings.items()})
+
+
+def find_schedule_conflicts(student, section, term):
+    """Return labels of the student's sections in `term` that clash with `section`"""
+    timetable = student_timetables([student.pk], [term])[(student.pk, term)]
+    return timetable.conflicts(section_meetings([section.pk])[section.pk])
@@ -2,16 +2,24 @@
 
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db import transaction
 from .models import (
     User, Program, Curriculum, Subject, Section,
-    Student, Enrollment, Grade, Application, Document, AuditLog
+    Student, Enrollment, Grade, Application, Document, AuditLog, WaitlistEntry
 )
+from .prerequisites import check_prerequisites, get_prerequisite_graph
+from .enrollment import holds_seat, reserve_seats, move_seat, SECTION_FULL
+from .scheduling import (
+    ScheduleParseError, parse_schedule, find_schedule_conflicts, get_occupancy_index,
+    lock_terms, section_collisions,
+)
+from .fieldsets import DynamicFieldsMixin
 
 # ========================================
 # USER & AUTHENTICATION SERIALIZERS
 # ========================================
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serialize User data (excluding password)"""
     full_name = serializers.SerializerMethodField()
     
@@ -20,12 +28,13 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['user_id', 'username', 'email', 'role', 'first_name', 
                   'last_name', 'full_name', 'is_active', 'date_joined']
         read_only_fields = ['user_id', 'date_joined']
+        sparse_dependencies = {'full_name': ['first_name', 'last_name']}
     
     def get_full_name(self, obj):
         return obj.get_full_name()
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Create new users with password handling"""
     password = serializers.CharField(write_only=True, min_length=8)
     password_confirm = serializers.CharField(write_only=True)
@@ -90,20 +99,21 @@ class ChangePasswordSerializer(serializers.Serializer):
 # PROGRAM & CURRICULUM SERIALIZERS
 # ========================================
 
-class ProgramSerializer(serializers.ModelSerializer):
+class ProgramSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Program
         fields = '__all__'
         read_only_fields = ['program_id']
 
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     curriculum_info = serializers.SerializerMethodField()
     
     class Meta:
         model = Subject
         fields = '__all__'
         read_only_fields = ['subject_id']
+        sparse_dependencies = {'curriculum_info': ['curriculum__program']}
     
     def get_curriculum_info(self, obj):
         return {
@@ -111,9 +121,23 @@ class SubjectSerializer(serializers.ModelSerializer):
             'year_level': obj.curriculum.year_level,
             'semester': obj.curriculum.semester
         }
+    
+    def validate(self, data):
+        # Reject prerequisite lists that would make the graph cyclic
+        if 'prerequisites' in data:
+            instance = self.instance
+            code = data.get('code', instance.code if instance else None)
+            cycle = get_prerequisite_graph().find_cycle(
+                instance.pk if instance else None, code, data['prerequisites']
+            )
+            if cycle:
+                raise serializers.ValidationError({
+                    'prerequisites': f"Circular prerequisite: {', '.join(map(str, cycle))}"
+                })
+        return data
 
 
-class CurriculumSerializer(serializers.ModelSerializer):
+class CurriculumSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     program_name = serializers.CharField(source='program.program_name', read_only=True)
     program_code = serializers.CharField(source='program.program_code', read_only=True)
     subjects = SubjectSerializer(many=True, read_only=True)
@@ -122,32 +146,113 @@ class CurriculumSerializer(serializers.ModelSerializer):
         model = Curriculum
         fields = '__all__'
         read_only_fields = ['curriculum_id']
+        expandable_fields = {
+            'program': (ProgramSerializer, {'read_only': True}),
+        }
 
 
 # ========================================
 # SECTION SERIALIZERS
 # ========================================
 
-class SectionSerializer(serializers.ModelSerializer):
+class SectionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     subject_code = serializers.CharField(source='subject.code', read_only=True)
     subject_title = serializers.CharField(source='subject.title', read_only=True)
-    professor_name = serializers.CharField(source='professor.get_full_name', read_only=True)
+    # Enrolled (not pending) students; seats_taken also counts pending ones
     enrolled_count = serializers.SerializerMethodField()
+    available_seats = serializers.SerializerMethodField()
     
     class Meta:
         model = Section
         fields = '__all__'
-        read_only_fields = ['section_id']
+        read_only_fields = ['section_id', 'seats_taken']
+        sparse_dependencies = {'available_seats': ['capacity', 'seats_taken']}
+        expandable_fields = {
+            'subject': (SubjectSerializer, {'read_only': True}),
+            'professor': (UserSerializer, {'read_only': True}),
+            'professor_name': (serializers.CharField, {'source': 'professor.get_full_name', 'read_only': True}),
+        }
+    
+    def bind(self, field_name, parent):
+        super().bind(field_name, parent)
+        # Sections nested in other resources are not annotated with the count
+        if not isinstance(parent, serializers.ListSerializer) or parent.parent is not None:
+            self.fields.pop('enrolled_count', None)
     
     def get_enrolled_count(self, obj):
-        return obj.enrollments.filter(status='enrolled').count()
+        # Annotated by with_enrolled_count(); counted for single saved sections
+        count = getattr(obj, 'enrolled_count', None)
+        if count is None:
+            count = obj.enrollments.filter(status='enrolled').count()
+        return count
+    
+    def get_available_seats(self, obj):
+        return max(obj.capacity - obj.seats_taken, 0)
+    
+    def validate_schedule(self, value):
+        try:
+            parse_schedule(value)
+        except ScheduleParseError as exc:
+            raise serializers.ValidationError(
+                f"{exc}. Use a format like 'MWF 8:00-9:00 AM' or 'TBA'"
+            )
+        return value
+    
+    def validate_capacity(self, value):
+        if self.instance and value < self.instance.seats_taken:
+            raise serializers.ValidationError(
+                f"Capacity cannot be lower than the {self.instance.seats_taken} seats already taken"
+            )
+        return value
+    
+    def validate(self, data):
+        # Reject room and professor double bookings within the term
+        instance = self.instance
+        
+        def current(field):
+            return data[field] if field in data else getattr(instance, field, None)
+        
+        try:
+            meetings = parse_schedule(current('schedule'))
+        except ScheduleParseError:
+            # Legacy free-text schedule left untouched by this update
+            meetings = []
+        
+        professor = current('professor')
+        collisions = get_occupancy_index(current('term')).collisions(
+            instance.pk if instance else None,
+            current('room'),
+            professor.pk if professor else None,
+            meetings,
+        )
+        if collisions:
+            raise serializers.ValidationError(collisions)
+        return data
+    
+    def create(self, validated_data):
+        with transaction.atomic():
+            lock_terms([validated_data.get('term')])
+            return self._check_bookings(super().create(validated_data))
+    
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            lock_terms({instance.term, validated_data.get('term', instance.term)})
+            return self._check_bookings(super().update(instance, validated_data))
+    
+    def _check_bookings(self, section):
+        # validate() read the occupancy index, which a concurrent save may
+        # not have reached yet; re-check the stored meetings under the lock
+        collisions = section_collisions(section)
+        if collisions:
+            raise serializers.ValidationError(collisions)
+        return section
 
 
 # ========================================
 # STUDENT SERIALIZERS
 # ========================================
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_info = UserSerializer(source='user', read_only=True)
     program_name = serializers.CharField(source='program.program_name', read_only=True)
     program_code = serializers.CharField(source='program.program_code', read_only=True)
@@ -156,9 +261,13 @@ class StudentSerializer(serializers.ModelSerializer):
         model = Student
         fields = '__all__'
         read_only_fields = ['student_id']
+        expandable_fields = {
+            'user': (UserSerializer, {'read_only': True}),
+            'program': (ProgramSerializer, {'read_only': True}),
+        }
 
 
-class StudentCreateSerializer(serializers.ModelSerializer):
+class StudentCreateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_info = UserSerializer(source='user', read_only=True)
     
     class Meta:
@@ -176,36 +285,58 @@ class StudentCreateSerializer(serializers.ModelSerializer):
 # ========================================
 # ENROLLMENT SERIALIZERS
 # ========================================
-class EnrollmentSerializer(serializers.ModelSerializer):
+
+class SectionInfoSerializer(serializers.BaseSerializer):
+    """Flat section summary shown with enrollments (?expand=section_info)"""
+    
+    def to_representation(self, section):
+        return {
+            'section_id': str(section.section_id),
+            'section_name': section.section_name,
+            'subject_code': section.subject.code,
+            'subject_title': section.subject.title,
+            'schedule': section.schedule,
+            'room': section.room,
+            'professor_name': section.professor.get_full_name() if section.professor else 'TBA',
+            'subject': {
+                'units': section.subject.units,
+                'syllabus_pdf': section.subject.syllabus_pdf.url if section.subject.syllabus_pdf else None,
+                'summary': section.subject.summary,
+            }
+        }
+
+
+class EnrollmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     student_number = serializers.CharField(source='student.student_number', read_only=True)
-    section_info = serializers.SerializerMethodField()  # ✅ Add this
     
     class Meta:
         model = Enrollment
         fields = '__all__'
         read_only_fields = ['enrollment_id', 'timestamp']
-    
-    def get_section_info(self, obj):  # ✅ Add this method
-        if not obj.section:
-            return None
-        return {
-            'section_id': str(obj.section.section_id),
-            'section_name': obj.section.section_name,
-            'subject_code': obj.section.subject.code,
-            'subject_title': obj.section.subject.title,
-            'schedule': obj.section.schedule,
-            'room': obj.section.room,
-            'professor_name': obj.section.professor.get_full_name() if obj.section.professor else 'TBA',
-            'subject': {
-                'units': obj.section.subject.units,
-                'syllabus_pdf': obj.section.subject.syllabus_pdf.url if obj.section.subject.syllabus_pdf else None,
-                'summary': obj.section.subject.summary,
-            }
+        sparse_dependencies = {'section_info': ['section__subject', 'section__professor']}
+        expandable_fields = {
+            'student': (StudentSerializer, {'read_only': True}),
+            'section': (SectionSerializer, {'read_only': True}),
+            'section_info': (SectionInfoSerializer, {'source': 'section', 'read_only': True}),
         }
+    
+    def update(self, instance, validated_data):
+        # Keep section seat counters in step with status/section changes.
+        # The row is locked and re-read first: a concurrent update may have
+        # moved or released this enrollment's seat since it was loaded.
+        with transaction.atomic():
+            current = Enrollment.objects.select_for_update().values('section_id', 'status').get(pk=instance.pk)
+            instance.section_id, instance.status = current['section_id'], current['status']
+            move_seat(
+                current['section_id'], current['status'],
+                validated_data['section'].pk if 'section' in validated_data else current['section_id'],
+                validated_data.get('status', current['status']),
+            )
+            return super().update(instance, validated_data)
 
 
-class EnrollmentCreateSerializer(serializers.ModelSerializer):
+class EnrollmentCreateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Create enrollment with prerequisite validation"""
     
     class Meta:
@@ -217,21 +348,17 @@ class EnrollmentCreateSerializer(serializers.ModelSerializer):
         section = data['section']
         subject = section.subject
         
-        # Check prerequisites
-        if subject.prerequisites:
-            for prereq_id in subject.prerequisites:
-                # Check if student has passed the prerequisite
-                passed = Grade.objects.filter(
-                    student=student,
-                    subject__subject_id=prereq_id,
-                    status='passed'
-                ).exists()
-                
-                if not passed:
-                    prereq = Subject.objects.get(subject_id=prereq_id)
-                    raise serializers.ValidationError(
-                        f"Prerequisite not met: {prereq.code} - {prereq.title}"
-                    )
+        # Check prerequisites (all unmet prerequisites are reported together)
+        errors = check_prerequisites(student, subject)
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        # Check for timetable conflicts with the student's other sections
+        conflicts = find_schedule_conflicts(student, section, data['term'])
+        if conflicts:
+            raise serializers.ValidationError(
+                [f"Schedule conflict with {label}" for label in conflicts]
+            )
         
         # Check for duplicate enrollment
         duplicate = Enrollment.objects.filter(
@@ -246,13 +373,62 @@ class EnrollmentCreateSerializer(serializers.ModelSerializer):
             )
         
         return data
+    
+    def create(self, validated_data):
+        # Take the seat and insert the enrollment in one transaction
+        with transaction.atomic():
+            if holds_seat(validated_data.get('status', 'pending')):
+                if not reserve_seats(validated_data['section'].pk):
+                    raise serializers.ValidationError({'section': [SECTION_FULL]})
+            return super().create(validated_data)
+
+
+class WaitlistEntrySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Queue an enrollment intent; students always queue for themselves"""
+    student_number = serializers.CharField(source='student.student_number', read_only=True)
+    subject_code = serializers.CharField(source='section.subject.code', read_only=True)
+    
+    class Meta:
+        model = WaitlistEntry
+        fields = '__all__'
+        expandable_fields = {
+            'student': (StudentSerializer, {'read_only': True}),
+            'section': (SectionSerializer, {'read_only': True}),
+        }
+        read_only_fields = ['entry_id', 'status', 'enrollment', 'message',
+                            'requested_by', 'timestamp', 'processed_at']
+        extra_kwargs = {'student': {'required': False}}
+        # The active-request constraint is checked in validate(), after the
+        # student has been filled in for student users
+        validators = []
+    
+    def validate(self, data):
+        user = self.context['request'].user
+        
+        if user.role == 'student':
+            data['student'] = Student.objects.filter(user=user).first()
+            if data['student'] is None:
+                raise serializers.ValidationError("No student profile for this user")
+        elif 'student' not in data:
+            raise serializers.ValidationError({'student': ["This field is required."]})
+        
+        active = WaitlistEntry.objects.filter(
+            student=data['student'], section=data['section'], term=data['term'],
+            status__in=WaitlistEntry.ACTIVE_STATUSES
+        ).exists()
+        if active:
+            raise serializers.ValidationError(
+                "An enrollment request for this section is already queued"
+            )
+        
+        return data
 
 
 # ========================================
 # GRADE SERIALIZERS
 # ========================================
 
-class GradeSerializer(serializers.ModelSerializer):
+class GradeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     student_number = serializers.CharField(source='student.student_number', read_only=True)
     subject_code = serializers.CharField(source='subject.code', read_only=True)
@@ -263,9 +439,15 @@ class GradeSerializer(serializers.ModelSerializer):
         model = Grade
         fields = '__all__'
         read_only_fields = ['grade_id']
+        expandable_fields = {
+            'student': (StudentSerializer, {'read_only': True}),
+            'subject': (SubjectSerializer, {'read_only': True}),
+            'section': (SectionSerializer, {'read_only': True}),
+            'encoded_by': (UserSerializer, {'read_only': True}),
+        }
 
 
-class GradeSubmitSerializer(serializers.ModelSerializer):
+class GradeSubmitSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Professor submits/updates grades"""
     
     class Meta:
@@ -297,7 +479,7 @@ class GradeSubmitSerializer(serializers.ModelSerializer):
 # APPLICATION SERIALIZERS
 # ========================================
 
-class ApplicationSerializer(serializers.ModelSerializer):
+class ApplicationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     program_name = serializers.CharField(source='program.program_name', read_only=True)
     program_code = serializers.CharField(source='program.program_code', read_only=True)
     
@@ -305,13 +487,16 @@ class ApplicationSerializer(serializers.ModelSerializer):
         model = Application
         fields = '__all__'
         read_only_fields = ['application_id', 'timestamp']
+        expandable_fields = {
+            'program': (ProgramSerializer, {'read_only': True}),
+        }
 
 
 # ========================================
 # DOCUMENT SERIALIZERS
 # ========================================
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     student_number = serializers.CharField(source='student.student_number', read_only=True)
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True)
@@ -320,17 +505,24 @@ class DocumentSerializer(serializers.ModelSerializer):
         model = Document
         fields = '__all__'
         read_only_fields = ['document_id', 'timestamp']
+        expandable_fields = {
+            'student': (StudentSerializer, {'read_only': True}),
+            'uploaded_by': (UserSerializer, {'read_only': True}),
+        }
 
 
 # ========================================
 # AUDIT LOG SERIALIZERS
 # ========================================
 
-class AuditLogSerializer(serializers.ModelSerializer):
+class AuditLogSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_role = serializers.CharField(source='user.role', read_only=True)
     
     class Meta:
         model = AuditLog
         fields = '__all__'
-        read_only_fields = ['log_id', 'timestamp']
\ No newline at end of file
+        read_only_fields = ['log_id', 'timestamp']
+        expandable_fields = {
+            'user': (UserSerializer, {'read_only': True}),
+        }
\ No newline at end of file
@@ -1,17 +1,27 @@
 from django.db.models.signals import post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Student, AuditLog
+from .models import Program, Curriculum, Student, Subject, Section, Enrollment, Grade
+from .enrollment import holds_seat, release_seats
+from .scheduling import sync_section_meetings, update_occupancy
+from .prerequisites import invalidate_prerequisite_graph
+from .reports import invalidate_reports
+from .caching import bump_table_version
+from .audit import record_change, track_changes
 
 User = get_user_model()
 
+# Saves that change nothing are not audited
+track_changes(Student)
+
 @receiver(post_save, sender=Student)
 def log_student_save(sender, instance, created, **kwargs):
-    AuditLog.objects.create(
-        entity="Student",
-        action="create" if created else "update",
+    record_change(
+        instance,
+        "create" if created else "update",
         user=getattr(instance, "_changed_by", None),  # This is now set in admin
-        details={
+        details=lambda: {
             "student_number": instance.student_number,
             "year_level": instance.year_level,
             "program": str(instance.program),
@@ -21,12 +31,68 @@ def log_student_save(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=Student)
 def log_student_delete(sender, instance, **kwargs):
-    AuditLog.objects.create(
-        entity="Student",
-        action="delete",
+    record_change(
+        instance,
+        "delete",
         user=getattr(instance, "_changed_by", None),
         details={
             "student_number": instance.student_number,
             "year_level": instance.year_level,
         }
     )
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def invalidate_subject_graph(sender, instance, **kwargs):
+    """Rebuild the prerequisite graph on next use, once the change is committed"""
+    transaction.on_commit(invalidate_prerequisite_graph)
+
+
+@receiver(post_delete, sender=Enrollment)
+def release_enrollment_seat(sender, instance, **kwargs):
+    """Free the seat of a deleted enrollment (including cascaded deletes)"""
+    if holds_seat(instance.status):
+        release_seats(instance.section_id)
+
+
+@receiver(post_save, sender=Section)
+def sync_section_schedule(sender, instance, **kwargs):
+    """Keep the structured meeting rows (now) and occupancy indexes (on commit) in step with the schedule"""
+    sync_section_meetings(instance)
+    update_occupancy(instance)
+
+
+@receiver(post_delete, sender=Section)
+def remove_section_occupancy(sender, instance, **kwargs):
+    update_occupancy(instance, deleted=True)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+@receiver([post_save, post_delete], sender=Grade)
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_student_reports(sender, instance, **kwargs):
+    """Re-render the student's COR/TOR on next request"""
+    invalidate_reports(instance.pk if sender is Student else instance.student_id)
+
+
+@receiver([post_save, post_delete], sender=Program)
+@receiver([post_save, post_delete], sender=Curriculum)
+@receiver([post_save, post_delete], sender=Subject)
+def bump_catalog_version(sender, instance, **kwargs):
+    """Expire ETags of responses built from this table"""
+    bump_table_version(sender)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+@receiver([post_save, post_delete], sender=Section)
+def bump_section_version(sender, instance, **kwargs):
+    # Section responses include enrolled counts
+    bump_table_version(Section)
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no cached response shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_table_version(User)
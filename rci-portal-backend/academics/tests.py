@@ -1,3 +1,1522 @@
-from django.test import TestCase
+# academics/tests.py
 
-# Create your tests here.
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import (
+    User, Program, Curriculum, Subject, Section, Student, Enrollment,
+    Grade, Application, Document, AuditLog, WaitlistEntry,
+)
+from . import archive
+from .archive import ArchivedLogs, archived_months, read_month, segment_index, segments
+from .audit import AuditWriter, record_audit
+from .caching import ResponseCache, bump_version, response_cache
+from . import compiled as compiled_serializers
+from .compiled import CompiledSerializer
+from .enrollment import process_queue, reserve_seats
+from .management.commands.loadtest import HTTPTransport, error_summary, is_test_database, percentile
+from .middleware import AuditLogMiddleware
+from .prerequisites import (
+    PrerequisiteChecker, check_prerequisites, get_prerequisite_graph, invalidate_prerequisite_graph,
+)
+from .reports import REPORTS_DIR, get_report, invalidate_reports
+from .query_budget import QUERY_BUDGET_HEADER, QUERY_COUNT_HEADER
+from .scheduling import (
+    SCHEDULE_VERSION_KEY, ScheduleParseError, Timetable, get_occupancy_index, invalidate_occupancy,
+    parse_schedule,
+)
+from .serializers import EnrollmentSerializer, GradeSerializer, SectionSerializer
+from .urls import router
+
+TERM = '2024-2025 1st'
+
+# Query parameters required by extra GET actions
+ACTION_PARAMS = {
+    'student-eligible-sections': {'term': TERM},
+    'section-free-rooms': {'term': TERM, 'schedule': 'MWF 8:00-9:00 AM'},
+    'student-cor': {'term': TERM},
+}
+
+# Generated documents are written under MEDIA_ROOT
+MEDIA_ROOT = tempfile.mkdtemp(prefix='rci-tests-')
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def seed_batch(n):
+    """Create one realistic batch of related rows; each call adds the same shape again"""
+    professor = User.objects.create_user(
+        username=f'prof{n}', email=f'prof{n}@rci.edu', password='password123',
+        role='professor', first_name='Prof', last_name=str(n),
+    )
+    program = Program.objects.create(
+        program_code=f'P{n}', program_name=f'Program {n}', department='ICT', sector='IT'
+    )
+    curriculum = Curriculum.objects.create(program=program, year_level=1, semester='1st')
+
+    subjects = []
+    for i in range(3):
+        prerequisites = [subjects[-1].code] if subjects else []
+        subjects.append(Subject.objects.create(
+            code=f'S{n}-{i}', title=f'Subject {n}-{i}', units=3,
+            curriculum=curriculum, prerequisites=prerequisites,
+        ))
+
+    sections = [
+        Section.objects.create(
+            section_name=f'{n}A', subject=subject, term=TERM, professor=professor,
+            schedule=f"{('MWF', 'TTH', 'SAT')[i]} {8 + n}:00-{9 + n}:00", room=f'R{n}{i}',
+        )
+        for i, subject in enumerate(subjects)
+    ]
+
+    for i in range(3):
+        user = User.objects.create_user(
+            username=f'student{n}-{i}', email=f'student{n}-{i}@rci.edu', password='password123',
+            role='student', first_name='Student', last_name=f'{n}-{i}',
+        )
+        student = Student.objects.create(
+            user=user, student_number=f'2024-{n:02d}{i:02d}', program=program, year_level=1
+        )
+        enrollment = Enrollment.objects.create(student=student, section=sections[0], term=TERM, status='enrolled')
+        Grade.objects.create(
+            student=student, subject=subjects[0], section=sections[0],
+            grade='1.50', status='passed', encoded_by=professor,
+        )
+        WaitlistEntry.objects.create(
+            student=student, section=sections[1], term=TERM, status='waitlisted', requested_by=user,
+        )
+        Document.objects.create(
+            student=student, doc_type='cor', file_path=f'documents/cor-{n}-{i}.pdf', uploaded_by=professor,
+        )
+        AuditLog.objects.create(
+            entity='Enrollment', action='create', user=user,
+            details={'created': {'enrollment_id': str(enrollment.pk)}},
+        )
+
+    Application.objects.create(applicant_name=f'Applicant {n}', email=f'applicant{n}@mail.com', program=program)
+
+
+def reset_caches():
+    """Drop process-local indexes and caches, which may hold rows from other tests' rolled back transactions"""
+    invalidate_prerequisite_graph()
+    invalidate_occupancy()
+    response_cache.clear()
+    cache.clear()
+
+
+class PortalTestCase(TestCase):
+    """`batches` seeded batches and an admin-authenticated API client, with caches reset per test"""
+    batches = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@rci.edu', password='password123', role='admin'
+        )
+        for n in range(cls.batches):
+            seed_batch(n)
+
+    def setUp(self):
+        reset_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+# ========================================
+# PREREQUISITES
+# ========================================
+
+class PrerequisiteTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student = Student.objects.get(student_number='2024-0000')
+        cls.subjects = list(Subject.objects.order_by('code'))
+
+    def test_unmet_prerequisites_are_all_reported(self):
+        subject = self.subjects[2]
+        subject.prerequisites = [self.subjects[0].code, str(self.subjects[1].pk), 'GONE-1']
+        self.assertEqual(check_prerequisites(self.student, subject), [
+            'Prerequisite not met: S0-1 - Subject 0-1',
+            'Prerequisite not met: GONE-1',
+        ])
+
+    def test_passed_subjects_match_by_code_or_id(self):
+        for reference in (self.subjects[0].code, str(self.subjects[0].pk)):
+            with self.subTest(reference=reference):
+                self.subjects[1].prerequisites = [reference]
+                self.assertEqual(check_prerequisites(self.student, self.subjects[1]), [])
+
+    def test_cost_does_not_grow_with_the_prerequisite_list(self):
+        subject = self.subjects[2]
+        subject.prerequisites = [s.code for s in self.subjects[:2]] + [f'X-{n}' for n in range(50)]
+        check_prerequisites(self.student, subject)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(check_prerequisites(self.student, subject)), 51)
+
+    def test_checker_loads_many_students_at_once(self):
+        students = list(Student.objects.all())
+        get_prerequisite_graph()
+        with self.assertNumQueries(1):
+            checker = PrerequisiteChecker(students, [self.subjects[0].code])
+        for student in students:
+            self.assertEqual(checker.unmet(student, self.subjects[1]), [])
+            self.assertEqual(checker.unmet(student, self.subjects[2]), [self.subjects[1].code])
+
+    def test_enrollment_is_rejected_until_prerequisites_are_passed(self):
+        section = Section.objects.get(subject=self.subjects[2])
+        response = self.client.post('/api/enrollments/', {
+            'student': str(self.student.pk), 'section': str(section.pk), 'term': TERM,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['non_field_errors'], ['Prerequisite not met: S0-1 - Subject 0-1'])
+
+
+class PrerequisiteGraphTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.subjects = list(Subject.objects.order_by('code'))
+
+    def ids(self, *subjects):
+        return {str(subject.pk) for subject in subjects}
+
+    def test_closures(self):
+        graph = get_prerequisite_graph()
+        first, second, third = self.subjects
+        self.assertEqual(graph.requires(third.pk), self.ids(first, second))
+        self.assertEqual(graph.blocks(first.pk), self.ids(second, third))
+        self.assertEqual(graph.prerequisites(third.pk), self.ids(second))
+
+    def test_cycles_are_rejected(self):
+        first, _, third = self.subjects
+        for references in ([third.code], [str(third.pk)], [first.code]):
+            with self.subTest(references=references):
+                first.prerequisites = references
+                with self.assertRaises(DjangoValidationError):
+                    first.clean()
+
+        response = self.client.patch(f'/api/subjects/{first.pk}/', {'prerequisites': [third.code]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Circular prerequisite', response.json()['prerequisites'][0])
+        response = self.client.patch(f'/api/subjects/{third.pk}/', {'prerequisites': [first.code]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_graph_only_follows_committed_changes(self):
+        graph = get_prerequisite_graph()
+        third = self.subjects[2]
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            third.prerequisites = []
+            third.save()
+            raise RuntimeError
+        self.assertIs(get_prerequisite_graph(), graph)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third.save()
+        self.assertEqual(get_prerequisite_graph().requires(third.pk), set())
+
+
+# ========================================
+# BULK ENROLLMENT
+# ========================================
+
+class BulkEnrollmentTests(PortalTestCase):
+    batches = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = list(Student.objects.filter(student_number__startswith='2024-00').order_by('student_number'))
+        cls.sections = list(Section.objects.filter(section_name='0A').order_by('subject__code'))
+
+    def row(self, student, section, **extra):
+        return dict({'student': str(student.pk), 'section': str(section.pk), 'term': TERM}, **extra)
+
+    def bulk(self, rows):
+        return self.client.post('/api/enrollments/bulk/', rows, format='json')
+
+    def test_each_row_gets_a_result(self):
+        first, second, _ = self.students
+        response = self.bulk({'enrollments': [
+            self.row(first, self.sections[1]),
+            self.row(first, self.sections[2]),
+            self.row(second, self.sections[0]),
+            self.row(second, self.sections[1], status='bogus'),
+            self.row(second, self.sections[1]),
+            self.row(second, self.sections[1]),
+        ]})
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (2, 4))
+        results = data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'error', 'error', 'error', 'created', 'error'])
+        self.assertEqual(results[1]['errors'], ['Prerequisite not met: S0-1 - Subject 0-1'])
+        self.assertEqual(results[2]['errors'], ['Student is already enrolled in this section for this term'])
+        self.assertIn('status', results[3]['errors'])
+        self.assertEqual(results[5]['errors'], ['Duplicate row in request'])
+
+        self.assertTrue(Enrollment.objects.filter(pk=results[0]['enrollment_id'], status='pending').exists())
+        self.sections[1].refresh_from_db()
+        self.assertEqual(self.sections[1].seats_taken, 2)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        get_prerequisite_graph()
+        counts = []
+        for students, section in ((self.students[:1], self.sections[1]), (self.students[1:], self.sections[1])):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.bulk([self.row(student, section) for student in students])
+            self.assertEqual(response.json()['created'], len(students))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_full_section_rejects_the_overflow(self):
+        Section.objects.filter(pk=self.sections[1].pk).update(capacity=2)
+        response = self.bulk([self.row(student, self.sections[1]) for student in self.students])
+        self.assertEqual([result['status'] for result in response.json()['results']], ['created', 'created', 'error'])
+        self.assertEqual(response.json()['results'][2]['errors'], ['Section is full'])
+
+    def test_request_shape_and_size_are_checked(self):
+        self.assertEqual(self.bulk([]).status_code, 400)
+        with mock.patch('academics.views.BULK_ENROLLMENT_MAX_ROWS', 1):
+            response = self.bulk([self.row(student, self.sections[1]) for student in self.students[:2]])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Enrollment.objects.filter(section=self.sections[1]).exists())
+
+
+class CohortEnrollmentTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.program = Program.objects.get(program_code='P0')
+        # A block section for each subject but the last
+        cls.blocks = [
+            Section.objects.create(section_name='0BLK', subject=subject, term=TERM, schedule='TBA', room='TBA')
+            for subject in Subject.objects.filter(code__in=['S0-0', 'S0-1']).order_by('code')
+        ]
+
+    def cohort(self, **data):
+        return self.client.post('/api/enrollments/cohort/', dict({
+            'program': str(self.program.pk), 'year_level': 1, 'semester': '1st',
+            'term': TERM, 'section_name': '0BLK',
+        }, **data), format='json')
+
+    def test_enrolls_the_cohort_and_can_be_rerun(self):
+        response = self.cohort()
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertEqual((data['students'], data['sections'], data['created'], data['failed']), (3, 2, 6, 0))
+        self.assertEqual(data['missing_sections'], ['S0-2'])
+        self.assertEqual(Enrollment.objects.filter(section__in=self.blocks).count(), 6)
+
+        rerun = self.cohort()
+        self.assertEqual(rerun.status_code, 200)
+        self.assertEqual((rerun.json()['created'], rerun.json()['skipped']), (0, 6))
+
+    def test_unknown_curriculum_or_block(self):
+        self.assertIn('curriculum', self.cohort(semester='2nd').json())
+        self.assertIn('section_name', self.cohort(section_name='9Z').json())
+
+    def test_cohort_size_is_capped(self):
+        with mock.patch('academics.enrollment.BULK_ENROLLMENT_MAX_ROWS', 5):
+            response = self.cohort()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 5 per request', response.json()['non_field_errors'][0])
+        self.assertFalse(Enrollment.objects.filter(section__in=self.blocks).exists())
+
+
+# ========================================
+# SEAT ACCOUNTING
+# ========================================
+
+class SeatAccountingTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = list(Student.objects.order_by('student_number'))
+        cls.sections = list(Section.objects.order_by('subject__code'))
+
+    def enroll(self, student, section, status='pending'):
+        return self.client.post('/api/enrollments/', {
+            'student': str(student.pk), 'section': str(section.pk), 'term': TERM, 'status': status,
+        }, format='json')
+
+    def enrollment_id(self, student, section):
+        self.assertEqual(self.enroll(student, section).status_code, 201)
+        return Enrollment.objects.get(student=student, section=section).pk
+
+    def seats(self, section):
+        return Section.objects.get(pk=section.pk).seats_taken
+
+    def test_full_section_is_not_oversubscribed(self):
+        section = self.sections[1]
+        Section.objects.filter(pk=section.pk).update(capacity=2)
+        statuses = [self.enroll(student, section).status_code for student in self.students]
+        self.assertEqual(statuses, [201, 201, 400])
+        self.assertEqual(self.enroll(self.students[2], section).json(), {'section': ['Section is full']})
+        self.assertEqual(self.seats(section), 2)
+
+    def test_section_saves_keep_concurrent_reservations(self):
+        section = Section.objects.get(pk=self.sections[2].pk)
+        before = section.seats_taken
+        # Another request takes a seat after this instance was loaded
+        self.assertTrue(reserve_seats(section.pk))
+        serializer = SectionSerializer(section, data={'room': 'R77'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(self.seats(section), before + 1)
+        self.assertEqual(serializer.data['seats_taken'], before + 1)
+
+        stale = Section.objects.get(pk=section.pk)
+        reserve_seats(section.pk)
+        stale.capacity = 50
+        stale.save()
+        self.assertEqual((self.seats(section), Section.objects.get(pk=section.pk).capacity), (before + 2, 50))
+
+    def test_status_and_section_changes_move_the_seat(self):
+        enrollment_id = self.enrollment_id(self.students[0], self.sections[1])
+        self.client.patch(f'/api/enrollments/{enrollment_id}/', {'section': str(self.sections[2].pk)}, format='json')
+        self.assertEqual((self.seats(self.sections[1]), self.seats(self.sections[2])), (0, 1))
+        self.client.patch(f'/api/enrollments/{enrollment_id}/', {'status': 'dropped'}, format='json')
+        self.assertEqual(self.seats(self.sections[2]), 0)
+
+    def test_concurrent_drops_release_one_seat(self):
+        section = self.sections[1]
+        first, _ = [self.enrollment_id(student, section) for student in self.students[:2]]
+        # Both requests loaded the enrollment before either saved
+        loaded = [Enrollment.objects.get(pk=first) for _ in range(2)]
+        for enrollment in loaded:
+            serializer = EnrollmentSerializer(enrollment, data={'status': 'dropped'}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        self.assertEqual(self.seats(section), 1)
+
+    def test_enrolled_count_excludes_pending_enrollments(self):
+        section = self.sections[0]
+        Enrollment.objects.filter(pk=Enrollment.objects.filter(section=section).values('pk')[:1]).update(status='pending')
+        self.assertEqual(self.client.get(f'/api/sections/{section.pk}/').json()['enrolled_count'], 2)
+        listed = {row['section_id']: row['enrolled_count'] for row in self.client.get('/api/sections/').json()['results']}
+        self.assertEqual(listed, {str(section.pk): 2, str(self.sections[1].pk): 0, str(self.sections[2].pk): 0})
+
+        # Confirming a pending enrollment takes no new seat but expires cached sections
+        pending = Enrollment.objects.get(section=section, status='pending')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/enrollments/{pending.pk}/', {'status': 'enrolled'}, format='json')
+        self.assertEqual(self.client.get(f'/api/sections/{section.pk}/').json()['enrolled_count'], 3)
+
+
+# ========================================
+# WAITLIST
+# ========================================
+
+class WaitlistTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = list(Student.objects.order_by('student_number'))
+        cls.section = Section.objects.get(subject__code='S0-1')
+        cls.other = Section.objects.get(subject__code='S0-2')
+
+    def work(self):
+        call_command('process_enrollment_queue', once=True, stdout=io.StringIO())
+
+    def statuses(self):
+        return list(WaitlistEntry.objects.order_by('timestamp').values_list('status', flat=True))
+
+    def test_requests_are_queued_and_admitted_by_the_worker(self):
+        WaitlistEntry.objects.all().delete()
+        self.client.force_authenticate(self.students[0].user)
+        response = self.client.post('/api/waitlist/', {'section': str(self.section.pk), 'term': TERM}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'queued')
+        self.assertFalse(Enrollment.objects.filter(section=self.section).exists())
+
+        self.work()
+        entry = WaitlistEntry.objects.get()
+        self.assertEqual(entry.status, 'admitted')
+        self.assertEqual((entry.enrollment.student, entry.enrollment.section), (self.students[0], self.section))
+        self.assertEqual(Section.objects.get(pk=self.section.pk).seats_taken, 1)
+
+    def test_full_sections_waitlist_in_order_and_reject_ineligible_requests(self):
+        Section.objects.filter(pk=self.section.pk).update(capacity=1)
+        WaitlistEntry.objects.filter(status='waitlisted').update(status='queued')
+        WaitlistEntry.objects.create(student=self.students[0], section=self.other, term=TERM)
+        self.work()
+        self.assertEqual(self.statuses(), ['admitted', 'waitlisted', 'waitlisted', 'rejected'])
+        rejected = WaitlistEntry.objects.get(status='rejected')
+        self.assertEqual(rejected.message, 'Prerequisite not met: S0-1 - Subject 0-1')
+
+    def test_freed_seats_are_promoted_by_the_worker(self):
+        Section.objects.filter(pk=self.section.pk).update(capacity=0)
+        self.work()
+        self.assertEqual(self.statuses(), ['waitlisted'] * 3)
+
+        # A new request does not jump ahead of the waitlist
+        Section.objects.filter(pk=self.section.pk).update(capacity=1)
+        WaitlistEntry.objects.create(student=Student.objects.create(
+            user=User.objects.create_user(username='late', email='late@rci.edu', role='student'),
+            student_number='2024-9999', program=self.section.subject.curriculum.program, year_level=1,
+        ), section=self.section, term=TERM)
+        process_queue()
+        self.assertEqual(self.statuses(), ['waitlisted'] * 4)
+
+        self.work()
+        self.assertEqual(self.statuses(), ['admitted'] + ['waitlisted'] * 3)
+
+        # Dropping takes no waitlist work in the request; the worker promotes next
+        admitted = WaitlistEntry.objects.get(status='admitted').enrollment
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/enrollments/{admitted.pk}/', {'status': 'dropped'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(), ['admitted'] + ['waitlisted'] * 3)
+        self.work()
+        self.assertEqual(self.statuses(), ['admitted', 'admitted', 'waitlisted', 'waitlisted'])
+
+    def test_only_active_requests_can_be_cancelled(self):
+        entry = WaitlistEntry.objects.first()
+        self.assertEqual(self.client.delete(f'/api/waitlist/{entry.pk}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/api/waitlist/{entry.pk}/').status_code, 400)
+
+
+# ========================================
+# ELIGIBLE SECTIONS
+# ========================================
+
+class EligibleSectionsTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student = Student.objects.get(student_number='2024-0000')
+        cls.section = Section.objects.get(subject__code='S0-1')
+
+    def eligible(self, **params):
+        response = self.client.get(f'/api/students/{self.student.pk}/eligible-sections/', dict({'term': TERM}, **params))
+        self.assertEqual(response.status_code, 200)
+        return [row['section_id'] for row in response.json()]
+
+    def test_only_sections_the_student_can_take(self):
+        # S0-0 is passed and held, S0-2 needs S0-1
+        self.assertEqual(self.eligible(), [str(self.section.pk)])
+        self.assertEqual(self.eligible(term='2025-2026 1st'), [])
+        missing = self.client.get(f'/api/students/{self.student.pk}/eligible-sections/')
+        self.assertEqual(missing.status_code, 400)
+
+    def test_conflicting_and_full_sections_are_skipped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            clash = Section.objects.create(
+                section_name='0B', subject=self.section.subject, term=TERM, schedule='MWF 8:30-9:30', room='R99',
+            )
+        self.assertNotIn(str(clash.pk), self.eligible())
+        Section.objects.filter(pk=self.section.pk).update(capacity=0)
+        self.assertEqual(self.eligible(), [])
+
+    def test_matches_enrollment_validation(self):
+        for section_id in self.eligible():
+            response = self.client.post('/api/enrollments/', {
+                'student': str(self.student.pk), 'section': section_id, 'term': TERM,
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+
+
+# ========================================
+# SCHEDULES
+# ========================================
+
+class ScheduleTests(PortalTestCase):
+
+    def test_parse_schedule_formats(self):
+        self.assertEqual(parse_schedule('MWF 8:00-9:00 AM'), [(0, 480, 540), (2, 480, 540), (4, 480, 540)])
+        # The start shares the end's meridiem unless that puts it after the end
+        self.assertEqual(parse_schedule('TTH 11:30-1:00 PM'), [(1, 690, 780), (3, 690, 780)])
+        self.assertEqual(parse_schedule('sat 13:00-16:00'), [(5, 780, 960)])
+        self.assertEqual(parse_schedule('M 8-9; W 10:00-11:30'), [(0, 480, 540), (2, 600, 690)])
+        for unscheduled in ('', 'TBA', ' tbd ', None):
+            self.assertEqual(parse_schedule(unscheduled), [])
+
+    def test_parse_schedule_errors(self):
+        for schedule in ('XYZ 8-9', 'MWF 9-8', 'MWF 25:00-26:00', 'MWF eight to nine'):
+            with self.assertRaises(ScheduleParseError):
+                parse_schedule(schedule)
+
+    def test_migration_parser_matches(self):
+        frozen = import_module('academics.migrations.0004_section_meetings').parse_schedule
+        for schedule in ('MWF 8:00-9:00 AM', 'TTH 11:30-1:00 PM', 'MWF 11:00-12:00 NN', 'M 8-9; W 10-11', 'TBA'):
+            self.assertEqual(frozen(schedule), parse_schedule(schedule))
+        with self.assertRaises(ValueError):
+            frozen('XYZ 8-9')
+
+    def test_timetable_conflicts(self):
+        timetable = Timetable([(0, 480, 540, 'A'), (0, 600, 660, 'B'), (2, 480, 540, 'C')])
+        self.assertEqual(timetable.conflicts([(0, 540, 600)]), [])
+        self.assertEqual(timetable.conflicts([(0, 530, 610)]), ['B', 'A'])
+        self.assertEqual(timetable.conflict(2, 500, 510), 'C')
+        self.assertIsNone(timetable.conflict(1, 480, 540))
+        timetable.add([(1, 480, 540)], 'D')
+        self.assertEqual(timetable.conflict(1, 500, 600), 'D')
+
+    def test_timetable_with_overlapping_meetings(self):
+        # A long meeting followed by a shorter one inside it still clashes past the shorter one's end
+        timetable = Timetable([(0, 480, 1020, 'A'), (0, 540, 600, 'B')])
+        self.assertEqual(timetable.conflicts([(0, 720, 780)]), ['A'])
+        self.assertEqual(timetable.conflicts([(0, 550, 560)]), ['B', 'A'])
+        self.assertEqual(timetable.conflicts([(0, 1020, 1080)]), [])
+        timetable = Timetable()
+        timetable.add([(0, 540, 600)], 'B')
+        timetable.add([(0, 480, 1020)], 'A')
+        self.assertEqual(timetable.conflicts([(0, 720, 780)]), ['A'])
+
+    def test_enrollment_rejects_schedule_conflict(self):
+        student = Student.objects.get(student_number='2024-0000')
+        with self.captureOnCommitCallbacks(execute=True):
+            clash = Section.objects.create(
+                section_name='0B', subject=Subject.objects.get(code='S0-1'), term=TERM,
+                schedule='MWF 7:00-5:00 PM', room='R99',
+            )
+        response = self.client.post('/api/enrollments/', {
+            'student': str(student.pk), 'section': str(clash.pk), 'term': TERM,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Schedule conflict with S0-0', json.dumps(response.json()))
+
+
+# ========================================
+# ROOM AND PROFESSOR BOOKINGS
+# ========================================
+
+class BookingTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.subject = Subject.objects.get(code='S0-1')
+        cls.professor = User.objects.get(username='prof0')
+
+    def create_section(self, **data):
+        data = dict({'section_name': '0Z', 'subject': str(self.subject.pk), 'term': TERM,
+                     'schedule': 'MWF 8:30-9:30', 'room': 'R99'}, **data)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/sections/', data, format='json')
+
+    def test_double_bookings_are_rejected(self):
+        response = self.create_section(room='r00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('S0-0 0A', response.json()['room'][0])
+        response = self.create_section(professor=self.professor.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('professor', response.json())
+        self.assertEqual(self.create_section(schedule='MWF 9:00-10:00', room='R00').status_code, 201)
+
+    def test_index_follows_commits(self):
+        index = get_occupancy_index(TERM)
+        self.assertEqual(index.collisions(None, 'R99', None, [(0, 540, 600)]), {})
+        try:
+            with transaction.atomic():
+                Section.objects.create(section_name='0Z', subject=self.subject, term=TERM,
+                                       schedule='MWF 9:00-10:00', room='R99')
+                raise DjangoValidationError('rolled back')
+        except DjangoValidationError:
+            pass
+        # The rolled back section never reached the index
+        self.assertEqual(get_occupancy_index(TERM).collisions(None, 'R99', None, [(0, 540, 600)]), {})
+
+        self.assertEqual(self.create_section(schedule='MWF 9:00-10:00').status_code, 201)
+        self.assertIn('room', get_occupancy_index(TERM).collisions(None, 'R99', None, [(0, 540, 600)]))
+
+    def test_index_is_rebuilt_when_another_process_changes_sections(self):
+        index = get_occupancy_index(TERM)
+        self.assertIs(get_occupancy_index(TERM), index)
+        # Another process's write: this process only sees the version bump
+        Section.objects.filter(room='R00').update(room='R98')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(SCHEDULE_VERSION_KEY)
+        rebuilt = get_occupancy_index(TERM)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(self.create_section(schedule='MWF 8:00-9:00', room='R00').status_code, 201)
+
+    def test_index_survives_seat_changes_and_own_saves(self):
+        index = get_occupancy_index(TERM)
+        section = Section.objects.get(section_name='0A', subject__code='S0-2')
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(section.pk)
+            Enrollment.objects.create(student=Student.objects.first(), section=section, term=TERM, status='enrolled')
+        self.assertIs(get_occupancy_index(TERM), index)
+        # This process's own section saves patch the index in place
+        self.assertEqual(self.create_section(schedule='MWF 9:00-10:00').status_code, 201)
+        self.assertIs(get_occupancy_index(TERM), index)
+        self.assertIn('room', index.collisions(None, 'R99', None, [(0, 540, 600)]))
+
+    def test_stale_index_is_rechecked_on_save(self):
+        get_occupancy_index(TERM)
+        # Saved but not yet applied to the index (its commit callbacks have not run)
+        Section.objects.create(section_name='0Y', subject=self.subject, term=TERM,
+                               schedule='MWF 10:00-11:00', room='R99')
+        response = self.create_section(schedule='MWF 10:30-11:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('S0-1 0Y', response.json()['room'][0])
+        self.assertFalse(Section.objects.filter(section_name='0Z').exists())
+
+
+# ========================================
+# IDEMPOTENCY KEYS
+# ========================================
+
+class IdempotencyTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.body = {
+            'student': str(Student.objects.get(student_number='2024-0000').pk),
+            'section': str(Section.objects.get(subject__code='S0-1').pk),
+            'term': TERM,
+        }
+
+    def enroll(self, key, body=None):
+        return self.client.post('/api/enrollments/', body or self.body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.enroll('attempt-1')
+        self.assertEqual(first.status_code, 201, first.content)
+        retry = self.enroll('attempt-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Enrollment.objects.filter(section_id=self.body['section']).count(), 1)
+
+        # A new attempt is a new request: the duplicate is rejected
+        again = self.enroll('attempt-2')
+        self.assertEqual(again.status_code, 400)
+        self.assertFalse(again.has_header('Idempotent-Replayed'))
+
+    def test_key_reused_with_another_body(self):
+        self.enroll('attempt-1')
+        other = dict(self.body, section=str(Section.objects.get(subject__code='S0-2').pk))
+        self.assertEqual(self.enroll('attempt-1', other).status_code, 422)
+
+    def test_concurrent_request_with_the_same_key(self):
+        # Another request with the key is still running and holds its lock
+        scope = f"{self.admin.pk}:POST:/api/enrollments/:attempt-1"
+        lock = 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest() + ':lock'
+        cache.add(lock, 1)
+        response = self.enroll('attempt-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Enrollment.objects.filter(section_id=self.body['section']).exists())
+        # Once it finishes without a stored response the key can be used
+        cache.delete(lock)
+        self.assertEqual(self.enroll('attempt-1').status_code, 201)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.enroll('attempt-1')
+        self.client.force_authenticate(User.objects.get(username='prof0'))
+        response = self.enroll('attempt-1')
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_overlong_key(self):
+        self.assertEqual(self.enroll('k' * 256).status_code, 400)
+
+
+# ========================================
+# LOAD TEST
+# ========================================
+
+class LoadTestCommandTests(TestCase):
+
+    def test_percentile_is_nearest_rank(self):
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 50), 3)
+        self.assertEqual(percentile(list(range(1, 31)), 95), 29)
+        self.assertEqual(percentile([1, 2], 1), 1)
+        self.assertEqual(percentile([1, 2], 100), 2)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_test_databases(self):
+        self.assertTrue(is_test_database({'NAME': 'file:memorydb_default?mode=memory&cache=shared'}))
+        self.assertTrue(is_test_database({'NAME': '/srv/portal/test_portal.sqlite3'}))
+        self.assertTrue(is_test_database({'NAME': 'portal_ci', 'TEST': {'NAME': 'portal_ci'}}))
+        self.assertFalse(is_test_database({'NAME': '/srv/portal/db.sqlite3'}))
+        self.assertFalse(is_test_database({'NAME': 'portal', 'TEST': {}}))
+
+    def test_refuses_a_non_test_database(self):
+        with mock.patch('academics.management.commands.loadtest.is_test_database', return_value=False):
+            with self.assertRaisesMessage(CommandError, '--allow-non-test-db'):
+                call_command('loadtest', students=1, stdout=io.StringIO())
+        self.assertFalse(Program.objects.filter(program_code='LOADTEST').exists())
+
+    def test_http_server_errors_are_counted(self):
+        response = mock.Mock(status_code=500, text=(
+            '<title>OperationalError at /api/enrollments/</title>'
+            '<pre class="exception_value">database is locked</pre>'
+        ))
+        response.json.side_effect = ValueError
+        requests = mock.Mock(RequestException=OSError)
+        requests.Session.return_value.post.return_value = response
+        with mock.patch.dict('sys.modules', {'requests': requests}):
+            transport = HTTPTransport('http://server/api/')
+        self.assertEqual(transport.request('POST', '/api/enrollments/', data={}), (500, None))
+        self.assertEqual(dict(transport.exceptions), {'HTTP 500: database is locked': 1})
+        self.assertEqual(error_summary('<h1>Server Error (500)</h1>'), 'Server Error (500)')
+
+
+# ========================================
+# QUERY BUDGETS
+# ========================================
+
+@override_settings(QUERY_COUNT_HEADER=True, MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTests(PortalTestCase):
+    """
+    Every router endpoint must declare list/retrieve budgets, stay within
+    them, and run the same number of queries however many rows it returns.
+    """
+    batches = 2
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.admin)
+
+    def login(self, user):
+        # Authenticate like a real client, so the authentication queries count
+        self.client.force_authenticate(None)
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def get(self, path, params=None):
+        response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, 200, f"{path}: {b'' if response.streaming else response.content[:200]}")
+        count = int(response[QUERY_COUNT_HEADER])
+        budget = response.get(QUERY_BUDGET_HEADER)
+        self.assertIsNotNone(budget, f'{path} has no query budget')
+        self.assertLessEqual(count, int(budget), f'{path} ran {count} queries, budget is {budget}')
+        return count
+
+    def endpoints(self):
+        """(path, params) of every GET route the router exposes"""
+        for prefix, viewset, basename in router.registry:
+            model = viewset.queryset.model
+            pk = str(model.objects.order_by('pk').values_list('pk', flat=True).first())
+            yield f'/api/{prefix}/', None
+            yield f'/api/{prefix}/{pk}/', None
+            for extra in viewset.get_extra_actions():
+                if 'get' not in extra.mapping:
+                    continue
+                path = f'/api/{prefix}/{pk}/{extra.url_path}/' if extra.detail else f'/api/{prefix}/{extra.url_path}/'
+                yield path, ACTION_PARAMS.get(f'{basename}-{extra.url_name}')
+
+    def test_every_endpoint_declares_list_and_retrieve_budgets(self):
+        for prefix, viewset, _ in router.registry:
+            for action in ('list', 'retrieve'):
+                self.assertIn(action, viewset.query_budgets, f'{viewset.__name__} has no {action} budget')
+
+    def test_endpoints_stay_within_budget(self):
+        for path, params in self.endpoints():
+            with self.subTest(path=path):
+                self.get(path, params)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        before = {path: self.get(path, params) for path, params in self.endpoints() if path.count('/') == 3}
+        for n in range(2, 4):
+            seed_batch(n)
+        reset_caches()
+        for path, params in self.endpoints():
+            if path in before:
+                with self.subTest(path=path):
+                    self.assertEqual(self.get(path, params), before[path], f'{path} has an N+1 query')
+
+    def test_student_scoped_lists_stay_within_budget(self):
+        student = Student.objects.select_related('user').first()
+        self.login(student.user)
+        for prefix in ('enrollments', 'waitlist'):
+            with self.subTest(prefix=prefix):
+                self.get(f'/api/{prefix}/')
+        self.get(f'/api/students/{student.pk}/eligible-sections/', {'term': TERM})
+
+    def test_professor_scoped_lists_stay_within_budget(self):
+        self.login(User.objects.filter(role='professor').first())
+        for prefix in ('sections', 'grades'):
+            with self.subTest(prefix=prefix):
+                self.get(f'/api/{prefix}/')
+
+    @override_settings(QUERY_COUNT_HEADER=False)
+    def test_header_is_dev_only(self):
+        response = self.client.get('/api/programs/')
+        self.assertFalse(response.has_header(QUERY_COUNT_HEADER))
+
+
+# ========================================
+# SPARSE FIELDSETS AND EXPANSIONS
+# ========================================
+
+class DynamicFieldsTests(PortalTestCase):
+
+    def test_list_returns_only_requested_fields(self):
+        response = self.client.get('/api/subjects/', {'fields': 'code,title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'code', 'title'})
+
+    def test_unused_columns_are_not_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/subjects/', {'fields': 'code,curriculum_info'})
+            self.client.get('/api/grades/', {'fields': 'grade,status'})
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"summary"', sql)
+        self.assertNotIn('"signatories"', sql)
+        self.assertNotIn('JOIN "users"', sql)
+
+    def test_computed_fields_keep_their_columns(self):
+        response = self.client.get('/api/sections/', {'fields': 'section_id,available_seats'})
+        for row in response.data['results']:
+            section = Section.objects.get(pk=row['section_id'])
+            self.assertEqual(row['available_seats'], section.capacity - section.seats_taken)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/programs/', {'fields': 'program_code,nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_nesting_is_opt_in(self):
+        enrollment = self.client.get('/api/enrollments/').data['results'][0]
+        self.assertNotIn('section_info', enrollment)
+        self.assertNotIn('professor_name', self.client.get('/api/sections/').data['results'][0])
+
+    def test_expand_nests_relations(self):
+        response = self.client.get('/api/enrollments/', {'expand': 'section.subject,student.user,section_info'})
+        enrollment = response.data['results'][0]
+        self.assertEqual(enrollment['section']['subject']['code'], 'S0-0')
+        self.assertTrue(enrollment['student']['user']['username'].startswith('student0-'))
+        self.assertEqual(enrollment['section_info']['professor_name'], 'Prof 0')
+
+    def test_expansions_are_joined_not_queried_per_row(self):
+        params = {'expand': 'section.subject,section.professor,student.user,section_info'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/enrollments/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 2)
+
+        # Only the relations the payload needs are joined
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/enrollments/', {'fields': 'enrollment_id,status'})
+        self.assertNotIn('JOIN', queries.captured_queries[-1]['sql'])
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get('/api/enrollments/', {'expand': 'section.nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+# ========================================
+# COMPILED LIST SERIALIZATION
+# ========================================
+
+class CompiledSerializerTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # encoded_by is nullable; DRF drops encoded_by_name when it is empty
+        Grade.objects.filter(pk=Grade.objects.order_by('pk').values('pk')[:1]).update(encoded_by=None)
+
+    def test_matches_regular_serializer(self):
+        for serializer_class, fields in (
+            (EnrollmentSerializer, None),
+            (GradeSerializer, None),
+            (GradeSerializer, ['encoded_by_name', 'grade']),
+        ):
+            with self.subTest(serializer=serializer_class.__name__, fields=fields):
+                model = serializer_class.Meta.model
+                queryset = model.objects.order_by('pk')
+                compiled = CompiledSerializer(serializer_class(fields=fields))
+                self.assertEqual(
+                    compiled.serialize(compiled.values(queryset)),
+                    serializer_class(queryset, many=True, fields=fields).data,
+                )
+
+    def test_list_uses_values_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/grades/', {'fields': 'grade,student_name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'grade', 'student_name'})
+        self.assertEqual(len(queries), 2)
+
+    def test_expansions_fall_back_to_regular_serializer(self):
+        response = self.client.get('/api/enrollments/', {'expand': 'section'})
+        self.assertEqual(response.data['results'][0]['section']['subject_code'], 'S0-0')
+
+    def test_cache_is_keyed_on_the_serializer_shape(self):
+        cache = compiled_serializers._compiled
+        cache.clear()
+        for fields in ('grade,student_name', 'student_name, grade', 'grade,student_name,grade'):
+            self.assertEqual(self.client.get('/api/grades/', {'fields': fields}).status_code, 200)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(self.client.get('/api/grades/', {'fields': 'bogus'}).status_code, 400)
+        self.assertEqual(len(cache), 1)
+
+    def test_cache_is_bounded(self):
+        cache = compiled_serializers._compiled
+        cache.clear()
+        with mock.patch('academics.compiled.COMPILED_MAX_ENTRIES', 2):
+            for fields in ('grade', 'status', 'subject', 'grade'):
+                self.client.get('/api/grades/', {'fields': fields})
+        self.assertEqual([tuple(field[0] for field in key[1:]) for key in cache], [('subject',), ('grade',)])
+
+
+# ========================================
+# KEYSET PAGINATION
+# ========================================
+
+class KeysetPaginationTests(PortalTestCase):
+    batches = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Identical ordering values leave only the pk tiebreaker
+        Enrollment.objects.update(timestamp=timezone.now())
+
+    def walk(self, response, link):
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200, response.content[:200])
+            page = [row['enrollment_id'] for row in response.data['results']]
+            ids = ids + page if link == 'next' else page + ids
+            if not response.data[link]:
+                return ids, response
+            response = self.client.get(response.data[link])
+
+    def test_pages_cover_every_row_once_in_both_directions(self):
+        forward, last = self.walk(self.client.get('/api/enrollments/', {'page_size': 2}), 'next')
+        expected = [str(pk) for pk in Enrollment.objects.order_by('-timestamp', '-pk').values_list('pk', flat=True)]
+        self.assertEqual(forward, expected)
+
+        backward, _ = self.walk(last, 'previous')
+        self.assertEqual(backward, expected)
+
+    def test_pages_do_not_use_offset(self):
+        first = self.client.get('/api/audit-logs/', {'page_size': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+        self.assertNotIn('OFFSET', queries.captured_queries[-1]['sql'])
+
+    def test_count_modes(self):
+        self.assertEqual(self.client.get('/api/grades/').data['count'], 6)
+        self.assertIsNone(self.client.get('/api/grades/', {'count': 'none'}).data['count'])
+        estimated = self.client.get('/api/grades/', {'count': 'estimate'}).data
+        self.assertEqual((estimated['count'], estimated['count_estimated']), (6, True))
+        self.assertEqual(self.client.get('/api/grades/', {'count': 'maybe'}).status_code, 400)
+
+    def test_invalid_cursor_and_ordering_are_rejected(self):
+        self.assertEqual(self.client.get('/api/students/', {'cursor': 'not-a-cursor'}).status_code, 404)
+        # Well-formed cursors with values their columns cannot hold
+        for path, position in [('/api/enrollments/', ['garbage', 'x']), ('/api/students/', [{'a': 1}, 'x'])]:
+            cursor = base64.urlsafe_b64encode(json.dumps({'p': position}).encode()).decode('ascii')
+            self.assertEqual(self.client.get(path, {'cursor': cursor}).status_code, 404, path)
+        # grade is nullable, so it cannot be a keyset column
+        self.assertEqual(self.client.get('/api/grades/', {'ordering': 'grade'}).status_code, 400)
+
+
+# ========================================
+# STREAMING EXPORTS
+# ========================================
+
+class ExportTests(PortalTestCase):
+    batches = 2
+
+    def export(self, path, params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_every_export_streams_csv_and_ndjson(self):
+        for prefix in ('students', 'enrollments', 'grades', 'applications', 'audit-logs'):
+            model = next(viewset.queryset.model for path, viewset, _ in router.registry if path == prefix)
+            with self.subTest(prefix=prefix):
+                rows = list(csv.DictReader(io.StringIO(self.export(f'/api/{prefix}/', {'format': 'csv'}))))
+                self.assertEqual(len(rows), model.objects.count())
+                lines = self.export(f'/api/{prefix}/', {'format': 'ndjson'}).splitlines()
+                self.assertEqual(len(lines), model.objects.count())
+
+    def test_export_matches_list_filters_and_fields(self):
+        params = {'status': 'passed', 'fields': 'grade_id,grade,signatories'}
+        listed = self.client.get('/api/grades/', params).json()['results']
+        exported = [json.loads(line) for line in self.export('/api/grades/', dict(params, format='ndjson')).splitlines()]
+        key = lambda row: row['grade_id']
+        self.assertEqual(sorted(exported, key=key), sorted(listed, key=key))
+
+        rows = list(csv.DictReader(io.StringIO(self.export('/api/grades/', dict(params, format='csv')))))
+        self.assertEqual(list(rows[0]), ['grade_id', 'grade', 'signatories'])
+        self.assertEqual(rows[0]['signatories'], '{}')
+
+    def test_export_is_scoped_like_the_list(self):
+        student = Student.objects.select_related('user').first()
+        self.client.force_authenticate(student.user)
+        lines = self.export('/api/enrollments/', {'format': 'ndjson'}).splitlines()
+        self.assertEqual([json.loads(line)['student'] for line in lines], [str(student.pk)])
+
+
+# ========================================
+# GENERATED DOCUMENTS
+# ========================================
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ReportTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student = Student.objects.select_related('user').first()
+
+    def pdf(self, doc_type, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/students/{self.student.pk}/{doc_type}/', params or {})
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(body.startswith(b'%PDF-') and body.rstrip().endswith(b'%%EOF'))
+        return body, len(queries)
+
+    def test_cor_lists_enrolled_subjects(self):
+        body, _ = self.pdf('cor', {'term': TERM})
+        self.assertIn(b'CERTIFICATE OF REGISTRATION', body)
+        self.assertIn(b'(S0-0)', body)
+        self.assertNotIn(b'(S0-1)', body)
+
+    def test_repeat_requests_are_served_from_disk(self):
+        first, queries = self.pdf('tor')
+        cached, cached_queries = self.pdf('tor')
+        self.assertEqual(cached, first)
+        # Only the student lookup; no grade queries and no re-render
+        self.assertEqual(cached_queries, 1)
+        self.assertLess(cached_queries, queries)
+
+    def test_grade_changes_invalidate_the_transcript(self):
+        before, _ = self.pdf('tor')
+        grade = Grade.objects.get(student=self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.grade = '2.25'
+            grade.save()
+        after, _ = self.pdf('tor')
+        self.assertNotEqual(after, before)
+        self.assertIn(b'(2.25)', after)
+
+        # The superseded render is removed
+        directory = os.path.join(MEDIA_ROOT, REPORTS_DIR, 'tor', str(self.student.pk))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_schedule_and_name_changes_invalidate_the_registration(self):
+        self.pdf('cor', {'term': TERM})
+        section = Section.objects.get(subject__code='S0-0')
+        with self.captureOnCommitCallbacks(execute=True):
+            section.room = 'ANNEX-1'
+            section.save()
+        body, _ = self.pdf('cor', {'term': TERM})
+        self.assertIn(b'(ANNEX-1)', body)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            section.professor.last_name = 'Renamed'
+            section.professor.save()
+        body, _ = self.pdf('cor', {'term': TERM})
+        self.assertIn(b'(Prof Renamed)', body)
+
+    def test_terms_with_the_same_slug_are_kept_apart(self):
+        directory = os.path.join(MEDIA_ROOT, REPORTS_DIR, 'cor', str(self.student.pk))
+        shutil.rmtree(directory, ignore_errors=True)
+        Enrollment.objects.filter(student=self.student).update(term='2024-2025-1st')
+        body, _ = self.pdf('cor', {'term': '2024-2025-1st'})
+        self.assertIn(b'(S0-0)', body)
+        for term in ('2024-2025 1st', '2024-2025-1ST'):
+            body, _ = self.pdf('cor', {'term': term})
+            self.assertNotIn(b'(S0-0)', body, term)
+        # Each term keeps its own render
+        self.assertEqual(len(os.listdir(directory)), 3)
+
+    def test_other_terms_renders_are_kept(self):
+        self.pdf('cor', {'term': f'{TERM} Summer'})
+        self.pdf('cor', {'term': TERM})
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.filter(student=self.student).update(status='dropped')
+            invalidate_reports(self.student.pk)
+        self.pdf('cor', {'term': TERM})
+        directory = os.path.join(MEDIA_ROOT, REPORTS_DIR, 'cor', str(self.student.pk))
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_open_report_survives_a_concurrent_rerender(self):
+        directory = os.path.join(MEDIA_ROOT, REPORTS_DIR, 'tor', str(self.student.pk))
+        for _ in range(2):
+            with get_report(self.student, 'tor') as report:
+                # A concurrent render with new data removes the file
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+                self.assertTrue(report.read().startswith(b'%PDF-'))
+            # Second round: the cached path is gone, so the file is rendered again
+
+    def test_students_only_get_their_own_documents(self):
+        self.client.force_authenticate(self.student.user)
+        self.pdf('tor')
+        other = Student.objects.exclude(pk=self.student.pk).first()
+        self.assertEqual(self.client.get(f'/api/students/{other.pk}/tor/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/students/{self.student.pk}/cor/').status_code, 400)
+
+
+# ========================================
+# CONDITIONAL GET
+# ========================================
+
+class ConditionalGetTests(PortalTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # 304s are answered before authentication, so use a real token
+        self.client.force_authenticate(None)
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_matching_etag_is_answered_without_queries(self):
+        subject = Subject.objects.first()
+        for path in ('/api/programs/', '/api/curriculums/', '/api/subjects/', f'/api/subjects/{subject.pk}/'):
+            with self.subTest(path=path):
+                etag = self.client.get(path)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(queries), 0)
+
+    def test_writes_to_nested_tables_change_the_etag(self):
+        etag = self.client.get('/api/curriculums/')['ETag']
+        subject = Subject.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            subject.title = 'Renamed'
+            subject.save()
+        response = self.client.get('/api/curriculums/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_string_and_credentials_are_part_of_the_check(self):
+        etag = self.client.get('/api/subjects/')['ETag']
+        self.assertEqual(self.client.get('/api/subjects/', {'fields': 'code'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(APIClient().get('/api/subjects/', HTTP_IF_NONE_MATCH=etag).status_code, 401)
+
+
+# ========================================
+# RESPONSE CACHE
+# ========================================
+
+class ResponseCacheTests(PortalTestCase):
+    batches = 2
+
+    def get(self, path, params=None, client=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or self.client).get(path, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_repeat_reads_are_served_from_memory(self):
+        for path in ('/api/programs/', '/api/curriculums/', '/api/subjects/', '/api/sections/'):
+            with self.subTest(path=path):
+                first, _ = self.get(path)
+                cached, queries = self.get(path)
+                self.assertEqual(cached, first)
+                self.assertEqual(queries, 0)
+
+    def test_seat_counter_updates_expire_sections(self):
+        params = {'term': TERM, 'fields': 'section_id,available_seats'}
+        before, _ = self.get('/api/sections/', params)
+        section_id = before['results'][0]['section_id']
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(section_id)
+        after, queries = self.get('/api/sections/', params)
+        self.assertGreater(queries, 0)
+        self.assertEqual(after['results'][0]['available_seats'], before['results'][0]['available_seats'] - 1)
+
+    def test_professors_are_cached_per_user(self):
+        pages = []
+        for username in ('prof0', 'prof1'):
+            client = APIClient()
+            client.force_authenticate(User.objects.get(username=username))
+            pages.append(self.get('/api/sections/', client=client)[0])
+        self.assertNotEqual(pages[0]['results'], pages[1]['results'])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResponseCache(max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+
+class RecordingWriter(AuditWriter):
+    """AuditWriter that keeps batches in memory instead of inserting them"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def write(self, entries):
+        self.batches.append(list(entries))
+
+
+class AuditWriterTests(PortalTestCase):
+    batches = 0
+
+    def test_entries_are_written_in_batches(self):
+        writer = RecordingWriter(batch_size=3, flush_interval=60)
+        for n in range(7):
+            writer.submit(n)
+        writer.flush(timeout=5)
+        self.assertEqual(writer.batches, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_partial_batch_is_written_after_flush_interval(self):
+        writer = RecordingWriter(batch_size=100, flush_interval=0.05)
+        writer.submit('entry')
+        for _ in range(100):
+            if writer.batches:
+                break
+            time.sleep(0.01)
+        self.assertEqual(writer.batches, [['entry']])
+
+    def test_full_queue_writes_inline(self):
+        writer = RecordingWriter(max_queue=1, enqueue_timeout=0)
+        # Fill the queue without starting the background thread
+        writer._queue.put('queued')
+        writer._ensure_started = lambda: None
+        with self.assertLogs('academics.audit', 'WARNING'):
+            writer.submit('overflow')
+        self.assertEqual(writer.batches, [['overflow']])
+
+    def test_entries_are_recorded_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_audit('Student', 'update', user=self.admin, details={'status': 'active'})
+            self.assertFalse(AuditLog.objects.exists())
+        log = AuditLog.objects.get()
+        self.assertEqual((log.entity, log.action, log.user, log.details), ('Student', 'update', self.admin, {'status': 'active'}))
+
+    def test_request_details_are_bounded_and_filtered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/users/', {
+                'username': 'new', 'email': 'new@rci.edu', 'role': 'student', 'password': 'Secret123!x',
+            }, format='json')
+            program = Program.objects.create(program_code='P', program_name='Program', department='ICT', sector='IT')
+            self.client.patch(f'/api/programs/{program.pk}/', {'program_name': 'Renamed', 'notes': 'x' * 70000}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        created = AuditLog.objects.get(entity='User').details
+        self.assertEqual(created['request_data'], {'username': 'new', 'email': 'new@rci.edu', 'role': 'student'})
+        self.assertEqual(created['created']['username'], 'new')
+        updated = AuditLog.objects.get(entity='Program').details
+        self.assertEqual(updated['request_data']['omitted'], 'payload too large')
+
+
+class AuditArchiveTests(PortalTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@rci.edu', password='password123', role='admin'
+        )
+        month_start = timezone.localtime().replace(day=1, hour=12, minute=0, second=0, microsecond=0)
+        cls.old = month_start - timedelta(days=400)
+        for n in range(5):
+            AuditLog.objects.create(
+                entity='Student' if n % 2 else 'Grade', action='update', user=cls.admin,
+                details={'n': n}, timestamp=cls.old + timedelta(minutes=n),
+            )
+        cls.recent = AuditLog.objects.create(entity='Student', action='create', user=cls.admin, details={})
+
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(AUDIT_ARCHIVE_DIR=tempfile.mkdtemp(dir=MEDIA_ROOT))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.month = timezone.localtime(self.old).strftime('%Y-%m')
+
+    def test_old_months_move_to_segments(self):
+        call_command('archive_audit_logs', keep_months=6, batch_size=2, stdout=io.StringIO())
+        self.assertEqual(list(AuditLog.objects.values_list('pk', flat=True)), [self.recent.pk])
+        self.assertEqual(archived_months(), [self.month])
+        self.assertEqual([entry['details']['n'] for entry in read_month(self.month)], [4, 3, 2, 1, 0])
+
+    def test_archived_months_are_listed_on_demand(self):
+        call_command('archive_audit_logs', stdout=io.StringIO())
+
+        response = self.client.get('/api/audit-logs/', {'month': self.month, 'entity': 'student', 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['results'][0]['details'], {'n': 3})
+        self.assertEqual(data['results'][0]['user_role'], 'admin')
+        self.assertIsNotNone(data['next'])
+
+        current = timezone.localtime().strftime('%Y-%m')
+        response = self.client.get('/api/audit-logs/', {'month': current})
+        self.assertEqual([row['log_id'] for row in response.json()['results']], [str(self.recent.pk)])
+        self.assertEqual(self.client.get('/api/audit-logs/', {'month': '2024-13'}).status_code, 400)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:academics_auditlog_archive'), {'month': self.month})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '5 entries')
+
+    def test_pages_read_only_the_blocks_they_need(self):
+        with mock.patch('academics.archive.BLOCK_ROWS', 2):
+            call_command('archive_audit_logs', stdout=io.StringIO())
+        [(path, rows)] = segments(self.month)
+        self.assertEqual([block['rows'] for block in segment_index(path)], [2, 2, 1])
+
+        with mock.patch('academics.archive.read_block', wraps=archive.read_block) as read_block:
+            logs = ArchivedLogs(self.month, entity='Student')
+            self.assertEqual((logs.count(), len(ArchivedLogs(self.month))), (2, 5))
+            # Counts come from the index alone
+            self.assertEqual(read_block.call_count, 0)
+            self.assertEqual([log.details['n'] for log in ArchivedLogs(self.month)[3:5]], [1, 0])
+            self.assertEqual([call.args[1]['rows'] for call in read_block.call_args_list], [2, 1])
+            self.assertEqual([log.details['n'] for log in logs[1:2]], [1])
+
+    def test_months_archived_in_several_passes_are_merged(self):
+        call_command('archive_audit_logs', stdout=io.StringIO())
+        # A late entry between two archived ones, and one after them all
+        for n, minutes in ((5, 1.5), (6, 10)):
+            AuditLog.objects.create(entity='Grade', action='update', user=self.admin,
+                                    details={'n': n}, timestamp=self.old + timedelta(minutes=minutes))
+        call_command('archive_audit_logs', stdout=io.StringIO())
+        self.assertEqual(len(segments(self.month)), 2)
+
+        order = [6, 4, 3, 2, 5, 1, 0]
+        self.assertEqual([entry['details']['n'] for entry in read_month(self.month)], order)
+        logs = ArchivedLogs(self.month)
+        self.assertEqual(len(logs), 7)
+        for start in range(7):
+            self.assertEqual([log.details['n'] for log in logs[start:start + 3]], order[start:start + 3])
+        self.assertEqual([log.details['n'] for log in ArchivedLogs(self.month, entity='Grade')[1:]], [4, 2, 5, 0])
+
+    def test_rows_left_in_the_table_are_listed_with_the_archive(self):
+        call_command('archive_audit_logs', stdout=io.StringIO())
+        # Written while or after the month was archived
+        for n, minutes in ((5, 1.5), (6, 10)):
+            AuditLog.objects.create(entity='Student', action='update', user=self.admin,
+                                    details={'n': n}, timestamp=self.old + timedelta(minutes=minutes))
+
+        order = []
+        params = {'month': self.month, 'page_size': 3}
+        for page in range(1, 4):
+            data = self.client.get('/api/audit-logs/', dict(params, page=page)).json()
+            self.assertEqual(data['count'], 7)
+            order += [row['details']['n'] for row in data['results']]
+        self.assertEqual(order, [6, 4, 3, 2, 5, 1, 0])
+
+        data = self.client.get('/api/audit-logs/', {'month': self.month, 'entity': 'student'}).json()
+        self.assertEqual([row['details']['n'] for row in data['results']], [6, 3, 5, 1])
+        response = self.client.get('/api/audit-logs/', {'month': self.month, 'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['details']['n'] for line in lines], order)
+
+    def test_segments_without_an_index_are_scanned(self):
+        call_command('archive_audit_logs', stdout=io.StringIO())
+        [(path, _)] = segments(self.month)
+        os.remove(archive.index_path(path))
+        self.assertEqual([log.details['n'] for log in ArchivedLogs(self.month, entity='Student')[:]], [3, 1])
+
+    def test_exports_stream_the_whole_archived_month(self):
+        call_command('archive_audit_logs', stdout=io.StringIO())
+        response = self.client.get('/api/audit-logs/', {'month': self.month, 'format': 'csv', 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([json.loads(row['details'])['n'] for row in rows], [4, 3, 2, 1, 0])
+
+        response = self.client.get('/api/audit-logs/', {'month': self.month, 'format': 'ndjson', 'entity': 'grade'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['details']['n'] for line in lines], [4, 2, 0])
+
+    def test_entity_migration_keeps_unknown_names(self):
+        migration = import_module('academics.migrations.0007_audit_log_entity_indexes')
+        for entity in ('students', 'grade', 'Audit-log'):
+            AuditLog.objects.create(entity=entity, action='update', details={})
+        migration.normalize_entities(django_apps, None)
+        self.assertEqual(
+            sorted(AuditLog.objects.filter(details={}).exclude(pk=self.recent.pk).values_list('entity', flat=True)),
+            ['Audit-log', 'Grade', 'Student'],
+        )
+
+    def test_filters_use_normalized_entities(self):
+        self.assertEqual(AuditLogMiddleware(lambda request: None)._extract_entity('/api/curriculums/1/'), 'Curriculum')
+        for value in ('student', 'Students'):
+            response = self.client.get('/api/audit-logs/', {'entity': value})
+            self.assertEqual({row['entity'] for row in response.json()['results']}, {'Student'})
+        self.assertEqual(self.client.get('/api/audit-logs/', {'entity': 'stud'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/audit-logs/', {'user': 'nobody'}).status_code, 400)
+
+
+class AuditPipelineTests(TransactionTestCase):
+    """Real commits: per-object entries are delivered when the transaction commits"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@rci.edu', password='password123', role='admin'
+        )
+        self.user = User.objects.create_user(
+            username='student', email='student@rci.edu', password='password123', role='student'
+        )
+        self.program = Program.objects.create(program_code='P', program_name='Program', department='ICT', sector='IT')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_each_change_is_logged_once(self):
+        response = self.client.post('/api/students/', {
+            'user': str(self.user.pk), 'student_number': 'S-1', 'program': str(self.program.pk), 'year_level': 1,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        created = AuditLog.objects.get()
+        self.assertEqual((created.action, created.user), ('create', self.admin))
+        self.assertEqual(created.details['path'], '/api/students/')
+        self.assertEqual(created.details['student_number'], 'S-1')
+
+        student = Student.objects.get()
+        self.client.patch(f'/api/students/{student.pk}/', {'year_level': 1}, format='json')
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+        with transaction.atomic():
+            student.year_level = 2
+            student.save()
+            student.year_level = 3
+            student.save()
+        updated = AuditLog.objects.exclude(pk=created.pk).get()
+        self.assertEqual(updated.details['changes'], {'year_level': {'before': 1, 'after': 3}})
+
+    def test_deleted_user_does_not_drop_the_batch(self):
+        gone = User.objects.create_user(username='gone', email='gone@rci.edu', password='password123', role='student')
+        entries = [
+            AuditLog(entity='Student', action='update', user=user, details={'n': n}, timestamp=timezone.now())
+            for n, user in enumerate([self.admin, gone, self.user])
+        ]
+        gone_id = gone.pk
+        gone.delete()
+
+        AuditWriter(asynchronous=False).write(entries)
+        logs = AuditLog.objects.order_by('details__n')
+        self.assertEqual([log.user_id for log in logs], [self.admin.pk, None, self.user.pk])
+        self.assertEqual(logs[1].details, {'n': 1, 'deleted_user_id': str(gone_id)})
@@ -12,7 +12,7 @@ from .views import (
     # ViewSets
     UserViewSet, ProgramViewSet, CurriculumViewSet, SubjectViewSet,
     SectionViewSet, StudentViewSet, EnrollmentViewSet, GradeViewSet,
-    ApplicationViewSet, DocumentViewSet, AuditLogViewSet
+    ApplicationViewSet, DocumentViewSet, AuditLogViewSet, WaitlistViewSet
 )
 
 # Create router for ViewSets
@@ -24,6 +24,7 @@ router.register(r'subjects', SubjectViewSet, basename='subject')
 router.register(r'sections', SectionViewSet, basename='section')
 router.register(r'students', StudentViewSet, basename='student')
 router.register(r'enrollments', EnrollmentViewSet, basename='enrollment')
+router.register(r'waitlist', WaitlistViewSet, basename='waitlist')
 router.register(r'grades', GradeViewSet, basename='grade')
 router.register(r'applications', ApplicationViewSet, basename='application')
 router.register(r'documents', DocumentViewSet, basename='document')
@@ -1,25 +1,48 @@
 # academics/views.py
 
+import uuid
+
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import logout
+from django.db import IntegrityError
+from django.db.models import Prefetch
+from django.http import FileResponse
+from django.utils.text import slugify
 
 from .models import (
     User, Program, Curriculum, Subject, Section,
-    Student, Enrollment, Grade, Application, Document, AuditLog
+    Student, Enrollment, Grade, Application, Document, AuditLog, WaitlistEntry
 )
 from .serializers import (
     UserSerializer, UserCreateSerializer, LoginSerializer, ChangePasswordSerializer,
     ProgramSerializer, CurriculumSerializer, SubjectSerializer, SectionSerializer,
     StudentSerializer, StudentCreateSerializer, EnrollmentSerializer, EnrollmentCreateSerializer,
     GradeSerializer, GradeSubmitSerializer, ApplicationSerializer, 
-    DocumentSerializer, AuditLogSerializer
+    DocumentSerializer, AuditLogSerializer, WaitlistEntrySerializer
+)
+from .prerequisites import get_prerequisite_graph
+from .enrollment import (
+    bulk_enroll, cohort_enroll, eligible_sections, with_enrolled_count,
+    BULK_ENROLLMENT_MAX_ROWS, CohortEnrollmentSerializer,
 )
+from .scheduling import ScheduleParseError, parse_schedule, get_occupancy_index
+from .idempotency import IdempotencyMixin
+from .query_budget import QueryBudgetMixin, query_budget
+from .fieldsets import DynamicFieldsViewSetMixin, requested_expansions, requested_fields
+from .compiled import CompiledListMixin
+from .pagination import ArchivePagination, KeysetPagination
+from .exports import EXPORT_CHUNK_SIZE, ExportMixin
+from .reports import COR, TOR, get_report
+from .archive import ArchivedLogs, is_month, month_bounds, segments
+from .audit import normalize_entity
+from .caching import ConditionalGetMixin, ResponseCacheMixin
 from .permissions import (
     IsAdmin, IsRegistrar, IsAdmission, IsHead, IsProfessor, IsStudent,
     IsAdminOrRegistrar, IsAdminOrHead, IsStaffUser, IsOwnerOrStaff,
@@ -146,7 +169,7 @@ def change_password_view(request):
 # USER MANAGEMENT VIEWSET
 # ========================================
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for users.
     Only admins can create/update/delete users.
@@ -154,6 +177,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
+    query_budgets = {'list': 3, 'retrieve': 2}
     
     def get_queryset(self):
         """Filter users based on role"""
@@ -192,7 +216,7 @@ class UserViewSet(viewsets.ModelViewSet):
 # PROGRAM & CURRICULUM VIEWSETS
 # ========================================
 
-class ProgramViewSet(viewsets.ModelViewSet):
+class ProgramViewSet(QueryBudgetMixin, ConditionalGetMixin, ResponseCacheMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for programs.
     Admins and heads can manage, others can view.
@@ -200,6 +224,8 @@ class ProgramViewSet(viewsets.ModelViewSet):
     queryset = Program.objects.all()
     serializer_class = ProgramSerializer
     permission_classes = [IsAuthenticated, ReadOnlyOrStaff]
+    version_models = (Program,)
+    query_budgets = {'list': 3, 'retrieve': 2}
     
     def get_queryset(self):
         queryset = Program.objects.all()
@@ -217,7 +243,7 @@ class ProgramViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class CurriculumViewSet(viewsets.ModelViewSet):
+class CurriculumViewSet(QueryBudgetMixin, ConditionalGetMixin, ResponseCacheMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for curriculum.
     Admins and heads can manage, others can view.
@@ -225,9 +251,14 @@ class CurriculumViewSet(viewsets.ModelViewSet):
     queryset = Curriculum.objects.all()
     serializer_class = CurriculumSerializer
     permission_classes = [IsAuthenticated, CanManageCurriculum]
+    version_models = (Curriculum, Subject, Program)
+    query_budgets = {'list': 4, 'retrieve': 3}
     
     def get_queryset(self):
-        queryset = Curriculum.objects.select_related('program').prefetch_related('subjects')
+        # Nested subjects render curriculum_info, which follows curriculum.program
+        queryset = Curriculum.objects.select_related('program').prefetch_related(
+            Prefetch('subjects', queryset=Subject.objects.select_related('curriculum__program'))
+        )
         
         # Filter by program
         program_id = self.request.query_params.get('program', None)
@@ -242,13 +273,15 @@ class CurriculumViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(QueryBudgetMixin, ConditionalGetMixin, ResponseCacheMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for subjects.
     """
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [IsAuthenticated, ReadOnlyOrStaff]
+    version_models = (Subject, Curriculum, Program)
+    query_budgets = {'list': 3, 'retrieve': 2}
     
     def get_queryset(self):
         queryset = Subject.objects.select_related('curriculum__program')
@@ -264,18 +297,44 @@ class SubjectViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(code__icontains=code)
         
         return queryset
+    
+    @query_budget(3)
+    @action(detail=True, methods=['get'])
+    def prerequisites(self, request, pk=None):
+        """Direct and transitive prerequisites, plus the subjects this one blocks"""
+        subject = self.get_object()
+        graph = get_prerequisite_graph()
+        
+        def describe(subject_ids):
+            return sorted(
+                ({'subject_id': subject_id, 'label': graph.label(subject_id)} for subject_id in subject_ids),
+                key=lambda item: item['label']
+            )
+        
+        return Response({
+            'subject_id': str(subject.subject_id),
+            'label': graph.label(subject.subject_id),
+            'prerequisites': describe(graph.prerequisites(subject.subject_id)),
+            'requires': describe(graph.requires(subject.subject_id)),
+            'blocks': describe(graph.blocks(subject.subject_id)),
+        })
 
 
-class SectionViewSet(viewsets.ModelViewSet):
+class SectionViewSet(QueryBudgetMixin, ResponseCacheMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for sections.
     """
     queryset = Section.objects.all()
     serializer_class = SectionSerializer
     permission_classes = [IsAuthenticated, ReadOnlyOrStaff]
+    # ?expand=subject nests curriculum_info, ?expand=professor the user
+    version_models = (Section, Subject, Curriculum, Program, User)
+    # Professors only see their own sections
+    per_user_roles = ('professor',)
+    query_budgets = {'list': 3, 'retrieve': 2}
     
     def get_queryset(self):
-        queryset = Section.objects.select_related('subject', 'professor')
+        queryset = with_enrolled_count(Section.objects.select_related('subject', 'professor'))
         
         # Filter by term
         term = self.request.query_params.get('term', None)
@@ -292,18 +351,42 @@ class SectionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(professor=self.request.user)
         
         return queryset
+    
+    @query_budget(3)
+    @action(detail=False, methods=['get'], url_path='free-rooms')
+    def free_rooms(self, request):
+        """Rooms with no booking in ?term= during ?schedule= (e.g. 'MWF 8:00-9:00 AM')"""
+        term = request.query_params.get('term', None)
+        schedule = request.query_params.get('schedule', None)
+        if not term or not schedule:
+            return Response({
+                'error': 'The term and schedule query parameters are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            meetings = parse_schedule(schedule)
+        except ScheduleParseError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'term': term,
+            'schedule': schedule,
+            'rooms': get_occupancy_index(term).free_rooms(meetings),
+        })
 
 
 # ========================================
 # STUDENT VIEWSETS
 # ========================================
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, ExportMixin, viewsets.ModelViewSet):
     """
     CRUD operations for student profiles.
     """
     queryset = Student.objects.all()
     permission_classes = [IsAuthenticated, IsAdminOrRegistrar]
+    pagination_class = KeysetPagination
+    query_budgets = {'list': 3, 'retrieve': 2}
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -333,18 +416,65 @@ class StudentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(user=self.request.user)
         
         return queryset
+    
+    # Includes a prerequisite graph build when the graph is cold
+    @query_budget(8)
+    @action(detail=True, methods=['get'], url_path='eligible-sections',
+            permission_classes=[IsAuthenticated, CanEnroll])
+    def eligible_sections(self, request, pk=None):
+        """Sections in ?term= this student can enroll in"""
+        term = request.query_params.get('term', None)
+        if not term:
+            return Response({
+                'error': 'The term query parameter is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        student = self.get_object()
+        sections = eligible_sections(student, term)
+        return Response(SectionSerializer(
+            sections, many=True, fields=requested_fields(request), expand=requested_expansions(request)
+        ).data)
+    
+    @query_budget(3)
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsOwnerOrStaff])
+    def cor(self, request, pk=None):
+        """Certificate of Registration PDF for ?term="""
+        term = request.query_params.get('term', None)
+        if not term:
+            return Response({
+                'error': 'The term query parameter is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        student = self.get_object()
+        return self._report_response(student, COR, term)
+    
+    @query_budget(3)
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsOwnerOrStaff])
+    def tor(self, request, pk=None):
+        """Transcript of Records PDF"""
+        student = self.get_object()
+        return self._report_response(student, TOR)
+    
+    def _report_response(self, student, doc_type, term=None):
+        name = '-'.join(filter(None, [doc_type, student.student_number, slugify(term or '')]))
+        return FileResponse(get_report(student, doc_type, term), content_type='application/pdf', filename=f'{name}.pdf')
 
 
 # ========================================
 # ENROLLMENT VIEWSETS
 # ========================================
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, ExportMixin, CompiledListMixin, IdempotencyMixin, viewsets.ModelViewSet):
     """
     CRUD operations for enrollments with prerequisite validation.
+    Create and bulk requests accept an Idempotency-Key header.
+    Lists are serialized from values() rows (see compiled.py).
     """
     queryset = Enrollment.objects.all()
     permission_classes = [IsAuthenticated, CanEnroll]
+    pagination_class = KeysetPagination
+    query_budgets = {'list': 3, 'retrieve': 2}
+    idempotent_actions = ('create', 'bulk', 'cohort')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -380,19 +510,133 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(section__professor=self.request.user)
         
         return queryset
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrRegistrar])
+    def bulk(self, request):
+        """
+        Enroll many students at once.
+        Accepts a list of {student, section, term, status} rows (or
+        {"enrollments": [...]}) and returns a result for each row.
+        """
+        entries = request.data.get('enrollments') if isinstance(request.data, dict) else request.data
+        
+        if not isinstance(entries, list) or not entries:
+            return Response({
+                'error': 'Expected a non-empty list of enrollments'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(entries) > BULK_ENROLLMENT_MAX_ROWS:
+            return Response({
+                'error': f'At most {BULK_ENROLLMENT_MAX_ROWS} enrollments per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            results, created = bulk_enroll(entries)
+        except IntegrityError:
+            return Response({
+                'error': 'Enrollments changed while processing the request, please retry'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'created': len(created),
+            'failed': len(entries) - len(created),
+            'results': results,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrRegistrar])
+    def cohort(self, request):
+        """
+        Block-enroll a cohort.
+        Body: {program, year_level, semester, term, section_name, status?}.
+        Every active student of the program/year level is enrolled in the
+        curriculum subjects' `section_name` sections for the term.
+        """
+        serializer = CohortEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            summary = cohort_enroll(**serializer.validated_data)
+        except IntegrityError:
+            return Response({
+                'error': 'Enrollments changed while processing the request, please retry'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return Response(summary, status=status.HTTP_201_CREATED if summary['created'] else status.HTTP_200_OK)
+
+
+class WaitlistViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
+    """
+    Queued enrollment requests.
+    POST only records the intent (202 Accepted); the enrollment worker
+    (`manage.py process_enrollment_queue`) admits requests in order and
+    moves waitlisted students up when seats free.
+    """
+    queryset = WaitlistEntry.objects.all()
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated, CanEnroll]
+    query_budgets = {'list': 3, 'retrieve': 2}
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+    
+    def get_queryset(self):
+        queryset = WaitlistEntry.objects.select_related('student', 'section__subject')
+        
+        # Filter by section
+        section_id = self.request.query_params.get('section', None)
+        if section_id:
+            queryset = queryset.filter(section__section_id=section_id)
+        
+        # Filter by term
+        term = self.request.query_params.get('term', None)
+        if term:
+            queryset = queryset.filter(term=term)
+        
+        # Filter by status
+        status = self.request.query_params.get('status', None)
+        if status:
+            queryset = queryset.filter(status=status)
+        
+        # Students see only their own requests
+        if self.request.user.role == 'student':
+            queryset = queryset.filter(student__user=self.request.user)
+        
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+    
+    def perform_create(self, serializer):
+        serializer.save(requested_by=self.request.user)
+    
+    def destroy(self, request, *args, **kwargs):
+        """Cancel a request that has not been admitted yet"""
+        entry = self.get_object()
+        if entry.status not in WaitlistEntry.ACTIVE_STATUSES:
+            return Response({
+                'error': f'Cannot cancel a request that is already {entry.status}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        entry.status = 'cancelled'
+        entry.save(update_fields=['status'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # ========================================
 # GRADE VIEWSETS
 # ========================================
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, ExportMixin, CompiledListMixin, IdempotencyMixin, viewsets.ModelViewSet):
     """
     CRUD operations for grades.
     Professors can submit grades for their sections.
+    Grade submissions accept an Idempotency-Key header.
+    Lists are serialized from values() rows (see compiled.py).
     """
     queryset = Grade.objects.all()
     permission_classes = [IsAuthenticated, CanManageGrades]
+    pagination_class = KeysetPagination
+    query_budgets = {'list': 3, 'retrieve': 2}
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -434,13 +678,14 @@ class GradeViewSet(viewsets.ModelViewSet):
 # APPLICATION VIEWSETS
 # ========================================
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+class ApplicationViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, ExportMixin, viewsets.ModelViewSet):
     """
     CRUD operations for admission applications.
     """
     queryset = Application.objects.all()
     serializer_class = ApplicationSerializer
     permission_classes = [IsAuthenticated, CanManageApplications]
+    query_budgets = {'list': 3, 'retrieve': 2}
     
     def get_queryset(self):
         queryset = Application.objects.select_related('program')
@@ -462,13 +707,17 @@ class ApplicationViewSet(viewsets.ModelViewSet):
 # DOCUMENT VIEWSETS
 # ========================================
 
-class DocumentViewSet(viewsets.ModelViewSet):
+class DocumentViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for documents.
     """
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
     permission_classes = [IsAuthenticated, IsAdminOrRegistrar]
+    query_budgets = {'list': 3, 'retrieve': 2}
+    
+    def get_queryset(self):
+        return Document.objects.select_related('student__user', 'uploaded_by')
     
     def perform_create(self, serializer):
         serializer.save(uploaded_by=self.request.user)
@@ -478,31 +727,76 @@ class DocumentViewSet(viewsets.ModelViewSet):
 # AUDIT LOG VIEWSETS
 # ========================================
 
-class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+class AuditLogViewSet(QueryBudgetMixin, DynamicFieldsViewSetMixin, ExportMixin, viewsets.ReadOnlyModelViewSet):
     """
     Read-only access to audit logs.
     Only admins can view audit logs.
+
+    ?month=YYYY-MM limits the list to one month; months moved out of the
+    table by archive_audit_logs are read from their archive segments,
+    merged with any of the month's rows still in the table.
     """
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
-    
-    def get_queryset(self):
-        queryset = AuditLog.objects.select_related('user').order_by('-timestamp')
-        
-        # Filter by entity
-        entity = self.request.query_params.get('entity', None)
+    pagination_class = KeysetPagination
+    query_budgets = {'list': 3, 'retrieve': 2}
+
+    def list(self, request, *args, **kwargs):
+        month = request.query_params.get('month')
+        if month and not is_month(month):
+            return Response({'error': 'month must be in YYYY-MM format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if month and segments(month):
+            logs = ArchivedLogs(month, table=True, **self.get_filters())
+            if self.is_export(request):
+                # The whole month, read block by block as the response streams
+                serializer = self.get_serializer()
+                rows = (serializer.to_representation(log) for log in logs.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+                return self.export_response(serializer, rows)
+            paginator = ArchivePagination()
+            page = paginator.paginate_queryset(logs, request, view=self)
+            return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        return super().list(request, *args, **kwargs)
+
+    def get_filters(self):
+        """
+        ?entity=, ?action= and ?user= as exact lookups, each served by an
+        (<column>, timestamp, log_id) index in list order
+        """
+        params = self.request.query_params
+        filters = {}
+
+        # Filter by entity ('students', 'Student' and 'student' are the same)
+        entity = params.get('entity', None)
         if entity:
-            queryset = queryset.filter(entity__icontains=entity)
-        
+            filters['entity'] = normalize_entity(entity)
+            if filters['entity'] is None:
+                raise ValidationError({'error': f'Unknown entity: {entity}'})
+
         # Filter by action
-        action = self.request.query_params.get('action', None)
+        action = params.get('action', None)
         if action:
-            queryset = queryset.filter(action=action)
-        
+            filters['action'] = action
+
         # Filter by user
-        user_id = self.request.query_params.get('user', None)
+        user_id = params.get('user', None)
         if user_id:
-            queryset = queryset.filter(user__user_id=user_id)
-        
-        return queryset
\ No newline at end of file
+            try:
+                filters['user_id'] = uuid.UUID(user_id)
+            except ValueError:
+                raise ValidationError({'error': f'Invalid user id: {user_id}'})
+
+        return filters
+    
+    def get_queryset(self):
+        queryset = AuditLog.objects.select_related('user').order_by('-timestamp')
+
+        # Filter by month
+        month = self.request.query_params.get('month', None)
+        if is_month(month):
+            start, end = month_bounds(month)
+            queryset = queryset.filter(timestamp__gte=start, timestamp__lt=end)
+
+        return queryset.filter(**self.get_filters())
\ No newline at end of file
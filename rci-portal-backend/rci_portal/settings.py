@@ -3,6 +3,7 @@ Django settings for rci_portal project.
 """
 
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -173,6 +174,94 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
 
+# ========================================
+# CACHE
+# ========================================
+# Use a shared backend (e.g. Redis) when running several workers so
+# idempotency keys are seen by every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rci-portal',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# ========================================
+# IDEMPOTENCY KEYS
+# ========================================
+IDEMPOTENCY_CACHE = 'default'
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds a stored response can be replayed
+IDEMPOTENCY_LOCK_TTL = 60  # seconds a key stays locked while its request runs
+
+# ========================================
+# TABLE VERSIONS (ETags)
+# ========================================
+# Per-table counters bumped on writes; must be shared by every process
+# (like IDEMPOTENCY_CACHE) or other processes keep answering 304
+TABLE_VERSION_CACHE = 'default'
+
+# ========================================
+# RESPONSE CACHE
+# ========================================
+# In-process LRU of catalog responses (programs, curriculums, subjects,
+# sections); entries are keyed by table versions, so writes expire them
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_TTL = 5 * 60  # seconds
+
+# ========================================
+# COMPILED LIST SERIALIZERS
+# ========================================
+# In-process LRU of compiled serializers, one per ?fields= / ?expand= shape
+COMPILED_SERIALIZER_MAX_ENTRIES = 256
+
+# ========================================
+# GENERATED DOCUMENTS (COR / TOR)
+# ========================================
+# Seconds the path of a rendered PDF is cached; grade and enrollment
+# changes invalidate it sooner
+REPORT_CACHE_TTL = 24 * 60 * 60
+
+# ========================================
+# AUDIT LOG WRITER
+# ========================================
+# Audit entries are queued in-process and inserted in batches by a
+# background thread; tests write them synchronously
+TESTING = sys.argv[1:2] == ['test']
+AUDIT_ASYNC = not TESTING
+AUDIT_BATCH_SIZE = 200  # entries per bulk insert
+AUDIT_FLUSH_INTERVAL = 1.0  # seconds a partial batch may wait
+AUDIT_QUEUE_SIZE = 10000  # entries buffered before requests write inline
+AUDIT_ENQUEUE_TIMEOUT = 0.05  # seconds a request waits for queue space
+# Request/response payloads larger than this are recorded by size only
+AUDIT_MAX_PAYLOAD_BYTES = 64 * 1024
+# Keys dropped from recorded payloads, at any depth
+AUDIT_EXCLUDED_FIELDS = [
+    'password',
+    'old_password',
+    'new_password',
+    'confirm_password',
+    'access',
+    'refresh',
+    'token',
+]
+
+# ========================================
+# AUDIT LOG ARCHIVE
+# ========================================
+# archive_audit_logs moves months older than AUDIT_RETENTION_MONTHS (the
+# current month included) to gzipped JSONL segments in AUDIT_ARCHIVE_DIR
+AUDIT_RETENTION_MONTHS = 6
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'archive' / 'audit'
+
+# ========================================
+# QUERY BUDGETS
+# ========================================
+# Report X-Query-Count / X-Query-Budget headers on API responses
+QUERY_COUNT_HEADER = DEBUG
+
 # ========================================
 # JWT (JSON Web Token) CONFIGURATION
 # ========================================
@@ -229,4 +318,12 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'idempotent-replayed',
+    'x-query-count',
+    'x-query-budget',
 ]
\ No newline at end of file
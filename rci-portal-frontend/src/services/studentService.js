@@ -41,14 +41,34 @@ const studentService = {
         return response.data
     },
 
+    /**
+     * Get every section in a term the student can enroll in
+     */
+    getEligibleSections: async (studentId, term) => {
+        const response = await apiClient.get(`/students/${studentId}/eligible-sections/`, {
+            params: { term }
+        })
+        return response.data
+    },
+
     /**
      * Enroll in a section
+     *
+     * `idempotencyKey` identifies one enrollment attempt: create it with
+     * newIdempotencyKey() when the student asks to enroll and pass the same
+     * key when retrying, so the backend replays the first response instead
+     * of enrolling twice.
      */
-    enrollInSection: async (sectionId, term) => {
+    enrollInSection: async (sectionId, term, idempotencyKey) => {
+        if (!idempotencyKey) {
+            throw new Error('enrollInSection needs the idempotency key of this enrollment attempt')
+        }
         const response = await apiClient.post('/enrollments/', {
             section: sectionId,
             term,
             status: 'pending'
+        }, {
+            headers: { 'Idempotency-Key': idempotencyKey }
         })
         return response.data
     },